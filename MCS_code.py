@@ -1,674 +1,632 @@
-# Save as app.py
-# Launch in terminal: streamlit run app.py
-
-import streamlit as st
-import requests
-from bs4 import BeautifulSoup
-import datetime
-from marstime import marstime # Para calcular MY y Ls
-import os
-from pathlib import Path
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import warnings
-from io import BytesIO  
-
-warnings.filterwarnings('ignore', category=RuntimeWarning)
-
-# --- Configuración ---
-BASE_URL = "https://atmos.nmsu.edu/PDS/data/"
-CODIFICACION = "latin1"
-
-# --- Funciones auxiliares ---
-def convertir_longitud(lon):
-    return lon % 360
-
-# Calcula MROM DDR partiendo de MROM_2001 = septiembre 2006
-def fecha_a_mrom_ddr(year, month):
-    base_year, base_month = 2006, 9
-    numero = 2001 + (year - base_year) * 12 + (month - base_month)
-    return f"MROM_{numero:04d}"
-
-def construir_url(fecha):
-    y, m, d = fecha.year, fecha.month, fecha.day
-    mrom = fecha_a_mrom_ddr(y, m)
-    fecha_str = f"{y}{m:02d}{d:02d}"
-    url = f"{BASE_URL}{mrom}/DATA/{y}/{y}{m:02d}/{fecha_str}/"
-    return url
-
-# Listar solo archivos DDR
-def listar_tab_files_ddr(url):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return []
-    soup = BeautifulSoup(r.text, "html.parser")
-    return [url + link.get("href") for link in soup.find_all("a") 
-            if link.get("href").upper().endswith("_DDR.TAB")]
-
-# --- Descarga paralela ---
-def descargar_archivos(urls, carpeta_destino):
-    os.makedirs(carpeta_destino, exist_ok=True)
-    paths = []
-    st.write("Uploading files...")
-    progreso = st.progress(0)
-
-    def descargar(u):
-        nombre = u.split("/")[-1]
-        destino = os.path.join(carpeta_destino, nombre)
-        r = requests.get(u)
-        if r.status_code == 200:
-            with open(destino, "wb") as f:
-                f.write(r.content)
-            return destino
-        return None
-
-    with ThreadPoolExecutor(max_workers=6) as executor:
-        futuros = {executor.submit(descargar, u): u for u in urls}
-        for i, futuro in enumerate(as_completed(futuros), 1):
-            resultado = futuro.result()
-            if resultado:
-                paths.append(resultado)
-            progreso.progress(i / len(urls))
-    return paths
-
-def cargar_archivo(archivo):
-    try:
-        st.write(f"🔍 Analyzing file: {archivo}")
-        
-        # Leer el archivo completo
-        with open(archivo, 'r', encoding=CODIFICACION) as f:
-            contenido = f.read()
-        
-        # Dividir en líneas
-        lineas = contenido.split('\n')
-        st.write(f"📊 Number of lines: {len(lineas)}")
-        
-        datos = []
-        lineas_procesadas = 0
-        lineas_ignoradas = 0
-        
-        # Valor de hora local asignado al bloque actual (se actualiza al encontrar una cabecera)
-        local_time_actual = np.nan
-
-        for i, linea in enumerate(lineas):
-            if not linea.strip():
-                continue
-                
-            # Saltar líneas de encabezado/metadata (las que no empiezan con número)
-            if not linea.strip().startswith(('0', '1', '2', '3', '4', '5', '6', '7', '8', '9')):
-                lineas_ignoradas += 1
-                continue
-            
-            # Dividir la línea por comas (el formato usa comas como separador)
-            partes = [parte.strip() for parte in linea.split(',')]
-
-            # Detectar línea de encabezado: >15 columnas y segunda columna con fecha entre comillas
-            if len(partes) > 15 and partes[0] == '0' and partes[1].strip().startswith('"') and ('-' in partes[1]):
-                # intenta extraer la columna 12 (índice 11) y convertirla a horas
-                try:
-                    raw = partes[11].strip().replace('"', '').replace("'", "")
-                    try:
-                        # si viene normalizado (ej: 0.5) -> multiplicar por 24
-                        local_time_actual = float(raw.replace(',', '.')) * 24
-                    except ValueError:
-                        # si por lo que sea viniese en formato hh:mm:ss -> convertir a horas
-                        if ':' in raw:
-                            hh, mm, ss = raw.split(':')
-                            local_time_actual = float(hh) + float(mm) / 60.0 + float(ss) / 3600.0
-                        else:
-                            local_time_actual = np.nan
-                except Exception:
-                    local_time_actual = np.nan
-                
-                # Esto lo consideramos una línea de encabezado (es decir, no es una fila de datos)
-            
-            # Solo procesar líneas que tengan exactamente 15 columnas y empiecen con "0"
-            if len(partes) == 15 and partes[0] == '0':
-                try:
-                    # Verificar que la segunda columna sea numérica
-                    float(partes[1].replace(',', '.'))
-                    # Añadimos la hora local actual (se añade como string para mantener la consistencia antes de convertir)
-                    lt = 'nan' if pd.isna(local_time_actual) else str(local_time_actual)
-                    datos.append(partes + [lt])
-                    lineas_procesadas += 1
-                    
-                    # Mostrar primera línea de datos como ejemplo
-                    if len(datos) == 1:
-                        st.write("✅ First Line:")
-                        st.write(f"Raw: {linea}")
-                        st.write(f"LocalTime assigned: {lt}")
-                        #st.write(f"Partes: {partes}")
-                        
-                except (ValueError, IndexError) as e:
-                    lineas_ignoradas += 1
-                    if lineas_ignoradas <= 3:  # Mostrar solo primeros errores
-                        st.write(f"❌ Line ignored (error): {e}")
-            else:
-                lineas_ignoradas += 1
-                if lineas_ignoradas <= 3:  # Mostrar solo primeros ejemplos
-                    st.write(f"❌ Line ignored ({len(partes)} columns, start with '{partes[0] if partes else 'N/A'}'): {linea[:100]}...")
-        
-        st.write(f"📈 Summary: {lineas_procesadas} processed lines, {lineas_ignoradas} ignored")
-        
-        if not datos:
-            st.warning("⚠️ There is no valid data")
-            return pd.DataFrame()
-            
-        # Crear DataFrame
-        columnas = [
-            'Descartar', 'Pres', 'T', 'T_err', 'Dust', 'Dust_err',
-            'H2Ovap', 'H2Ovap_err', 'H2Oice', 'H2Oice_err',
-            'CO2ice', 'CO2ice_err', 'Alt', 'Lat', 'Lon', 'LocalTime'
-        ]
-        
-        df = pd.DataFrame(datos, columns=columnas)
-        st.write(f"📊 DataFrame created with {len(df)} lines")
-        
-        # Convertir a numérico
-        for col in columnas[1:]:  # Todas excepto la primera
-            try:
-                df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', '.'), errors='coerce')
-                st.write(f"✅ Column {col} converted to numeric")
-            except Exception as e:
-                st.error(f"❌ Error converting column {col}: {e}")
-        
-
-        
-        # Filtrar valores inválidos (-9999)
-        df = df.replace(-9999, np.nan)
-        # Convertir longitud
-        df['Lon'] = df['Lon'].apply(convertir_longitud)
-
-        df_final = df.dropna(subset=['Pres', 'T', 'Alt', 'Lat', 'Lon'], how='any')
-        
-        st.write(f"🎯 Final DataFrame after processing: {len(df_final)} lines")
-        
-        if not df_final.empty:
-            st.write("📋 First lines of the DataFrame:")
-            st.dataframe(df_final.head(50))
-            
-            # Mostrar estadísticas básicas
-            st.write("📊 Estatistics:")
-            st.write(f" - Pressure: {df_final['Pres'].min():.2e} to {df_final['Pres'].max():.2e} Pa")
-            st.write(f" - Temperature: {df_final['T'].min():.1f} to {df_final['T'].max():.1f} K")
-            st.write(f" - Altitude: {df_final['Alt'].min():.1f} to {df_final['Alt'].max():.1f} km")
-            st.write(f" - Latitude: {df_final['Lat'].min():.1f} to {df_final['Lat'].max():.1f}°")
-            st.write(f" - Longitude: {df_final['Lon'].min():.1f} to {df_final['Lon'].max():.1f}°")
-            st.write(f" - LocalTime: {df_final['LocalTime'].min():.1f} to {df_final['LocalTime'].max():.1f}")
-        
-        return df_final
-    
-    except Exception as e:
-        st.error(f"💥 Error loading file {archivo}: {str(e)}")
-        return pd.DataFrame()
-
-def cargar_multiples_archivos(directorio):
-    archivos = Path(directorio).glob("*.TAB")
-    dfs = []
-    for archivo in archivos:
-        df = cargar_archivo(archivo)
-        if not df.empty:
-            dfs.append(df)
-    if dfs:
-        df_total = pd.concat(dfs, ignore_index=True)
-
-        # Guardar DataFrame en un Excel - Quitar '#' para ver descargar excel con los datos
-        #output_file = Path(directorio) / "datos_crudos_Streamlit.xlsx"
-        #df_total.to_excel(output_file, index=False)
-        return df_total
-    return pd.DataFrame()
-
-# --- Funciones para gráficas (del segundo código) ---
-
-# Función para Cp(T)/R
-def frac_T(T):
-    '''Definimos los coeficientes para la expresión 
-    a1, a2, a3, a4, a5, a6, a7
-
-    Fuente : Capitelli, M., Giordano, D., & Warmbein, B. (Eds.). (2005). 
-            Tables of internal partition functions and thermodynamic properties of high-temperature Mars-atmosphere species from 50K to 50000K. 
-            The Netherlands: European Space Agency.
-    '''
-    a1 = -6.54120227e-7
-    a2 = 2.74075894e-3
-    a3 = -2.7641862e-1
-    a4 = 1.956385613e3
-    a5 = -2.76968792e5
-    a6 = 2.128976190e7
-    a7 = -6.65634099e8
-
-    fract = a1*(T/1.0e5)**(-2) + a2*(T/1.0e5)**(-1) + a3 + a4*(T/1.0e5) + a5*(T/1.0e5)**2 + a6*(T/1.0e5)**3 + a7*(T/1.0e5)**4
-
-    return fract
-
-def frac_T_dev(T):
-    '''
-    Derivada de frac_T
-    '''
-
-    a1 = -6.54120227e-7
-    a2 = 2.74075894e-3
-    a3 = -2.7641862e-1
-    a4 = 1.956385613e3
-    a5 = -2.76968792e5
-    a6 = 2.128976190e7
-    a7 = -6.65634099e8
-
-    fract_dev = -2.0*a1*(1/1.0e5)**(-2)*T**(-3) - a2*(1/1.0e5)**(-1)*T**(-2) + a4*(1/1.0e5) + a5*(1/1.0e5)**2*T + a6*(1/1.0e5)**3*T**2 + a7*(1/1.0e5)**4*T**3
-
-    return fract_dev
-
-
-
-def calcular_temp_potencial(T, P, P0=610.0):
-    """
-    Calcula la temperatura potencial θ [K] para Marte.
-    T : array-like de temperaturas [K]
-    P : array-like de presiones [Pa]
-    P0 : presión de referencia [Pa] (por defecto 610 Pa)
-    """
-    T = np.array(T, dtype=float)
-    P = np.array(P, dtype=float)
-
-    Cp_R = frac_T(T)  # Cp(T)/R
-    R_Cp = 1.0 / Cp_R # R/Cp(T)
-    
-    theta = T * (P0 / P)**R_Cp
-    return theta
-
-def calcular_temp_potencial_err(T,T_err, P, P0=610.0):
-    '''
-    Calcula el error en la temperatura potencial θ [K] para Marte.
-    T : array-like de temperaturas [K]
-    T_err : array-like de errores de temperatura [K]
-    P : array-like de presiones [Pa]
-    P0 : presión de referencia [Pa] (por defecto 610 Pa)
-
-    Asume único error en T sacado a partir de los datos de MCS. 
-    '''
-
-    T = np.array(T, dtype=float)
-    T_err = np.array(T_err, dtype=float)
-    P = np.array(P, dtype=float)
-
-    f_T = frac_T(T)  # Cp(T)/R
-    f_T_prim = frac_T_dev(T) # [Cp(T)/R]'
-    n_T = 1.0 / f_T # R/Cp(T)
-
-    a = P0/P
-
-    theta_err = a**n_T * np.abs(1 - T * np.log(a) * f_T_prim / f_T**2) * T_err
-    return theta_err
-
-
-
-
-def calcular_presion_saturacion(T, xvvco2):
-    '''
-    Fuente: Hu, R., Cahoy, K., & Zuber, M. T. (2012). 
-    Mars atmospheric CO2 condensation above the north and south poles as revealed by radio occultation, climate sounder, and laser ranging observations. 
-    Journal of Geophysical Research: Planets, 117(E7).
-    '''
-    T = np.array(T)
-    logPsat = np.zeros_like(T)
-    
-    mask_high = T > 216.56
-    mask_low = ~mask_high
-    
-    if np.any(mask_high):
-        T_high = T[mask_high]
-        logPsat[mask_high] = (3.128082 - 867.2124/T_high + 18.65612e-3*T_high - 
-                              72.48820e-6*T_high**2 + 93e-9*T_high**3)
-    
-    if np.any(mask_low):
-        T_low = T[mask_low]
-        logPsat[mask_low] = (6.760956 - 1284.07/(T_low - 4.718) + 
-                             1.256e-4*(T_low - 143.15))
-    
-    return (10**logPsat)*1.0e5/xvvco2
-
-def calcular_presion_saturacion_H2O(T, xvvh2o):
-    '''
-    Fuente: Richardson, M. I., & Wilson, R. J. (2002). 
-    Investigation of the nature and stability of the Martian seasonal water cycle with a general circulation model. 
-    Journal of Geophysical Research: Planets, 107(E5), 7-1.
-    '''
-    T = np.array(T)
-    Psat = 611 * np.exp(22.5*(1 - 273.16/T))
-    return Psat/xvvh2o
-
-def crear_graficas(df_filtrado, lat_range, lon_range, local_range, MY, Ls):
-    if df_filtrado.empty:
-        st.warning("There is no data for the range selected")
-        return None
-    
-    # Crear figura nueva
-    fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(27, 7))
-    
-    # --- Gráfica 1: Temperatura vs Presión/Altitud ---
-    df_temp = df_filtrado[(df_filtrado['Pres'].notna()) &
-                          (df_filtrado['Alt'].notna()) & 
-                         (df_filtrado['T'].notna()) &
-                         (df_filtrado['Lon'].notna()) &
-                         (df_filtrado['Lat'].notna())].copy()
-    
-    if not df_temp.empty:
-        # Eliminar duplicados
-        #df_temp = df_temp.drop_duplicates(subset=['Alt', 'Pres'])
-        
-        # CREAR EJE SECUNDARIO (como en tu código original)
-        ax1b = ax1.twinx()
-        
-        # 1. PLOT PRINCIPAL: Temperatura vs Presión (eje izquierdo)
-        ax1.errorbar(df_temp['T'], df_temp['Pres'], 
-                    xerr=df_temp['T_err'], fmt='o', ms=3, elinewidth=0.5,
-                    color='firebrick', alpha=0.6, zorder=2, 
-                    label='Temperature Profiles')
-        
-        # 2. EJE SECUNDARIO: Temperatura vs Altitud (transparente, solo para escala y pruebas)
-        ax1b.plot(df_temp['T'], df_temp['Alt'], 'x', color='blue', alpha=0, label=None)
-        
-        # 3. CURVAS DE SATURACIÓN 
-        T_range = np.linspace(50, 300, 100)
-        
-        PsatCO2_min = calcular_presion_saturacion(T_range, Xvv_CO2_min)
-        PsatH2O_min = calcular_presion_saturacion_H2O(T_range, Xvv_H2O_min)
-        PsatH2O_max = calcular_presion_saturacion_H2O(T_range, Xvv_H2O_max)
-        
-        ax1.semilogy(T_range, PsatCO2_min, '--', color='navy', zorder=5,
-                    linewidth=2, label=f'Psat CO₂ X={Xvv_CO2_min:.2f}')
-        ax1.semilogy(T_range, PsatH2O_min, '--', color='lime', zorder=5,
-                    linewidth=2, label=f'Psat H₂O X_min={Xvv_H2O_min:.2e}')
-        ax1.semilogy(T_range, PsatH2O_max, ':', color='lime', zorder=5,
-                    linewidth=2, label=f'Psat H₂O X_max={Xvv_H2O_max:.2e}')
-        
-        # 4. CONFIGURACIÓN DE EJES 
-        ax1.set_xlabel('Temperature [K]', fontsize=15)
-        ax1.set_xlim(50, 300)
-        ax1b.set_ylabel('Altitude [km]', fontsize=15)
-        ax1b.yaxis.labelpad = 10
-        
-        # Sincronización usando relación barométrica (simplificada)
-        alt_min, alt_max = df_temp['Alt'].min(), df_temp['Alt'].max()
-        pres_min, pres_max = df_temp['Pres'].max(), df_temp['Pres'].min()  # ¡INVERTIDO!
-        
-        ax1b.set_ylim(alt_min, alt_max)
-        ax1.set_ylim(pres_min, pres_max)  # Presión invertida: mayor presión abajo
-        
-        # Configurar eje de presión (invertido y logarítmico)
-        ax1.set_yscale('log')
-        ax1.set_ylabel('Pressure [Pa]', color='firebrick', fontsize=15, labelpad=10)
-        ax1b.yaxis.set_label_position("right")
-        
-        ax1.tick_params(axis='y', labelcolor='firebrick', labelsize=14)
-        ax1.tick_params(axis='x', labelsize=14)
-        ax1b.tick_params(axis='y', labelsize=14)
-
-        yticks = np.arange(np.floor(alt_min/20)*20, np.ceil(alt_max/20)*20 + 1, 20)
-        ax1b.set_yticks(yticks)
-
-        ax1.grid(True)
-        
-        # Leyenda
-        lines1, labels1 = ax1.get_legend_handles_labels()
-        ax1.legend(lines1, labels1, loc='upper right', fontsize=13)
-    
-        # --- Gráfica de Opacidad ---
-        df_dust = df_filtrado[df_filtrado['Dust'].notna()]
-        df_ice  = df_filtrado[df_filtrado['H2Oice'].notna()] 
-
-    
-        if not df_dust.empty or not df_ice.empty:
-            ax2b = ax2.twinx()
-            ax2.set_xscale('log')
-            ax2.set_xlim(1e-5, 1)
-        
-            # Usar mismos límites de altitud que la primera gráfica
-            if not df_temp.empty:
-                ax2b.set_ylim(alt_min, alt_max)
-                ax2b.set_yticks(yticks)
-                ax2.set_ylim(pres_min, pres_max)
-            else:
-                # Si no hay datos de temp, calcular de dust/ice - Diria que en principio esta condicion de no encontrar datos en df_temp pero si en df_dust y df_ice no debería ocurrir
-                alt_data = pd.concat([df_dust['Alt'], df_ice['Alt']] if not df_ice.empty else [df_dust['Alt']])
-                pres_data = pd.concat([df_dust['Pres'], df_ice['Pres']] if not df_ice.empty else [df_dust['Pres']])
-                if not alt_data.empty:
-                    ax2b.set_ylim(alt_data.min(), alt_data.max())
-                    ax2.set_ylim(pres_data.max(), pres_data.min())
-        
-            ax2.tick_params(axis='both', labelsize=14)
-            ax2.yaxis.labelpad = 10
-        
-            if not df_dust.empty:
-                ax2.errorbar(df_dust['Dust'], df_dust['Pres'],
-                        xerr=df_dust['Dust_err'], elinewidth=0.5,
-                        fmt='o', color='sienna', ms=3, 
-                        label='Dust', alpha=0.6, capsize=3)
-        
-            if not df_ice.empty:
-                ax2.errorbar(df_ice['H2Oice'], df_ice['Pres'],
-                        xerr=df_ice['H2Oice_err'], elinewidth=0.5,
-                        fmt='o', color='royalblue', ms=3,
-                        label='Ice H₂O', alpha=0.6, capsize=3)
-        
-            ax2.set_xlabel('Opacity', fontsize=15)
-            ax2.set_ylabel('Pressure [Pa]', fontsize=15, color='firebrick')
-            ax2b.yaxis.set_label_position("right")
-        
-            ax2.tick_params(axis='y', labelcolor='firebrick', labelsize=14)
-            ax2.tick_params(axis='x', labelsize=14)
-            ax2b.tick_params(axis='y', labelsize=14)
-            ax2b.set_ylabel('Altitude [km]', fontsize=15)
-            ax2.set_yscale('log')
-            ax2.grid(True)
-            ax2.legend(fontsize=13)
-        else:
-            ax2.text(0.5, 0.5, 'No opacity data available', 
-                ha='center', va='center', transform=ax2.transAxes, fontsize=12)
-            ax2.set_xlabel('Opacity', fontsize=15)
-            ax2.set_ylabel('Pressure [Pa]', fontsize=15)
-            ax2b.set_ylabel('Altitude [km]', fontsize=15)
-        
-        # --- Gráfica de Temperatura Potencial ---
-        df_theta = df_filtrado.copy()
-
-        ax3b = ax3.twinx()
-        ax3.errorbar(df_theta['Theta'], df_theta['Pres'], xerr=df_theta['Theta_err'] , fmt='o', ms=3, elinewidth=0.5, color='darkred', alpha=0.6, zorder=2, label='Potential Temperature Profiles')
-
-        ax3b.plot(df_theta['Theta'], df_theta['Alt'], 'x', color='blue', alpha=0)
-
-        ax3.set_xscale('linear')
-        ax3.set_yscale('log')
-        ax3.set_xlabel('Potential Temperature [K]', fontsize=15)
-        ax3.set_ylabel('Pressure [Pa]', fontsize=15, color='firebrick')
-        ax3b.set_ylabel('Altitude [km]', fontsize=15)
-        ax3.tick_params(axis='x', labelsize=14)
-        ax3.tick_params(axis='y', labelcolor='firebrick', labelsize=14)
-        ax3b.tick_params(axis='y', labelsize=14)
-        ax3.set_xlim(150, 400) # Una vez ejecutado el programa se puede cambiar esto al momento volver a plotear y las gráficas se actualizan en base a estos nuevos límites
-        ax3.set_ylim(pres_min, pres_max)
-        ax3b.set_ylim(alt_min, alt_max)
-        ax3b.set_yticks(yticks)
-        ax3.grid(True)
-        ax3.legend(fontsize=13)
-
-        # Ajustar posición para alineación perfecta (como en Jupyter)
-        pos1 = ax1.get_position()
-        pos2 = ax2.get_position()
-        pos3 = ax3.get_position()
-        ax2.set_position([pos2.x0, pos1.y0, pos2.width, pos1.height])
-        ax3.set_position([pos3.x0, pos1.y0, pos3.width, pos1.height])
-    
-    # Título general
-    fig.suptitle(
-        f"Atmospheric Profiles MY {MY:.0f} Ls = {Ls:.1f}° | "
-        f"Latitude: {lat_range[0]:.1f} to {lat_range[1]:.1f}°N | "
-        f"Longitude: {lon_range[0]:.1f} to {lon_range[1]:.1f}°E | "
-        f"LTST: {local_range[0]:.1f} to {local_range[1]:.1f} hrs",
-        fontsize=18, y=1.02, fontweight = 'bold'
-    )
-    
-    plt.tight_layout()
-
-    # === Fijar límites de altitud de manera definitiva (resuelve el problema del autoescalado dado por twinx()) ===
-    if not df_temp.empty:
-        ax1b.set_autoscale_on(False)
-        ax2b.set_autoscale_on(False)
-        ax3b.set_autoscale_on(False)
-        ax1b.set_ylim(alt_min, alt_max)
-        ax2b.set_ylim(alt_min, alt_max)
-        ax3b.set_ylim(alt_min, alt_max)
-
-    return fig
-
-
-
-# ================================================================================================================================
-# ================================================================================================================================
-
-
-
-# --- Streamlit ---
-st.title("Martian Atmospheric Profiles - MCS Data")
-
-fecha_min = datetime.date(2006, 9, 1)  # MROM_2001 = Septiembre 2006
-fecha_max = datetime.date(2030, 12, 31)  # Hasta diciembre 2030
-
-fecha = st.date_input(
-    "Select the observation date:",
-    datetime.date(2009, 7, 25),
-    min_value=fecha_min,
-    max_value=fecha_max
-)
-
-# Cálculo MY y Ls
-MT1 = marstime(datetime.datetime(fecha.year, fecha.month, fecha.day))
-mars_year = MT1.MY
-mars_ls = MT1.Ls # Mirar definición de Ls en directorio marstime
-
-
-if st.button("Find, load and process data"):
-    url_dia = construir_url(fecha)
-    st.write(f"Searching for DDR data in: {url_dia}")
-
-    r = requests.head(url_dia)
-    if r.status_code != 200:
-        st.error("No DDR folder found for that date")
-    else:
-        archivos_tab = listar_tab_files_ddr(url_dia)
-        if not archivos_tab:
-            st.warning("No DDR files found for that date")
-        else:
-            carpeta_local = f"data/{fecha}"
-            archivos_locales = descargar_archivos(archivos_tab, carpeta_local)
-            st.success(f"{len(archivos_locales)} DDR files have been downloaded.")
-
-            df_combinado = cargar_multiples_archivos(carpeta_local)
-            if df_combinado.empty:
-                st.error("Could not load valid data from the downloaded DDR files.")
-            else:
-                st.session_state.df_combinado = df_combinado
-                st.success(f"Data loaded successfully: {len(df_combinado)} records")
-
-# Mostrar controles interactivos si hay datos cargados
-if 'df_combinado' in st.session_state and not st.session_state.df_combinado.empty:
-    df_combinado = st.session_state.df_combinado
-    
-    st.subheader("Display Controls")
-    
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        lat_min = st.slider("Minimum latitude (°N)", -90.0, 90.0, float(df_combinado['Lat'].min()), step=0.1, format="%.2f")
-        lat_max = st.slider("Maximum latitude (°N)", -90.0, 90.0, float(df_combinado['Lat'].max()), step=0.1, format="%.2f")
-
-    
-    with col2:
-        lon_min = st.slider("Minimum longitude (°E)", 0.0, 360.0, float(df_combinado['Lon'].min()), step=0.1, format="%.2f")
-        lon_max = st.slider("Maximum longitude (°E)", 0.0, 360.0, float(df_combinado['Lon'].max()), step=0.1, format="%.2f")
-    
-    with col3:
-        local_min = st.slider("LTST min (hrs)", 0.0, 24.0, 0.0, step=0.1)
-        local_max = st.slider("LTST max (hrs)", 0.0, 24.0, 24.0, step=0.1)
-
-    # Parametros de Mezcla
-    st.sidebar.markdown("**Mixing ratio parameters**")
-    Xvv_CO2_min = st.sidebar.number_input("Xvv_CO2", min_value=0.0, max_value=1.0, value=0.95, step=0.01, format="%.3f")
-    #Xvv_CO2_max = st.sidebar.number_input("Xvv_CO2 max", min_value=0.0, max_value=2.0, value=1.0, step=0.01, format="%.3f")
-    Xvv_CO2_max=1 # Esto no se grafica asi que lo dejamos en uno. Si quisieramos que fuese variable descomentamos la fila superior y comentamos esta. 
-    Xvv_H2O_min = st.sidebar.number_input("Xvv_H2O min", min_value=0.0, max_value=1.0, value=1.0e-5, step=1e-6, format="%.1e")
-    Xvv_H2O_max = st.sidebar.number_input("Xvv_H2O max", min_value=0.0, max_value=1.0, value=9.0e-5, step=1e-6, format="%.1e")
-
-
-
-    # Filtrar datos según los controles
-    df_filtrado = df_combinado[
-        (df_combinado['Lat'].between(lat_min, lat_max)) &
-        (df_combinado['Lon'].between(lon_min, lon_max)) &
-        (df_combinado['LocalTime'].between(local_min, local_max))
-    ].copy()
-
-    # === Añadir columnas Theta y Theta_err al DataFrame original filtrado ===
-    if not df_filtrado.empty and 'T' in df_filtrado.columns and 'Pres' in df_filtrado.columns:
-        df_filtrado['Theta'] = calcular_temp_potencial(df_filtrado['T'], df_filtrado['Pres'])
-        df_filtrado['Theta_err'] = calcular_temp_potencial_err(df_filtrado['T'], df_filtrado['T_err'], df_filtrado['Pres'])
-
-        # Reordenar columnas: colocar Theta y Theta_err justo después de T_err
-        cols = list(df_filtrado.columns)
-        if 'T_err' in cols:
-            idx = cols.index('T_err') + 1
-            for col in ['Theta', 'Theta_err']:
-                cols.insert(idx, cols.pop(cols.index(col)))
-                idx += 1
-            df_filtrado = df_filtrado[cols]
-
-    
-    # Mostrar estadísticas
-    st.write(f"**Data in selected range:** {len(df_filtrado)} records")
-    st.write(f"**Altitude range:** {df_filtrado['Alt'].min():.1f} to {df_filtrado['Alt'].max():.1f} km")
-    st.write(f"**Pressure range:** {df_filtrado['Pres'].min():.3f} to {df_filtrado['Pres'].max():.3f} Pa")
-    
-# Crear y mostrar gráficas
-if st.button("Plot"):
-    fig = crear_graficas(df_filtrado, (lat_min, lat_max), (lon_min, lon_max),
-                          (local_min, local_max), mars_year, mars_ls)
-    if fig:
-        # Guardar la figura en session_state para que sobreviva re-ejecuciones
-        st.session_state.figura = fig
-
-# --- Mostrar figura si existe ---
-if "figura" in st.session_state:
-    st.pyplot(st.session_state.figura)
-
-    # --- Opciones de descarga ---
-    with st.expander("Download options"):
-        formatos = ["jpeg", "png", "pdf", "svg"]
-        formato_seleccionado = st.selectbox("Select download format:", formatos, index=0)
-
-        # Crear buffer de descarga solo si ya existe la figura
-        buf = BytesIO()
-        st.session_state.figura.savefig(buf, format=formato_seleccionado, dpi=300, bbox_inches='tight')
-        buf.seek(0)
-
-        mime_types = {
-            "jpeg": "image/jpeg",
-            "png": "image/png",
-            "pdf": "application/pdf",
-            "svg": "image/svg+xml"
-        }
-        mime_type = mime_types.get(formato_seleccionado, "application/octet-stream")
-
-        st.download_button(
-            label=f"Download image as {formato_seleccionado.upper()}",
-            data=buf.getvalue(),
-            file_name=f"profile_mcs_{fecha}_lat{lat_min}-{lat_max}_lon{lon_min}-{lon_max}.{formato_seleccionado}",
-            mime=mime_type,
-        )
-
-
-    
-    # Mostrar datos en tabla (opcional)
-    if st.checkbox("Display data"):
-        st.dataframe(df_filtrado) 
+# Save as app.py
+# Launch in terminal: streamlit run app.py
+
+import time
+import uuid
+_t_inicio = time.perf_counter()  # Tiempo hasta el primer pintado (panel de rendimiento)
+import streamlit as st
+import datetime
+from mcs.rendimiento import Medidor, activar, etapa, registrar, pico_rss_mb  # Panel de rendimiento
+import warnings
+import importlib.util
+import json
+import os
+# La capa de datos (mcs.pds, mcs.lectura, mcs.almacen...), marstime, pandas y matplotlib se importan
+# en la etapa que los usa: la primera página se pinta sin esperar a cargarlos.
+
+warnings.filterwarnings('ignore', category=RuntimeWarning)
+
+# --- Resumen de la carga en la interfaz ---
+def mostrar_informe_carga(informe):
+    '''Muestra un único resumen compacto de un InformeCargaMultiple'''
+    st.write(f"📈 **Load summary:** {informe}")
+    for erroneo in informe.errores:
+        st.error(f"💥 Error loading file {erroneo.archivo}: {erroneo.error}")
+    if informe.aviso_niveles:
+        st.warning(f"⚠️ {informe.aviso_niveles}")
+    with st.expander("Load report"):
+        if informe.rangos:
+            rangos = informe.rangos
+            st.write(
+                f"Pressure: {rangos['Pres'][0]:.2e} to {rangos['Pres'][1]:.2e} Pa | "
+                f"Temperature: {rangos['T'][0]:.1f} to {rangos['T'][1]:.1f} K | "
+                f"Altitude: {rangos['Alt'][0]:.1f} to {rangos['Alt'][1]:.1f} km | "
+                f"Latitude: {rangos['Lat'][0]:.1f} to {rangos['Lat'][1]:.1f}° | "
+                f"Longitude: {rangos['Lon'][0]:.1f} to {rangos['Lon'][1]:.1f}° | "
+                f"LocalTime: {rangos['LocalTime'][0]:.1f} to {rangos['LocalTime'][1]:.1f}")
+        st.dataframe(informe.tabla(), hide_index=True)
+
+# --- Caché entre sesiones (st.cache_data) de las etapas del proceso ---
+# Las claves son explícitas (fecha/url/archivos/rangos); los DataFrames grandes se pasan
+# con '_' delante para que Streamlit no los tenga que hashear en cada interacción.
+# Como timedelta y no "1h": Streamlit importa pandas para interpretar las cadenas
+TTL_PDS = datetime.timedelta(hours=1)  # Listados del servidor PDS (pueden aparecer días nuevos)
+TTL_DATOS = datetime.timedelta(hours=12)  # Descargas, parseo y selecciones
+MAX_DIAS_CACHE = 16  # Días descargados que se mantienen en caché
+MAX_SELECCIONES_CACHE = 64  # Combinaciones (día, rangos) filtradas y con Theta
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def fechas_marcianas(fecha):
+    '''MY y Ls de una fecha terrestre (a las 00:00 UTC)'''
+    from marstime import marstime
+    MT = marstime(datetime.datetime(fecha.year, fecha.month, fecha.day))
+    return MT.MY, MT.Ls
+
+@st.cache_resource
+def obtener_registro():
+    '''Registro único del servidor: cada día se parsea una vez y todas las sesiones lo comparten (mmap, solo lectura)'''
+    from mcs.registro import RegistroDatos
+    return RegistroDatos()
+
+@st.cache_resource
+def obtener_trabajos():
+    '''Registro único de trabajos en segundo plano: las cargas no bloquean la sesión y se comparten entre sesiones'''
+    from mcs.trabajos import RegistroTrabajos
+    return RegistroTrabajos()
+
+def trabajo_carga(trabajo, fecha, clave_registro, modo_streaming, filtro_carga, registro):
+    '''
+    Descarga y parseo de un día como trabajo en segundo plano (en otro hilo, así que sin llamadas a Streamlit).
+    Devuelve un dict con los mensajes para la sesión, el informe de carga, si el día quedó en el almacen
+    y, en modo memoria, la VistaDatos del día en el registro.
+    '''
+    from mcs.almacen import AlmacenColumnar
+    from mcs.lectura import PROCESOS_CARGA, cargar_multiples_archivos, cargar_multiples_archivos_almacen
+    from mcs.pds import construir_url
+    from mcs.proceso import CARPETA_ALMACEN, carpeta_dia, obtener_dia
+    dia = str(fecha)
+    resultado = {'mensajes': [('write', f"Searching for DDR data in: {construir_url(fecha)}")],
+                 'informe': None, 'en_almacen': False, 'vista': None}
+    trabajo.progreso("Searching the PDS directory...")
+    archivos_locales = obtener_dia(fecha, progreso=lambda hechos, total: trabajo.progreso("Downloading DDR files...", hechos, total))
+    if archivos_locales is None:
+        resultado['mensajes'].append(('error', "No DDR folder found for that date"))
+        return resultado
+    if not archivos_locales:
+        resultado['mensajes'].append(('warning', "No DDR files found for that date"))
+        return resultado
+    resultado['mensajes'].append(('success', f"{len(archivos_locales)} DDR files have been downloaded."))
+
+    # Los archivos se parsean en paralelo (un proceso por núcleo)
+    progreso = lambda hechos, total: trabajo.progreso("Parsing DDR files...", hechos, total)
+    if modo_streaming:
+        # Cada archivo va directamente al almacen en disco; en memoria solo queda lo seleccionado
+        informe = cargar_multiples_archivos_almacen(carpeta_dia(fecha), AlmacenColumnar(CARPETA_ALMACEN), dia=dia,
+                                                    procesos=PROCESOS_CARGA, progreso=progreso, filtro=filtro_carga)
+        resultado['informe'] = informe
+        resultado['en_almacen'] = informe.filas > 0
+    else:
+        def cargador():
+            # Los diagnósticos por perfil vienen del parseo, calculados antes de aplicar la región de carga
+            df, resultado['informe'] = cargar_multiples_archivos(carpeta_dia(fecha), procesos=PROCESOS_CARGA,
+                                                                 progreso=progreso, filtro=filtro_carga)
+            return df
+        # El trabajo guarda una referencia al día hasta que caduca, para que la sesión lo recoja
+        resultado['vista'] = registro.adquirir(clave_registro, cargador)
+    return resultado
+
+def aplicar_carga(dia, clave_registro, region_carga, modo_streaming, en_almacen=False, informe=None, cargador=None):
+    '''
+    Deja el día cargado en la sesión: en el almacen (modo streaming) o como VistaDatos del registro,
+    y lo acumula en el cubo climatológico y en el Hovmoller de la sesión.
+    cargador : función que devuelve el DataFrame del día si no está ya en el registro
+    '''
+    from mcs.almacen import AlmacenColumnar
+    from mcs.climatologia import CuboClimatologico  # Medias zonales y secciones lat-LTST
+    from mcs.hovmoller import HovmollerLsLat  # Ls - latitud de varios años marcianos
+    from mcs.proceso import CARPETA_ALMACEN
+    almacen = AlmacenColumnar(CARPETA_ALMACEN)
+    vista = None
+    if 'cubo' not in st.session_state:
+        st.session_state.cubo = CuboClimatologico()
+    if 'hovmoller' not in st.session_state:
+        st.session_state.hovmoller = HovmollerLsLat()
+
+    if en_almacen and modo_streaming:
+        if 'vista' in st.session_state:
+            st.session_state.pop('vista').liberar()
+        st.session_state.dia_almacen = dia
+        almacen.agregar(st.session_state.cubo, dias=[dia])
+        almacen.agregar(st.session_state.hovmoller, dias=[dia])
+        st.success(f"Data stored successfully: {almacen.num_filas(dias=[dia])} records in {CARPETA_ALMACEN}")
+    elif en_almacen:
+        # Con región solo se leen los grupos de filas que intersectan con ella
+        cargador = lambda: almacen.cargar(region_carga or None, dias=[dia])
+
+    if cargador is not None:
+        # Solo la primera sesión que pide el día ejecuta el cargador; el resto reciben el mismo DataFrame.
+        # Los diagnósticos por perfil vienen del parseo (perfiles completos); aquí solo se añaden a los
+        # trozos del almacen guardados antes que ellos
+        from mcs.diagnosticos import anadir_diagnosticos
+        with st.spinner("Loading day..."):
+            vista = obtener_registro().adquirir(clave_registro, lambda: anadir_diagnosticos(cargador()))
+
+    if vista is not None:
+        st.session_state.pop('dia_almacen', None)
+        # Se suelta la referencia al día anterior para que el registro pueda desalojarlo
+        if 'vista' in st.session_state:
+            st.session_state.pop('vista').liberar()
+        st.session_state.vista = vista
+        st.success(f"Data loaded successfully: {len(vista.df)} records")
+
+        # Acumular el día en el cubo climatológico de la sesión (solo una vez por fecha y con el día completo)
+        if not region_carga:
+            st.session_state.cubo.actualizar(vista.df, dia=dia)
+            st.session_state.hovmoller.actualizar(vista.df, dia=dia)
+    elif cargador is not None or (informe is not None and not en_almacen):
+        st.error("Could not load valid data from the downloaded DDR files.")
+
+@st.fragment(run_every=1.0)
+def seguir_carga():
+    '''Progreso del trabajo de carga de la sesión; se refresca solo, sin re-ejecutar la página, hasta que termina'''
+    carga = st.session_state.get('carga')
+    trabajo = obtener_trabajos().obtener(carga['trabajo']) if carga else None
+    if trabajo is None or trabajo.terminado:
+        st.rerun()  # La página completa recoge el resultado
+    st.progress(trabajo.fraccion or 0.0, text=f"{carga['dia']}: {trabajo.fase or 'Waiting for a free worker...'}")
+    if st.button("Cancel load"):
+        # Si otras sesiones esperan el mismo trabajo, sigue para ellas y solo esta deja de esperarlo
+        if not trabajo.cancelar(st.session_state.id_sesion):
+            carga['abandonada'] = True
+        st.rerun()
+
+@st.cache_data(ttl=TTL_DATOS, max_entries=MAX_SELECCIONES_CACHE, show_spinner=False)
+def seleccionar(clave_dia, rangos, _df=None):
+    '''
+    Filtra un día por rangos y añade Theta/Theta_err (los diagnósticos por perfil ya vienen con el día).
+    clave_dia : ('memoria', dia) con _df el DataFrame del día (del registro), o ('almacen', dia, filas) para leer del almacen
+    '''
+    from mcs.almacen import AlmacenColumnar, filtrar_rangos
+    from mcs.diagnosticos import anadir_diagnosticos
+    from mcs.proceso import CARPETA_ALMACEN
+    from mcs.termodinamica import anadir_temp_potencial
+    with etapa('seleccion') as e:
+        if clave_dia[0] == 'almacen':
+            # Los trozos guardados antes que los diagnósticos no los tienen
+            df = anadir_diagnosticos(AlmacenColumnar(CARPETA_ALMACEN).cargar(dict(rangos), dias=[clave_dia[1]]))
+        else:
+            df = filtrar_rangos(_df, dict(rangos)).copy()
+        df = anadir_temp_potencial(df)
+        e.contar(filas=len(df))
+    return df
+
+def mostrar_tabla(df, clave):
+    '''
+    Tabla paginada de df: el orden, las columnas y la página se resuelven en el servidor y al navegador
+    solo se envían las filas visibles. clave identifica la selección (si cambia se vuelve a la página 1).
+    '''
+    from mcs.tabla import FILAS_POR_PAGINA, TablaPaginada
+    if st.session_state.get('clave_tabla') != clave:
+        st.session_state.tabla = TablaPaginada(df)
+        st.session_state.clave_tabla = clave
+        st.session_state.pagina_tabla = 1
+    tabla = st.session_state.tabla
+
+    col1, col2, col3, col4 = st.columns([4, 2, 1, 1])
+    with col1:
+        columnas = st.multiselect("Columns", list(df.columns), default=list(df.columns), key="columnas_tabla")
+    with col2:
+        orden = st.selectbox("Sort by", [None] + list(df.columns), key="orden_tabla",
+                             format_func=lambda c: "(file order)" if c is None else c)
+    with col3:
+        descendente = st.toggle("Descending", key="descendente_tabla", disabled=orden is None)
+    with col4:
+        filas_pagina = st.selectbox("Rows per page", [50, FILAS_POR_PAGINA, 500], index=1, key="filas_tabla")
+
+    n_paginas = tabla.num_paginas(filas_pagina)
+    st.session_state.pagina_tabla = min(st.session_state.get('pagina_tabla', 1), n_paginas)
+    pagina = st.number_input(f"Page (of {n_paginas})", min_value=1, max_value=n_paginas, key="pagina_tabla")
+    st.dataframe(tabla.pagina(pagina, filas_pagina, columnas, orden, descendente))
+    ini = (pagina - 1) * filas_pagina
+    st.caption(f"Rows {min(ini + 1, tabla.num_filas)} to {min(ini + filas_pagina, tabla.num_filas)} of {tabla.num_filas}")
+
+def mostrar_exportacion(df, rangos, fecha):
+    '''
+    Descarga de df (la selección actual) o de varios días del almacen dentro de rangos, en Parquet,
+    NetCDF o CSV con gzip. El archivo se escribe por lotes solo al pulsar el botón de descarga.
+    '''
+    from mcs.almacen import AlmacenColumnar
+    from mcs.exportacion import FORMATOS_EXPORTACION, TIPOS_MIME, exportar_bytes, lotes_almacen, lotes_df
+    from mcs.proceso import CARPETA_ALMACEN
+    nombres = {'parquet': "Parquet (zstd)", 'netcdf': "NetCDF (CF, profile x pressure level)", 'csv': "CSV (gzip)"}
+    necesita = {'parquet': 'pyarrow', 'netcdf': 'netCDF4', 'csv': None}
+    formatos = [f for f in FORMATOS_EXPORTACION if necesita[f] is None or importlib.util.find_spec(necesita[f])]
+    almacen = AlmacenColumnar(CARPETA_ALMACEN)
+    dias_almacen = almacen.dias()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        formato = st.selectbox("Format", formatos, format_func=nombres.get, key="formato_exportacion",
+                               help="Parquet needs pyarrow and NetCDF needs netCDF4 (pip install -r requirements-extra.txt).")
+    with col2:
+        fuente = st.radio("Data", ["selection", "store"] if dias_almacen else ["selection"], key="fuente_exportacion",
+                          format_func=lambda f: "Current selection" if f == 'selection' else "Days in the local store")
+    if fuente == 'selection':
+        generar = lambda: exportar_bytes(lotes_df(df), formato)
+        nombre = f"mcs_{fecha}_lat{rangos['Lat'][0]}-{rangos['Lat'][1]}_lon{rangos['Lon'][0]}-{rangos['Lon'][1]}"
+        st.caption(f"{len(df)} records")
+        fuera = int((df['Nivel'] < 0).sum()) if 'Nivel' in df.columns else 0
+        if formato == 'netcdf' and fuera:
+            st.warning(f"⚠️ {fuera} records are not on the MCS pressure levels and are left out of the NetCDF file")
+    else:
+        primero = datetime.date.fromisoformat(dias_almacen[0])
+        ultimo = datetime.date.fromisoformat(dias_almacen[-1])
+        dias_rango = st.date_input("Days", value=(primero, ultimo), min_value=primero, max_value=ultimo,
+                                   key="dias_exportacion")
+        if len(dias_rango) != 2:
+            return
+        dias = [d for d in dias_almacen if str(dias_rango[0]) <= d <= str(dias_rango[1])]
+        generar = lambda: exportar_bytes(lotes_almacen(almacen, dias, rangos), formato)
+        nombre = f"mcs_{dias_rango[0]}_{dias_rango[1]}"
+        st.caption(f"{len(dias)} day(s) in the store, with the latitude, longitude and LTST ranges of the Display Controls")
+        if formato == 'netcdf':
+            st.caption("Records that are not on the MCS pressure levels are left out of the NetCDF file")
+    st.download_button(f"Download {nombres[formato].split(' ')[0]}", data=generar,
+                       file_name=nombre + FORMATOS_EXPORTACION[formato], mime=TIPOS_MIME[formato])
+
+# ================================================================================================================================
+# ================================================================================================================================
+
+
+
+# --- Streamlit ---
+st.title("Martian Atmospheric Profiles - MCS Data")
+
+# Tiempos y contadores de las etapas que se ejecutan en esta sesión (panel de rendimiento)
+if 'medidor' not in st.session_state:
+    st.session_state.medidor = Medidor()
+activar(st.session_state.medidor)
+# Identifica la sesión ante los trabajos en segundo plano que comparte con otras
+if 'id_sesion' not in st.session_state:
+    st.session_state.id_sesion = uuid.uuid4().hex
+
+fecha_min = datetime.date(2006, 9, 1)  # MROM_2001 = Septiembre 2006
+fecha_max = datetime.date(2030, 12, 31)  # Hasta diciembre 2030
+
+fecha = st.date_input(
+    "Select the observation date:",
+    datetime.date(2009, 7, 25),
+    min_value=fecha_min,
+    max_value=fecha_max
+)
+
+
+modo_streaming = st.sidebar.checkbox(
+    "Streaming mode (on-disk store)", value=False,
+    help="Parsed files are appended to an on-disk columnar store and only the rows in the selected ranges are loaded into memory. Use it for long ingestions.")
+
+# Región que se carga: los perfiles de fuera se saltan al parsear, sin decodificar sus niveles
+region_carga = {}
+if st.sidebar.checkbox("Load only a region", value=False,
+                       help="Profiles outside these ranges are skipped while the DDR files are parsed (or while the local store is read), so only the region is kept in memory. The Display Controls then work inside it. The day is not added to the climatology."):
+    region_carga['Lat'] = st.sidebar.slider("Load latitude (°N)", -90.0, 90.0, (-90.0, 90.0), step=0.5)
+    region_carga['Lon'] = st.sidebar.slider("Load longitude (°E)", 0.0, 360.0, (0.0, 360.0), step=0.5)
+    region_carga['LocalTime'] = st.sidebar.slider("Load LTST (hrs)", 0.0, 24.0, (0.0, 24.0), step=0.1)
+    region_carga['Pres'] = (st.sidebar.number_input("Load pressure min (Pa)", min_value=0.0, value=0.0, format="%.3g"),
+                            st.sidebar.number_input("Load pressure max (Pa)", min_value=0.0, value=2000.0, format="%.3g"))
+
+if 'primer_pintado' not in st.session_state:
+    # Primera ejecución de la sesión: desde el inicio del script hasta que la página inicial está enviada
+    st.session_state.primer_pintado = time.perf_counter() - _t_inicio
+    registrar('primer_pintado', st.session_state.primer_pintado)
+
+if st.button("Find, load and process data"):
+    # Capa de datos (sin Streamlit, reutilizable desde trabajos por lotes)
+    from mcs.almacen import AlmacenColumnar  # Modo streaming en disco
+    from mcs.lectura import FILTRO_POR_DEFECTO, PROCESOS_CARGA, cargar_multiples_archivos
+    # Se aplica al decodificar: perfiles repetidos entre DDR que se solapan, filas sin Pres/T/Alt/Lat/Lon
+    # (el mismo filtro que python -m mcs) y, en modo memoria, las filas fuera de la región de carga
+    filtro_carga = FILTRO_POR_DEFECTO.con_rangos(None if modo_streaming else region_carga)
+    from mcs.proceso import CARPETA_ALMACEN, carpeta_dia  # Almacen columnar compartido con python -m mcs
+    dia = str(fecha)
+    # El almacen guarda siempre el día completo; en memoria cada región es un conjunto distinto del registro
+    region_carga = {} if modo_streaming else region_carga
+    clave_registro = f"{dia} {sorted(region_carga.items())}" if region_carga else dia
+    almacen = AlmacenColumnar(CARPETA_ALMACEN)
+    registro = obtener_registro()
+
+    if dia in almacen.dias():
+        # Día ya precalentado (p.ej. con python -m mcs --prewarm): no se descarga ni se parsea de nuevo
+        st.info(f"{dia} is already in the local store ({CARPETA_ALMACEN}), it is not downloaded again.")
+        aplicar_carga(dia, clave_registro, region_carga, modo_streaming, en_almacen=True)
+    elif not modo_streaming and clave_registro in registro:
+        # Otra sesión ya cargó este día: se comparte sin volver a descargar ni parsear
+        st.info(f"{dia} is already loaded in this server, it is shared with the other sessions.")
+        aplicar_carga(dia, clave_registro, region_carga, modo_streaming,
+                      cargador=lambda: cargar_multiples_archivos(carpeta_dia(fecha), procesos=PROCESOS_CARGA,
+                                                                 filtro=filtro_carga)[0])
+    else:
+        # Descarga y parseo en segundo plano: la sesión sigue respondiendo mientras tanto, un clic en otro
+        # control no pierde el trabajo y dos sesiones que piden lo mismo comparten uno solo
+        trabajo = obtener_trabajos().enviar(
+            ('carga', modo_streaming, clave_registro),
+            lambda t: trabajo_carga(t, fecha, clave_registro, modo_streaming, filtro_carga, registro),
+            descripcion=f"Load {clave_registro}" + (" (store)" if modo_streaming else ""),
+            liberar=lambda r: r['vista'].liberar() if r['vista'] is not None else None,
+            suscriptor=st.session_state.id_sesion)
+        st.session_state.carga = {'trabajo': trabajo.id, 'dia': dia, 'clave': clave_registro,
+                                  'region': region_carga, 'streaming': modo_streaming}
+
+# --- Carga en segundo plano de la sesión ---
+if 'carga' in st.session_state:
+    from mcs.trabajos import CANCELADO, ERROR
+    carga = st.session_state.carga
+    trabajo = obtener_trabajos().obtener(carga['trabajo'])
+    if trabajo is None:
+        st.session_state.pop('carga')
+        st.warning(f"The load of {carga['dia']} has expired, click \"Find, load and process data\" again.")
+    elif carga.get('abandonada'):
+        st.session_state.pop('carga')
+        st.warning(f"The load of {carga['dia']} was cancelled for this session (other sessions are still loading it).")
+    elif trabajo.terminado:
+        st.session_state.pop('carga')
+        if trabajo.estado == CANCELADO:
+            st.warning(f"The load of {carga['dia']} was cancelled.")
+        elif trabajo.estado == ERROR:
+            st.error(f"The load of {carga['dia']} failed: {trabajo.error}")
+        else:
+            resultado = trabajo.resultado
+            for tipo, texto in resultado['mensajes']:
+                getattr(st, tipo)(texto)
+            if resultado['informe'] is not None:
+                mostrar_informe_carga(resultado['informe'])
+            vista_trabajo = resultado['vista']
+            aplicar_carga(carga['dia'], carga['clave'], carga['region'], carga['streaming'],
+                          en_almacen=resultado['en_almacen'], informe=resultado['informe'],
+                          cargador=(lambda: vista_trabajo.df) if vista_trabajo is not None else None)
+    else:
+        seguir_carga()
+
+# Mostrar controles interactivos si hay datos cargados
+hay_datos_memoria = 'vista' in st.session_state
+hay_datos_almacen = 'dia_almacen' in st.session_state
+
+if hay_datos_memoria or hay_datos_almacen:
+    if hay_datos_memoria:
+        df_combinado = st.session_state.vista.df  # Solo lectura, compartido con otras sesiones
+        limites = {col: (float(df_combinado[col].min()), float(df_combinado[col].max())) for col in ['Lat', 'Lon']}
+    else:
+        from mcs.almacen import AlmacenColumnar
+        from mcs.proceso import CARPETA_ALMACEN
+        almacen = AlmacenColumnar(CARPETA_ALMACEN)
+        limites = almacen.estadisticas(dias=[st.session_state.dia_almacen])
+    
+    st.subheader("Display Controls")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        lat_min = st.slider("Minimum latitude (°N)", -90.0, 90.0, limites['Lat'][0], step=0.1, format="%.2f")
+        lat_max = st.slider("Maximum latitude (°N)", -90.0, 90.0, limites['Lat'][1], step=0.1, format="%.2f")
+
+    
+    with col2:
+        lon_min = st.slider("Minimum longitude (°E)", 0.0, 360.0, limites['Lon'][0], step=0.1, format="%.2f")
+        lon_max = st.slider("Maximum longitude (°E)", 0.0, 360.0, limites['Lon'][1], step=0.1, format="%.2f")
+    
+    with col3:
+        local_min = st.slider("LTST min (hrs)", 0.0, 24.0, 0.0, step=0.1)
+        local_max = st.slider("LTST max (hrs)", 0.0, 24.0, 24.0, step=0.1)
+
+    # Parametros de Mezcla
+    st.sidebar.markdown("**Mixing ratio parameters**")
+    Xvv_CO2_min = st.sidebar.number_input("Xvv_CO2", min_value=0.0, max_value=1.0, value=0.95, step=0.01, format="%.3f")
+    #Xvv_CO2_max = st.sidebar.number_input("Xvv_CO2 max", min_value=0.0, max_value=2.0, value=1.0, step=0.01, format="%.3f")
+    Xvv_CO2_max=1 # Esto no se grafica asi que lo dejamos en uno. Si quisieramos que fuese variable descomentamos la fila superior y comentamos esta. 
+    Xvv_H2O_min = st.sidebar.number_input("Xvv_H2O min", min_value=0.0, max_value=1.0, value=1.0e-5, step=1e-6, format="%.1e")
+    Xvv_H2O_max = st.sidebar.number_input("Xvv_H2O max", min_value=0.0, max_value=1.0, value=9.0e-5, step=1e-6, format="%.1e")
+
+
+
+    # Filtrar datos según los controles y añadir Theta/Theta_err (en caché por día y rangos)
+    rangos = {'Lat': (lat_min, lat_max), 'Lon': (lon_min, lon_max), 'LocalTime': (local_min, local_max)}
+    if hay_datos_memoria:
+        clave_dia = ('memoria', st.session_state.vista.clave)
+        df_filtrado = seleccionar(clave_dia, tuple(rangos.items()), _df=df_combinado)
+    else:
+        # Solo se leen del disco los trozos que intersectan con los rangos seleccionados
+        dia_almacen = st.session_state.dia_almacen
+        clave_dia = ('almacen', dia_almacen, almacen.num_filas(dias=[dia_almacen]))
+        df_filtrado = seleccionar(clave_dia, tuple(rangos.items()))
+    clave_seleccion = (clave_dia, tuple(rangos.items()))
+
+    
+    # Mostrar estadísticas
+    st.write(f"**Data in selected range:** {len(df_filtrado)} records")
+    st.write(f"**Altitude range:** {df_filtrado['Alt'].min():.1f} to {df_filtrado['Alt'].max():.1f} km")
+    st.write(f"**Pressure range:** {df_filtrado['Pres'].min():.3f} to {df_filtrado['Pres'].max():.3f} Pa")
+
+    # --- Exportar la selección o varios días del almacen (se escribe por lotes al pulsar el botón) ---
+    with st.expander("Export data"):
+        mostrar_exportacion(df_filtrado, rangos, fecha)
+    
+# Gráficas interactivas (Plotly, opcional): los puntos se diezman en el servidor al tamaño del panel
+graficas_interactivas = st.sidebar.checkbox(
+    "Interactive plots (WebGL)", value=False, disabled=importlib.util.find_spec("plotly") is None,
+    help="Zoomable WebGL plots that follow the Display Controls. Only about one point per pixel of the visible window is sent; select points to zoom in with full detail. Needs plotly (pip install -r requirements-extra.txt).")
+
+# Crear y mostrar gráficas
+if st.button("Plot"):
+    # Cálculo MY y Ls (en caché: no se recalcula en cada interacción)
+    mars_year, mars_ls = fechas_marcianas(fecha) # Mirar definición de Ls en directorio marstime
+    if graficas_interactivas:
+        st.session_state.pop('figura', None)
+        st.session_state.pop('args_figura', None)
+        st.session_state.interactiva = (mars_year, mars_ls)
+        st.session_state.ventana_interactiva = None
+    else:
+        from mcs.graficas import crear_graficas, renderizar  # matplotlib solo se carga al pintar
+        st.session_state.pop('interactiva', None)
+        args_figura = ((df_filtrado, (lat_min, lat_max), (lon_min, lon_max), (local_min, local_max), mars_year, mars_ls),
+                       dict(Xvv_CO2_min=Xvv_CO2_min, Xvv_H2O_min=Xvv_H2O_min, Xvv_H2O_max=Xvv_H2O_max))
+        imagen = renderizar(crear_graficas, *args_figura[0], **args_figura[1])
+        if imagen is None:
+            st.warning("There is no data for the range selected")
+        else:
+            # Guardar la imagen (no la figura, que ya se ha liberado) para que sobreviva re-ejecuciones,
+            # y los argumentos para volver a pintarla en el formato de descarga
+            st.session_state.figura = imagen
+            st.session_state.args_figura = args_figura
+
+# --- Gráfica interactiva: se rehace con los controles actuales en cada ejecución ---
+if 'interactiva' in st.session_state and (hay_datos_memoria or hay_datos_almacen):
+    from mcs.interactivas import crear_graficas_interactivas, ventana_seleccion
+    mars_year, mars_ls = st.session_state.interactiva
+    ventana = st.session_state.get('ventana_interactiva')
+    fig_interactiva, info = crear_graficas_interactivas(
+        df_filtrado, (lat_min, lat_max), (lon_min, lon_max), (local_min, local_max), mars_year, mars_ls,
+        ventana=ventana, Xvv_CO2_min=Xvv_CO2_min, Xvv_H2O_min=Xvv_H2O_min, Xvv_H2O_max=Xvv_H2O_max)
+    if fig_interactiva is None:
+        st.warning("There is no data for the range selected")
+    else:
+        st.caption(f"{info['puntos']} of {info['total']} points drawn (decimated to the plot size). "
+                   "Select points (box or lasso) to zoom in with full detail.")
+        # Una clave por ventana: al cambiar de zoom la selección anterior no se vuelve a aplicar
+        n_zoom = st.session_state.get('n_zoom', 0)
+        with etapa('render'):
+            evento = st.plotly_chart(fig_interactiva, on_select="rerun", selection_mode=("box", "lasso"),
+                                     key=f"grafica_interactiva_{n_zoom}")
+        nueva = ventana_seleccion(evento.selection.points, info['paneles']) if evento and evento.selection.points else None
+        if nueva is not None:
+            st.session_state.ventana_interactiva = nueva
+            st.session_state.n_zoom = n_zoom + 1
+            st.rerun()
+        if ventana is not None and st.button("Reset zoom"):
+            st.session_state.ventana_interactiva = None
+            st.session_state.n_zoom = n_zoom + 1
+            st.rerun()
+
+# --- Mostrar figura si existe ---
+if "figura" in st.session_state:
+    with etapa('render'):
+        st.image(st.session_state.figura)
+
+    # --- Opciones de descarga ---
+    with st.expander("Download options"):
+        formatos = ["jpeg", "png", "pdf", "svg"]
+        formato_seleccionado = st.selectbox("Select download format:", formatos, index=0)
+
+        # La figura del formato elegido se pinta en el pool de render solo al pulsar el botón
+        from mcs.graficas import crear_graficas, renderizar
+        args, kwargs = st.session_state.args_figura
+        descargar_figura = lambda: renderizar(crear_graficas, *args, formato=formato_seleccionado, dpi=300, **kwargs)
+
+        mime_types = {
+            "jpeg": "image/jpeg",
+            "png": "image/png",
+            "pdf": "application/pdf",
+            "svg": "image/svg+xml"
+        }
+        mime_type = mime_types.get(formato_seleccionado, "application/octet-stream")
+
+        st.download_button(
+            label=f"Download image as {formato_seleccionado.upper()}",
+            data=descargar_figura,
+            file_name=f"profile_mcs_{fecha}_lat{lat_min}-{lat_max}_lon{lon_min}-{lon_max}.{formato_seleccionado}",
+            mime=mime_type,
+        )
+
+
+    
+    # Mostrar datos en tabla (opcional): paginada, solo se envía la página visible
+    if st.checkbox("Display data"):
+        mostrar_tabla(df_filtrado, clave_seleccion)
+    else:
+        st.session_state.pop('tabla', None)
+        st.session_state.pop('clave_tabla', None)
+
+# --- Climatología acumulada de los días cargados ---
+if 'cubo' in st.session_state and st.session_state.cubo.dias:
+    cubo = st.session_state.cubo
+    st.subheader("Climatology")
+    st.write(f"**Days accumulated:** {', '.join(sorted(cubo.dias))}")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        producto = st.selectbox("Product", ["zonal", "lat_ltst"],
+                                format_func=lambda p: "Zonal mean (latitude vs pressure)" if p == 'zonal' else "Latitude vs LTST")
+    with col2:
+        variable_clima = st.selectbox("Variable", list(cubo.variables))
+
+    pres_clima = None
+    if producto == 'lat_ltst':
+        pres_clima = st.select_slider("Pressure range (Pa)", options=[float(f"{b:.3g}") for b in cubo.bordes['pres']],
+                                      value=(float(f"{cubo.bordes['pres'][10]:.3g}"), float(f"{cubo.bordes['pres'][20]:.3g}")))
+
+    if st.button("Plot climatology"):
+        from mcs.graficas import crear_grafica_climatologia, renderizar
+        imagen_clima = renderizar(crear_grafica_climatologia, cubo, producto, variable_clima, pres_clima)
+        if imagen_clima is None:
+            st.warning("There is no data for the product selected")
+        else:
+            st.image(imagen_clima)
+
+    if st.button("Reset climatology"):
+        del st.session_state.cubo
+
+# --- Hovmöller Ls - latitud (varios años marcianos) ---
+# De la sesión o del almacen (lo mantiene python -m mcs --sync); se pinta desde los arrays acumulados
+if st.sidebar.checkbox("Seasonal evolution (Ls - latitude)", value=False,
+                       help="Ls - latitude sections of several Mars years, from the days loaded in this session or from the local store kept by python -m mcs --sync."):
+    from mcs.proceso import CARPETA_ALMACEN
+    from mcs.sincronizacion import ARCHIVO_HOVMOLLER
+    ruta_hovmoller = os.path.join(CARPETA_ALMACEN, ARCHIVO_HOVMOLLER)
+    fuentes = ((["session"] if 'hovmoller' in st.session_state and st.session_state.hovmoller.dias else [])
+               + (["store"] if os.path.exists(ruta_hovmoller) else []))
+    st.subheader("Seasonal evolution (Ls - latitude)")
+    if not fuentes:
+        st.info("Load some days, or run python -m mcs --sync to accumulate them in the local store.")
+    else:
+        fuente = st.radio("Source", fuentes, horizontal=True,
+                          format_func=lambda f: "Days loaded in this session" if f == 'session' else "Local store (python -m mcs --sync)")
+        if fuente == 'session':
+            hov = st.session_state.hovmoller
+        else:
+            from mcs.hovmoller import HovmollerLsLat
+            hov = HovmollerLsLat.cargar(ruta_hovmoller)
+        st.write(f"**Days accumulated:** {len(hov.dias)} | **Mars years:** {', '.join(str(a) for a in hov.anios) or '-'}")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            variable_hov = st.selectbox("Variable", list(hov.variables), key="variable_hovmoller")
+        with col2:
+            nivel_hov = st.selectbox("Pressure level", list(hov.niveles),
+                                     format_func=lambda k: f"{hov.presiones()[hov.niveles.index(k)]:.3g} Pa")
+        with col3:
+            anios_hov = st.multiselect("Mars years", hov.anios, default=hov.anios)
+
+        if st.button("Plot Ls - latitude"):
+            from mcs.graficas import crear_grafica_hovmoller, renderizar
+            imagen_hov = renderizar(crear_grafica_hovmoller, hov, variable_hov, nivel_hov, anios_hov)
+            if imagen_hov is None:
+                st.warning("There is no data for the level and years selected")
+            else:
+                st.image(imagen_hov)
+
+        if fuente == 'session' and st.button("Reset Ls - latitude"):
+            del st.session_state.hovmoller
+
+# --- Panel de rendimiento ---
+if st.sidebar.checkbox("Performance panel", value=False,
+                       help="Time, throughput and memory of each pipeline stage run in this session."):
+    medidor = st.session_state.medidor
+    st.subheader("Performance")
+    rss = pico_rss_mb()
+    if rss is not None:
+        st.write(f"**Peak RSS of the server process:** {rss:.0f} MB")
+    tabla_rendimiento = medidor.tabla()
+    if tabla_rendimiento.empty:
+        st.info("No pipeline stage has run yet in this session.")
+    else:
+        st.dataframe(tabla_rendimiento, hide_index=True)
+    with st.expander("Shared datasets"):
+        st.dataframe(obtener_registro().estado(), hide_index=True)
+    with st.expander("Background jobs"):
+        st.dataframe(obtener_trabajos().estado(), hide_index=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Download JSON report", data=json.dumps(medidor.como_dict(), indent=1),
+                           file_name="mcs_performance.json", mime="application/json")
+    with col2:
+        if st.button("Reset counters"):
+            medidor.reiniciar()
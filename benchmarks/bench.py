@@ -0,0 +1,264 @@
+#########################################################################
+#Benchmarks de los caminos criticos: parseo de DDR, conversiones de
+#marstime, temperatura potencial, figura de perfiles y tiempo hasta el
+#primer pintado de la app en un proceso nuevo. Los datos son DDR
+#sinteticos (generador_ddr.py), asi que no hace falta acceso al PDS.
+#Los resultados se guardan en JSON para comparar entre versiones:
+#
+#  python benchmarks/bench.py --scale medium --label antes
+#  python benchmarks/bench.py --scale medium --label despues --compare benchmarks/resultados/antes.json
+#  python benchmarks/bench.py --verify   # nucleos Numba frente a la version NumPy
+#########################################################################
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import matplotlib
+import numpy as np
+
+from generador_ddr import VERSION_DATOS, generar_dia
+from marstime import marstime, MYLs2julian, Mars_Ls, Mars_Year, dt2j2000_ott, equation_of_center
+from mcs.diagnosticos import calcular_diagnosticos
+from mcs.exportacion import exportar_bytes, lotes_df
+from mcs.graficas import crear_graficas, liberar_figura, renderizar
+from mcs.interactivas import diezmar
+from mcs.lectura import PROCESOS_CARGA, FiltroCarga, cargar_archivo, cargar_multiples_archivos
+from mcs.tabla import TablaPaginada
+from mcs.termodinamica import (calcular_temp_potencial, calcular_temp_potencial_err, anadir_temp_potencial, frac_T,
+                               frac_T_dev)
+
+CARPETA_DATOS = RAIZ / "benchmarks" / "datos"
+CARPETA_RESULTADOS = RAIZ / "benchmarks" / "resultados"
+# Escala -> (archivos por día, perfiles por archivo, repeticiones)
+ESCALAS = {'small': (3, 50, 5), 'medium': (10, 200, 5), 'large': (30, 400, 3)}
+APP = RAIZ / "MCS_code.py"
+UMBRAL_REGRESION = 1.10  # Mediana nueva / mediana base a partir de la cual se marca una regresión
+TOLERANCIA_NUCLEOS = 1e-10  # Diferencia relativa máxima entre los núcleos Numba y la versión NumPy
+
+
+def preparar_datos(escala):
+    '''Genera (una sola vez) el día sintético de la escala y devuelve su carpeta'''
+    archivos, perfiles, _ = ESCALAS[escala]
+    carpeta = CARPETA_DATOS / escala
+    version = carpeta / "version"
+    if len(list(carpeta.glob("*.TAB"))) != archivos or not version.exists() or version.read_text() != str(VERSION_DATOS):
+        for archivo in carpeta.glob("*.TAB"):
+            archivo.unlink()
+        generar_dia(carpeta, archivos, perfiles)
+        version.write_text(str(VERSION_DATOS))
+    return carpeta
+
+def medir(funcion, repeticiones):
+    '''Ejecuta funcion() repeticiones veces (tras una de calentamiento) y devuelve los tiempos en s'''
+    funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - t0)
+    return tiempos
+
+def medir_primer_pintado(repeticiones):
+    '''
+    Tiempo hasta el primer pintado de la app en un proceso nuevo (arranque en frío): cada repetición
+    importa streamlit (ya cargado en el servidor) y ejecuta una vez MCS_code.py con AppTest.
+    Es el valor 'primer_pintado' que la propia app registra en su medidor.
+    '''
+    codigo = ("import sys; sys.path.insert(0, sys.argv[2]); import streamlit\n"
+              "from streamlit.testing.v1 import AppTest\n"
+              "at = AppTest.from_file(sys.argv[1], default_timeout=120).run()\n"
+              "print(at.session_state['primer_pintado'])")
+    tiempos = []
+    with tempfile.TemporaryDirectory() as carpeta:  # La app no debe tocar data/ del repositorio
+        for _ in range(repeticiones):
+            salida = subprocess.run([sys.executable, "-c", codigo, str(APP), str(RAIZ)], cwd=carpeta,
+                                    capture_output=True, text=True, check=True).stdout
+            tiempos.append(float(salida.split()[-1]))
+    return tiempos
+
+
+def dias_j2000(n=100000):
+    '''Fechas J2000 (días) repartidas entre 2006 y 2030, como las de los perfiles MCS'''
+    return np.linspace(2436.5, 11322.5, n)
+
+def casos(carpeta):
+    '''{nombre: (función sin argumentos, unidades procesadas por llamada)}'''
+    archivos = sorted(carpeta.glob("*.TAB"))
+    df, _ = cargar_multiples_archivos(carpeta)
+    df = anadir_temp_potencial(df)
+    T, P = df['T'].to_numpy(), df['Pres'].to_numpy()
+    T_err = df['T_err'].to_numpy()
+    j2000_array = dias_j2000()
+
+    fechas = [datetime.datetime(2009, 7, 25) + datetime.timedelta(hours=h) for h in range(100)]
+    j2000 = [dt2j2000_ott(f) for f in fechas]
+    ls = np.linspace(0, 359, 100)
+
+    def figura():
+        fig = crear_graficas(df, (-90.0, 90.0), (0.0, 360.0), (0.0, 24.0), 29, 250.0)
+        liberar_figura(fig)
+
+    return {
+        'cargar_archivo': (lambda: cargar_archivo(archivos[0]), {'bytes': archivos[0].stat().st_size}),
+        'cargar_multiples_archivos': (lambda: cargar_multiples_archivos(carpeta),
+                                      {'bytes': sum(a.stat().st_size for a in archivos)}),
+        # Un proceso por núcleo (PROCESOS_CARGA): comparar con el anterior para ver cómo escala
+        'cargar_multiples_archivos_paralelo': (lambda: cargar_multiples_archivos(carpeta, procesos=PROCESOS_CARGA),
+                                               {'bytes': sum(a.stat().st_size for a in archivos)}),
+        # Solo una región: los perfiles de fuera se saltan sin decodificar
+        'cargar_region': (lambda: cargar_multiples_archivos(carpeta, filtro=FiltroCarga(rangos={'Lat': (-30.0, 30.0),
+                                                                                               'Lon': (0.0, 90.0)})),
+                          {'bytes': sum(a.stat().st_size for a in archivos)}),
+        'marstime': (lambda: [marstime(f) for f in fechas], {'llamadas': len(fechas)}),
+        'MYLs2julian': (lambda: [MYLs2julian(29, l) for l in ls], {'llamadas': len(ls)}),
+        'Mars_Year': (lambda: [Mars_Year(j) for j in j2000], {'llamadas': len(j2000)}),
+        # Arrays: con numba instalado van por los núcleos compilados (marstime.nucleos, mcs.nucleos)
+        'Mars_Ls_array': (lambda: Mars_Ls(j2000_array), {'elementos': len(j2000_array)}),
+        'calcular_temp_potencial': (lambda: calcular_temp_potencial(T, P), {'filas': len(T)}),
+        'calcular_temp_potencial_err': (lambda: calcular_temp_potencial_err(T, T_err, P), {'filas': len(T)}),
+        'calcular_diagnosticos': (lambda: calcular_diagnosticos(df['Perfil'], P, T, df['Alt']), {'filas': len(T)}),
+        'crear_graficas': (figura, {'filas': len(df)}),
+        # Figura + PNG en el pool de render, como la pinta la app
+        'renderizar': (lambda: renderizar(crear_graficas, df, (-90.0, 90.0), (0.0, 360.0), (0.0, 24.0), 29, 250.0),
+                       {'filas': len(df)}),
+        # Exportación por lotes (CSV con gzip: no necesita pyarrow ni netCDF4)
+        'exportar_csv': (lambda: exportar_bytes(lotes_df(df), 'csv'), {'filas': len(df)}),
+        # Primera página de la tabla de datos ordenada por una columna (tabla nueva: sin órdenes guardados)
+        'tabla_pagina': (lambda: TablaPaginada(df).pagina(1, orden='T', descendente=True), {'filas': len(df)}),
+        # Puntos que se envían al navegador en las gráficas interactivas
+        'diezmar': (lambda: diezmar(T, P, (50.0, 300.0), (float(np.nanmin(P)), float(np.nanmax(P)))), {'filas': len(T)}),
+    }
+
+def resumir(nombre, tiempos, unidades):
+    mediana = statistics.median(tiempos)
+    print(f"{nombre:34s} min {min(tiempos) * 1e3:10.2f} ms   median {mediana * 1e3:10.2f} ms")
+    return {'min_s': min(tiempos), 'mediana_s': mediana, 'tiempos_s': tiempos,
+            **unidades, **{f'{u}_por_s': v / mediana for u, v in unidades.items()}}
+
+def ejecutar(escala, seleccion=None):
+    '''Ejecuta los benchmarks y devuelve el dict de resultados'''
+    carpeta = preparar_datos(escala)
+    repeticiones = ESCALAS[escala][2]
+    resultados = {}
+    for nombre, (funcion, unidades) in casos(carpeta).items():
+        if seleccion and nombre not in seleccion:
+            continue
+        tiempos = medir(funcion, repeticiones)
+        resultados[nombre] = resumir(nombre, tiempos, unidades)
+    if not seleccion or 'primer_pintado' in seleccion:
+        resultados['primer_pintado'] = resumir('primer_pintado', medir_primer_pintado(repeticiones), {})
+    return resultados
+
+
+
+def verificar(carpeta, tolerancia=TOLERANCIA_NUCLEOS):
+    '''
+    Compara los núcleos Numba con la versión NumPy sobre los datos del benchmark.
+    Devuelve los nombres de las funciones que difieren más que tolerancia (relativa).
+    '''
+    import marstime.nucleos
+    import mcs.nucleos
+    if not (marstime.nucleos.use_numba and mcs.nucleos.use_numba):
+        print("numba is not installed: there are no compiled kernels to verify (pip install -r requirements-extra.txt)")
+        return []
+    df, _ = cargar_multiples_archivos(carpeta)
+    # En float64, como en calcular_temp_potencial (con float32 frac_T no usa los núcleos)
+    T, P, T_err = (df[c].to_numpy(dtype=float) for c in ('T', 'Pres', 'T_err'))
+    j2000 = dias_j2000()
+    funciones = {
+        'equation_of_center': (equation_of_center, (j2000,)),
+        'Mars_Ls': (Mars_Ls, (j2000,)),
+        'frac_T': (frac_T, (T,)),
+        'frac_T_dev': (frac_T_dev, (T,)),
+        'calcular_temp_potencial': (calcular_temp_potencial, (T, P)),
+        'calcular_temp_potencial_err': (calcular_temp_potencial_err, (T, T_err, P)),
+    }
+    distintas = []
+    for nombre, (funcion, argumentos) in funciones.items():
+        compilado = funcion(*argumentos)
+        marstime.nucleos.use_numba = mcs.nucleos.use_numba = False
+        try:
+            referencia = funcion(*argumentos)
+        finally:
+            marstime.nucleos.use_numba = mcs.nucleos.use_numba = True
+        iguales = np.allclose(compilado, referencia, rtol=tolerancia, atol=0.0, equal_nan=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            diferencia = np.nanmax(np.abs(compilado - referencia) / np.abs(referencia), initial=0.0)
+        if not iguales:
+            distintas.append(nombre)
+        print(f"{nombre:34s} max relative difference {diferencia:9.2e}{'' if iguales else '  MISMATCH'}")
+    return distintas
+
+def metadatos(escala):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    import pandas
+    try:
+        import numba
+        version_numba = numba.__version__
+    except ImportError:
+        version_numba = None  # Núcleos con NumPy
+    return {'escala': escala, 'archivos_perfiles_repeticiones': ESCALAS[escala], 'commit': commit,
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pandas.__version__, 'matplotlib': matplotlib.__version__,
+            'numba': version_numba,
+            'maquina': platform.platform(), 'cpus': os.cpu_count()}
+
+def comparar(resultados, ruta_base, umbral=UMBRAL_REGRESION):
+    '''Imprime mediana nueva / mediana base por benchmark. Devuelve los nombres con regresión'''
+    with open(ruta_base) as f:
+        base = json.load(f)
+    if base['meta']['escala'] != resultados['meta']['escala']:
+        print(f"Warning: baseline scale is {base['meta']['escala']}")
+    regresiones = []
+    print(f"\nComparison with {ruta_base} (commit {base['meta'].get('commit')}):")
+    for nombre, r in resultados['benchmarks'].items():
+        if nombre not in base['benchmarks']:
+            continue
+        ratio = r['mediana_s'] / base['benchmarks'][nombre]['mediana_s']
+        marca = "  REGRESSION" if ratio > umbral else ""
+        if ratio > umbral:
+            regresiones.append(nombre)
+        print(f"{nombre:34s} x{ratio:6.2f}{marca}")
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the MCS parse, marstime and plot hot paths on synthetic DDR data.")
+    parser.add_argument("--scale", choices=list(ESCALAS), default="small")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="Run only these benchmarks")
+    parser.add_argument("--label", help="Results file name (default: <commit>_<scale>)")
+    parser.add_argument("--compare", metavar="JSON", help="Baseline results to compare against")
+    parser.add_argument("--threshold", type=float, default=UMBRAL_REGRESION,
+                        help="Median ratio flagged as regression (default: %(default)s)")
+    parser.add_argument("--verify", action="store_true",
+                        help="Only check that the Numba kernels give the same results as NumPy (exit status 1 if not)")
+    args = parser.parse_args()
+
+    if args.verify:
+        sys.exit(1 if verificar(preparar_datos(args.scale)) else 0)
+    resultados = {'meta': metadatos(args.scale), 'benchmarks': ejecutar(args.scale, args.only)}
+    CARPETA_RESULTADOS.mkdir(parents=True, exist_ok=True)
+    etiqueta = args.label or f"{resultados['meta']['commit']}_{args.scale}"
+    ruta = CARPETA_RESULTADOS / f"{etiqueta}.json"
+    with open(ruta, "w") as f:
+        json.dump(resultados, f, indent=1)
+    print(f"Results saved to {ruta}")
+    if args.compare and comparar(resultados, args.compare, args.threshold):
+        sys.exit(1)
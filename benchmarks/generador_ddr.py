@@ -0,0 +1,71 @@
+#########################################################################
+#Generador de archivos DDR (.TAB) sinteticos con el formato real de MCS:
+#lineas de metadatos, una cabecera por perfil (fecha y hora entre comillas,
+#LTST como fraccion de dia en la columna 12, lat, lon...) y 105 niveles
+#de 15 columnas que empiezan por 0, con -9999 como valor de relleno.
+#Permite medir el rendimiento sin acceso al PDS.
+#
+#  python benchmarks/generador_ddr.py carpeta --files 10 --profiles 200
+#########################################################################
+
+import argparse
+import datetime
+from pathlib import Path
+
+import numpy as np
+
+NIVELES = 105  # Niveles de presión por perfil en los DDR de MCS
+PRESIONES = 10**(3 - np.arange(NIVELES) / 15)  # Pa, de 1000 a ~1.2e-4 Pa
+VERSION_DATOS = 2  # Sube cuando cambian los archivos generados, para que bench.py no use los de antes
+
+
+def generar_ddr(ruta, perfiles=50, semilla=0, fecha=datetime.datetime(2009, 7, 25), fraccion_relleno=0.1,
+                segundos=None):
+    '''
+    Escribe un DDR sintético en ruta.
+    perfiles         : número de perfiles (cabecera + NIVELES filas cada uno)
+    fraccion_relleno : fracción de temperaturas a -9999 (filas que el parser descarta)
+    segundos         : segundo del día de cada perfil, sin repetir (por defecto, al azar)
+    '''
+    rng = np.random.default_rng(semilla)
+    if segundos is None:
+        # Sin repetir: la fecha y hora UTC de la cabecera es la clave con la que se descartan perfiles repetidos
+        segundos = np.sort(rng.choice(86400, size=perfiles, replace=False))
+    lineas = ['PDS_VERSION_ID = PDS3', '"1","Date","UTC"']
+    for s in segundos:
+        t = fecha + datetime.timedelta(seconds=int(s))
+        lat, lon, ltst = rng.uniform(-90, 90), rng.uniform(-180, 180), rng.uniform(0, 1)
+        lineas.append(f'0, "{t:%Y-%m-%d}", "{t:%H:%M:%S}.5", 123.4, 300.1, 1.6, 5000, 1, 0.1, 0.2, 50.0, '
+                      f'{ltst:.5f}, {lat:.3f}, {lon:.3f}, 3390, 20, 1, 2')
+        T = 200 + 10 * rng.standard_normal(NIVELES)
+        T[rng.uniform(size=NIVELES) < fraccion_relleno] = -9999
+        for k, P in enumerate(PRESIONES):
+            lineas.append(f'0, {P:.5e}, {T[k]:.2f}, {abs(rng.normal(1, 0.5)):.2f}, {rng.uniform(0, 1e-2):.3e}, '
+                          f'1e-4, -9999, -9999, {rng.uniform(0, 1e-3):.3e}, 1e-5, -9999, -9999, '
+                          f'{k * 1.0:.2f}, {lat + k * 0.01:.3f}, {lon:.3f}')
+    Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, 'w', encoding='latin1', newline='') as f:
+        f.write('\r\n'.join(lineas) + '\r\n')
+    return ruta
+
+def generar_dia(carpeta, archivos=5, perfiles=50, semilla=0, fecha=datetime.datetime(2009, 7, 25)):
+    '''
+    Genera archivos DDR en carpeta (como un día descargado del PDS). Devuelve las rutas.
+    Los archivos cubren tramos seguidos del día y ningún perfil repite fecha y hora con otro.
+    '''
+    segundos = np.sort(np.random.default_rng(semilla).choice(86400, size=archivos * perfiles, replace=False))
+    segundos = segundos.reshape(archivos, perfiles)
+    return [generar_ddr(Path(carpeta) / f"{fecha:%y%m%d}{i:02d}0000_DDR.TAB", perfiles, semilla + i, fecha,
+                        segundos=segundos[i])
+            for i in range(archivos)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic MCS DDR .TAB files.")
+    parser.add_argument("folder")
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--profiles", type=int, default=50, help="Profiles per file (105 levels each)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for ruta in generar_dia(args.folder, args.files, args.profiles, args.seed):
+        print(ruta)
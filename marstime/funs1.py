@@ -26,6 +26,13 @@ except:
     use_numpy=False
     import math as np
 
+def _nucleos(x):
+    """Modulo nucleos (Numba) si x es un array y numba esta instalado; None para seguir con NumPy"""
+    if not use_numpy or np.ndim(x) == 0:
+        return None
+    from . import nucleos
+    return nucleos if nucleos.use_numba else None
+
 def west_to_east(west):
     """Convert from west longitude to east longitude,
     or vice versa. """
@@ -177,7 +184,7 @@ def alpha_perturbs(j2000_ott=None):
     """Returns the perturbations to apply to the FMS Angle from orbital perturbations"""
     if j2000_ott is None:
         j2000_ott = j2000_offset_tt()
-    
+
     array_A = [0.0071, 0.0057, 0.0039, 0.0037, 0.0021, 0.0020, 0.0018]
     array_tau = [2.2353, 2.7543, 1.1177, 15.7866, 2.1354, 2.4694, 32.8493]
     array_phi = [49.409, 168.173, 191.837, 21.736, 15.704, 95.528, 49.095]
@@ -192,6 +199,9 @@ def equation_of_center(j2000_ott=None):
     """The true anomaly (v) - the Mean anomaly (M)"""
     if j2000_ott is None:
         j2000_ott = j2000_offset_tt()
+    nucleos = _nucleos(j2000_ott)
+    if nucleos is not None:
+        return nucleos.equation_of_center(j2000_ott)
 
     M = Mars_Mean_Anomaly(j2000_ott)*np.pi/180.
     pbs = alpha_perturbs(j2000_ott)
@@ -209,6 +219,9 @@ def Mars_Ls(j2000_ott=None):
     """Returns the Areocentric solar longitude (aka Ls)"""
     if j2000_ott is None:
         j2000_ott = j2000_offset_tt()
+    nucleos = _nucleos(j2000_ott)
+    if nucleos is not None:
+        return nucleos.Mars_Ls(j2000_ott)
 
     alpha = FMS_Angle(j2000_ott)
     v_m   = equation_of_center(j2000_ott)
@@ -300,6 +313,9 @@ def Mars_Year_np(j2k_np, jday_vals, year_vals, year_length, return_length=False)
 
     year_length = np.array(year_length)
 
+    if np.ndim(j2k_np) > 0:
+        return Mars_Year_array(np.asarray(j2k_np, dtype=float), jday_vals, year_vals, year_length, return_length)
+
     if j2k_np < jday_vals[0]:
         return np.floor(1+(j2k_np-jday_vals[0])/year_length[0])
     elif j2k_np >= jday_vals[-1]:
@@ -319,6 +335,22 @@ def Mars_Year_np(j2k_np, jday_vals, year_vals, year_length, return_length=False)
     else:
         return y*1.0
 
+#Version de Mars_Year_np para arrays: cada elemento como en el caso escalar (NaN si el j2000 es NaN)
+def Mars_Year_array(j2k, jday_vals, year_vals, year_length, return_length=False):
+    v = np.clip(np.digitize(j2k, jday_vals), 1, jday_vals.size) - 1
+    y = year_vals[v] * 1.0
+    l = year_length[v]
+    antes = j2k < jday_vals[0]
+    despues = j2k >= jday_vals[-1]
+    y[antes] = np.floor(1 + (j2k[antes] - jday_vals[0]) / year_length[0])
+    y[despues] = np.floor(1 + (j2k[despues] - jday_vals[-1]) / year_length[-1])
+    y[np.isnan(j2k)] = np.nan
+
+    if return_length:
+        return (y, l)
+    else:
+        return y
+
 def Coordinated_Mars_Time(j2000_ott = None):
     """The Mean Solar Time at the Prime Meridian"""
     if j2000_ott is None:
@@ -4,7 +4,6 @@ from .funs1 import *
 #################################################################################################################
 import calendar
 from datetime import datetime
-import pytz
 from math import tan,acos
 from numpy import deg2rad,rad2deg
 
@@ -74,6 +73,16 @@ def dt2j2000_ott(dt):
     j2000_ott = j2000_offset_tt(jday_tt)
     return j2000_ott
 
+#Version vectorizada de dt2j2000_ott: array de numpy.datetime64 en UTC (NaT -> NaN)
+def dt64_2j2000_ott(dt64):
+    import numpy
+    dt64 = numpy.asarray(dt64, dtype='datetime64[ms]')
+    mil = dt64.astype(numpy.int64).astype(float)
+    mil[numpy.isnat(dt64)] = numpy.nan
+    jdut = julian(mil)
+    jday_tt = julian_tt(jdut)
+    return j2000_offset_tt(jday_tt)
+
 
 def j2000_ott2dt(j2000_ott):
     jday_tt=tt_j2000_offset(j2000_ott)
@@ -82,6 +91,7 @@ def j2000_ott2dt(j2000_ott):
     #print jdut
     timestamp=(jdut-2440587.5)*86400
     #print timestamp
+    import pytz  # Solo aqui: no se carga al importar el paquete
     return datetime.fromtimestamp(timestamp,pytz.UTC)
 
 #A: PEQUEÑA MODIFICACIÓN REALIZADA PARA TRABAJAR CON MILISEGUNDOS
@@ -0,0 +1,57 @@
+##################################
+#Nucleos compilados (Numba, opcional) de equation_of_center y Mars_Ls de
+#funs1 sobre arrays: cada elemento se calcula en una sola pasada, sin los
+#arrays temporales de la version NumPy (alpha_perturbs sola no gana nada
+#compilada: solo se usa dentro de los otros dos). Si numba no esta instalado
+#(use_numba=False), funs1 sigue con NumPy; los resultados son los mismos.
+#Se importa al llamar por primera vez a una de esas funciones con un array.
+##################################
+
+import math
+
+try:
+    from numba import njit, vectorize
+    use_numba=True
+except ImportError:
+    use_numba=False
+
+# Terminos de alpha_perturbs (Allison y McEwen 2000, tabla 5)
+_A = (0.0071, 0.0057, 0.0039, 0.0037, 0.0021, 0.0020, 0.0018)
+_TAU = (2.2353, 2.7543, 1.1177, 15.7866, 2.1354, 2.4694, 32.8493)
+_PHI = (49.409, 168.173, 191.837, 21.736, 15.704, 95.528, 49.095)
+
+
+if use_numba:
+    @njit(cache=True)
+    def _alpha_perturbs(j2000_ott):
+        pbs = 0.0
+        for k in range(7):
+            pbs += _A[k]*math.cos(((0.985626 * j2000_ott/_TAU[k]) + _PHI[k])*math.pi/180.)
+        return pbs
+
+    @njit(cache=True)
+    def _equation_of_center(j2000_ott):
+        M = ((19.3870 + 0.52402075 * j2000_ott) % 360.)*math.pi/180.
+        # sin(kM) por la recurrencia sin((k+1)M) = 2 cos(M) sin(kM) - sin((k-1)M): dos llamadas trigonometricas en vez de cinco
+        s1 = math.sin(M)
+        c2 = 2.0*math.cos(M)
+        s2 = c2*s1
+        s3 = c2*s2 - s1
+        s4 = c2*s3 - s2
+        s5 = c2*s4 - s3
+        return (10.691 + 3.0e-7 * j2000_ott)*s1 \
+            + 0.6230 * s2 \
+            + 0.0500 * s3 \
+            + 0.0050 * s4 \
+            + 0.0005 * s5 \
+            + _alpha_perturbs(j2000_ott)
+
+    # Ufuncs sin firmas: se compilan al primer uso para cada tipo de entrada (y se guardan en __pycache__)
+    @vectorize(cache=True)
+    def equation_of_center(j2000_ott):
+        return _equation_of_center(j2000_ott)
+
+    @vectorize(cache=True)
+    def Mars_Ls(j2000_ott):
+        alpha = (270.3863 + 0.52403840 * j2000_ott) % 360.
+        return (alpha + _equation_of_center(j2000_ott)) % 360
@@ -0,0 +1,4 @@
+##################################
+#Paquete mcs
+#Productos y utilidades sobre los perfiles DDR de MRO/MCS que se cargan en MCS_code.py
+##################################
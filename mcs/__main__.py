@@ -0,0 +1,5 @@
+import sys
+
+from mcs.cli import main
+
+sys.exit(main())
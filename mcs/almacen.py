@@ -0,0 +1,341 @@
+#########################################################################
+#Almacen columnar en disco para ingestas largas (meses/estaciones de DDR)
+#Cada archivo DDR se guarda como un trozo independiente: una carpeta con un
+#.npy por columna, y un indice JSON con las estadisticas (min, max) de cada
+#trozo para poder saltarse los que no intersectan con la seleccion, y de
+#cada grupo de filas dentro del trozo para leer solo las partes que la cumplen.
+#########################################################################
+
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from mcs.niveles import presiones
+from mcs.rendimiento import registrar
+
+try:
+    import fcntl
+    use_fcntl = True
+except ImportError:
+    use_fcntl = False
+
+NOMBRE_INDICE = "indice.json"
+NOMBRE_BLOQUEO = ".bloqueo"
+NOMBRE_CLAVES = "claves.npy"  # Claves de los perfiles del trozo (en minusculas: no choca con las columnas)
+
+# Columnas de las que se guardan estadisticas por trozo (para descartar trozos sin leerlos)
+COLUMNAS_ESTADISTICAS = ['Lat', 'Lon', 'LocalTime', 'Pres', 'Alt', 'T']
+# Filas por grupo con estadisticas propias dentro de un trozo. Las filas van perfil a perfil, asi que
+# Lat, Lon y LocalTime varian poco dentro de un grupo y una seleccion por region salta la mayoria
+FILAS_POR_GRUPO = 2048
+
+
+def mascara_rangos(columnas, rangos):
+    '''
+    Mascara booleana de las filas dentro de todos los rangos (extremos incluidos, como Series.between).
+    columnas : dict/DataFrame {columna: array}
+    rangos   : dict {columna: (minimo, maximo)}
+    '''
+    mascara = None
+    for col, (minimo, maximo) in (rangos or {}).items():
+        x = np.asarray(columnas[col])
+        m = (x >= minimo) & (x <= maximo)
+        mascara = m if mascara is None else (mascara & m)
+    return mascara
+
+
+def estadisticas_grupos(valores, filas=FILAS_POR_GRUPO):
+    '''Lista [min, max] de cada grupo de filas consecutivas (None si el grupo no tiene valores validos)'''
+    inicios = np.arange(0, len(valores), filas)
+    with np.errstate(invalid='ignore'):
+        minimos = np.fmin.reduceat(valores, inicios)
+        maximos = np.fmax.reduceat(valores, inicios)
+    return [[float(a), float(b)] if np.isfinite(a) else None for a, b in zip(minimos, maximos)]
+
+
+def tramos_grupos(grupos, rangos, n):
+    '''
+    Tramos (inicio, fin) de filas cuyos grupos pueden tener filas dentro de todos los rangos,
+    segun las estadisticas por grupo de un trozo. None si no hay estadisticas que apliquen.
+    '''
+    columnas = [c for c in (rangos or {}) if c in grupos]
+    if not columnas:
+        return None
+    filas = grupos["filas"]
+    seleccion = np.ones(len(grupos[columnas[0]]), dtype=bool)
+    for col in columnas:
+        minimo, maximo = rangos[col]
+        seleccion &= [est is not None and est[1] >= minimo and est[0] <= maximo for est in grupos[col]]
+    # Grupos consecutivos seleccionados se leen como un solo tramo
+    cambios = np.flatnonzero(np.diff(np.concatenate(([0], seleccion.astype(np.int8), [0]))))
+    return [(a * filas, min(b * filas, n)) for a, b in zip(cambios[::2], cambios[1::2])]
+
+
+def filtrar_rangos(df, rangos):
+    '''Devuelve las filas de df dentro de los rangos {columna: (min, max)}'''
+    mascara = mascara_rangos(df, rangos)
+    if mascara is None:
+        return df
+    return df[mascara]
+
+
+class AlmacenColumnar:
+    '''
+    Almacen en disco por trozos (uno por archivo DDR) con columnas .npy.
+
+    Las columnas se leen con memoria mapeada, de modo que filtrar o agregar un trozo
+    solo copia a RAM las filas seleccionadas, y las operaciones se hacen trozo a trozo
+    con memoria acotada. Solo se guardan columnas numericas.
+
+    raiz : carpeta del almacen (se crea si no existe)
+    '''
+
+    def __init__(self, raiz):
+        self.raiz = Path(raiz)
+        self.raiz.mkdir(parents=True, exist_ok=True)
+        self._indice = self._leer_indice()
+
+    # --- Indice ---
+    def _ruta_indice(self):
+        return self.raiz / NOMBRE_INDICE
+
+    def _leer_indice(self):
+        ruta = self._ruta_indice()
+        if ruta.exists():
+            with open(ruta, 'r') as f:
+                return json.load(f)
+        return {"version": 1, "trozos": {}}
+
+    def _escribir_indice(self):
+        # Escritura atomica: primero a un temporal y luego se reemplaza
+        tmp = self._ruta_indice().with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self._indice, f, indent=1)
+        os.replace(tmp, self._ruta_indice())
+
+    @contextmanager
+    def _bloqueo(self):
+        '''
+        Bloqueo exclusivo del indice entre procesos (app, trabajos por lotes en paralelo).
+        Dentro del bloqueo se relee el indice para no perder trozos añadidos por otros.
+        '''
+        if not use_fcntl:
+            self.refrescar()
+            yield
+            return
+        with open(self.raiz / NOMBRE_BLOQUEO, 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                self.refrescar()
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def refrescar(self):
+        '''Vuelve a leer el indice (por si otro proceso ha anadido trozos)'''
+        self._indice = self._leer_indice()
+
+    @property
+    def trozos(self):
+        return self._indice["trozos"]
+
+    def __len__(self):
+        return self.num_filas()
+
+    def num_filas(self, dias=None):
+        return sum(meta["filas"] for meta in self.trozos.values() if dias is None or meta.get("dia") in dias)
+
+    def __contains__(self, nombre):
+        return nombre in self.trozos
+
+    def dias(self):
+        return sorted({meta["dia"] for meta in self.trozos.values() if meta.get("dia")})
+
+    # --- Escritura ---
+    def anadir(self, nombre, df, dia=None, claves=None):
+        '''
+        Guarda df como el trozo 'nombre' (si ya existia se reemplaza).
+        dia    : etiqueta opcional del dia al que pertenece el trozo (p.ej. '2009-07-25')
+        claves : claves (bytes) de los perfiles del trozo, para descartar repetidos en ingestas posteriores
+        '''
+        t0 = time.perf_counter()
+        destino = self.raiz / nombre
+        tmp = destino.with_name(destino.name + '.tmp')
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+
+        # Si todas las filas estan en la rejilla de niveles, la presion sale de Nivel y no se guarda
+        derivadas = {}
+        if 'Nivel' in df.columns and 'Pres' in df.columns and len(df):
+            pres = df['Pres'].to_numpy()
+            if np.array_equal(presiones(df['Nivel'].to_numpy()), pres):
+                derivadas['Pres'] = 'Nivel'
+
+        columnas = {}
+        n_bytes = 0
+        for col in df.columns:
+            valores = df[col].to_numpy()
+            if valores.dtype.kind not in 'biufM':
+                continue
+            if col in derivadas:
+                columnas[col] = valores.dtype.str
+                continue
+            np.save(tmp / f"{col}.npy", np.ascontiguousarray(valores), allow_pickle=False)
+            columnas[col] = valores.dtype.str
+            n_bytes += valores.nbytes
+        if claves:
+            np.save(tmp / NOMBRE_CLAVES, np.array(claves, dtype=bytes), allow_pickle=False)
+
+        estadisticas = {}
+        grupos = {"filas": FILAS_POR_GRUPO}
+        for col in COLUMNAS_ESTADISTICAS:
+            if col in columnas and len(df):
+                valores = df[col].to_numpy(dtype=float)
+                if np.isfinite(valores).any():
+                    estadisticas[col] = [float(np.nanmin(valores)), float(np.nanmax(valores))]
+                if len(df) > FILAS_POR_GRUPO:
+                    grupos[col] = estadisticas_grupos(valores)
+
+        if destino.exists():
+            shutil.rmtree(destino)
+        os.replace(tmp, destino)
+
+        with self._bloqueo():
+            self.trozos[nombre] = {
+                "filas": int(len(df)),
+                "dia": dia,
+                "columnas": columnas,
+                "estadisticas": estadisticas,
+                "grupos": grupos,
+                "derivadas": derivadas,
+                "claves": len(claves or ()),
+            }
+            self._escribir_indice()
+        registrar('almacen_escritura', time.perf_counter() - t0, trozos=1, filas=len(df), bytes=n_bytes)
+
+    def eliminar(self, nombre):
+        with self._bloqueo():
+            if nombre in self.trozos:
+                shutil.rmtree(self.raiz / nombre, ignore_errors=True)
+                del self.trozos[nombre]
+                self._escribir_indice()
+
+    # --- Lectura ---
+    def seleccionar_trozos(self, rangos=None, dias=None):
+        '''Nombres de los trozos cuyas estadisticas intersectan con todos los rangos'''
+        seleccion = []
+        for nombre, meta in self.trozos.items():
+            if dias is not None and meta.get("dia") not in dias:
+                continue
+            if meta["filas"] == 0:
+                continue
+            descartado = False
+            for col, (minimo, maximo) in (rangos or {}).items():
+                est = meta["estadisticas"].get(col)
+                if est is None:
+                    if col in meta["columnas"]:
+                        descartado = True  # Columna presente pero sin valores validos
+                        break
+                    continue
+                if est[1] < minimo or est[0] > maximo:
+                    descartado = True
+                    break
+            if not descartado:
+                seleccion.append(nombre)
+        return sorted(seleccion)
+
+    def leer_trozo(self, nombre, columnas=None, rangos=None):
+        '''
+        Lee un trozo como DataFrame. Las columnas se abren con memoria mapeada y solo
+        se copian las filas que cumplen los rangos. Con estadisticas por grupo de filas, solo
+        se leen del disco los grupos que pueden tener filas dentro de los rangos.
+        '''
+        t0 = time.perf_counter()
+        meta = self.trozos[nombre]
+        disponibles = list(meta["columnas"])
+        columnas = disponibles if columnas is None else [c for c in columnas if c in disponibles]
+        derivadas = meta.get("derivadas", {})
+        necesarias = set(columnas) | set(rangos or {})
+        necesarias |= {derivadas[c] for c in necesarias if c in derivadas}
+        mapas = {c: np.load(self.raiz / nombre / f"{c}.npy", mmap_mode='r') for c in necesarias
+                 if c in disponibles and c not in derivadas}
+        tramos = tramos_grupos(meta.get("grupos", {}), rangos, meta["filas"])
+        if tramos is not None:
+            mapas = {c: np.concatenate([m[a:b] for a, b in tramos]) if tramos else m[:0] for c, m in mapas.items()}
+        if 'Pres' in derivadas and 'Pres' in necesarias:
+            mapas['Pres'] = presiones(mapas['Nivel'])
+
+        mascara = mascara_rangos(mapas, {c: r for c, r in (rangos or {}).items() if c in mapas})
+        if mascara is None:
+            datos = {c: np.array(mapas[c]) for c in columnas}
+        else:
+            datos = {c: mapas[c][mascara] for c in columnas}
+        df = pd.DataFrame(datos, columns=columnas)
+        registrar('almacen_lectura', time.perf_counter() - t0, trozos=1, filas=len(df),
+                  bytes=sum(v.nbytes for v in datos.values()))
+        return df
+
+    def claves_perfiles(self, dias=None):
+        '''Claves de los perfiles guardados (las de anadir(claves=...)); los trozos sin ellas no aportan ninguna'''
+        claves = set()
+        for nombre, meta in self.trozos.items():
+            if meta.get("claves") and (dias is None or meta.get("dia") in dias):
+                claves.update(np.load(self.raiz / nombre / NOMBRE_CLAVES, allow_pickle=False).tolist())
+        return claves
+
+    def iterar(self, rangos=None, columnas=None, dias=None):
+        '''Generador de DataFrames filtrados, trozo a trozo (memoria acotada por trozo)'''
+        for nombre in self.seleccionar_trozos(rangos, dias):
+            df = self.leer_trozo(nombre, columnas, rangos)
+            if not df.empty:
+                yield df
+
+    def cargar(self, rangos=None, columnas=None, dias=None):
+        '''Concatena solo las filas de los trozos que intersectan con la seleccion'''
+        dfs = list(self.iterar(rangos, columnas, dias))
+        if dfs:
+            return pd.concat(dfs, ignore_index=True)
+        return self.vacio(columnas, dias)
+
+    def vacio(self, columnas=None, dias=None):
+        '''DataFrame sin filas con las columnas de los trozos (o las pedidas) y los mismos tipos que tendrían con datos'''
+        tipos = {}
+        for meta in self.trozos.values():
+            if dias is None or meta.get("dia") in dias:
+                for c, tipo in meta["columnas"].items():
+                    tipos.setdefault(c, tipo)
+        columnas = list(tipos) if columnas is None else columnas
+        return pd.DataFrame({c: np.empty(0, dtype=tipos.get(c, object)) for c in columnas})
+
+    def agregar(self, cubo, rangos=None, dias=None):
+        '''
+        Acumula en un CuboClimatologico los trozos seleccionados, uno a uno.
+        Los dias ya incorporados al cubo no se vuelven a sumar.
+        '''
+        dias = [d for d in (self.dias() if dias is None else dias) if d not in cubo.dias]
+        if not dias:
+            return cubo
+        for df in self.iterar(rangos, dias=dias):
+            cubo.actualizar(df)
+        cubo.dias.update(dias)
+        return cubo
+
+    def estadisticas(self, dias=None):
+        '''Rango global (min, max) de las columnas con estadisticas'''
+        res = {}
+        for meta in self.trozos.values():
+            if dias is not None and meta.get("dia") not in dias:
+                continue
+            for col, (minimo, maximo) in meta["estadisticas"].items():
+                if col in res:
+                    res[col] = (min(res[col][0], minimo), max(res[col][1], maximo))
+                else:
+                    res[col] = (minimo, maximo)
+        return res
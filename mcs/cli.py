@@ -0,0 +1,195 @@
+#########################################################################
+#Linea de comandos del proceso MCS, sin Streamlit (cron, nodos de calculo)
+#
+#  python -m mcs --start 2009-07-25 --end 2009-07-31 --lat -30 30 --output resultados --figures png
+#  python -m mcs --start 2009-07-01 --end 2009-07-31 --prewarm     # solo descarga y parsea (app en caliente)
+#  python -m mcs --sync                                             # solo lo nuevo del volumen MROM actual
+#  python -m mcs --start 2009-07-01 --end 2009-07-31 --export julio.nc  # un solo archivo con todo el rango
+#  python -m mcs --serve                                            # API HTTP local de consultas al almacen
+#########################################################################
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from mcs import pds
+from mcs.proceso import CARPETA_DATOS, CARPETA_ALMACEN, procesar_dia, rango_fechas
+
+
+def _fecha(texto):
+    return datetime.date.fromisoformat(texto)
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m mcs",
+        description="Headless MCS pipeline: fetch -> parse -> Theta -> filter -> export for a date range.")
+    parser.add_argument("--start", type=_fecha, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=_fecha, help="Last day, inclusive (default: --start)")
+    parser.add_argument("--lat", type=float, nargs=2, metavar=("MIN", "MAX"), help="Latitude range (°N)")
+    parser.add_argument("--lon", type=float, nargs=2, metavar=("MIN", "MAX"), help="Longitude range (°E, 0-360)")
+    parser.add_argument("--ltst", type=float, nargs=2, metavar=("MIN", "MAX"), help="Local true solar time range (hrs)")
+    parser.add_argument("--pres", type=float, nargs=2, metavar=("MIN", "MAX"), help="Pressure range (Pa)")
+    parser.add_argument("--output", help="Output folder for data and figures (nothing is exported if omitted)")
+    parser.add_argument("--format", choices=["parquet", "netcdf", "csv"], default="parquet",
+                        help="Data export format: zstd Parquet, CF NetCDF (profile x pressure level) or gzip CSV")
+    parser.add_argument("--export", metavar="FILE",
+                        help="Also write all the selected days to one file, streamed day by day from the store "
+                             "(format from the extension .parquet, .nc or .csv.gz, else --format)")
+    parser.add_argument("--figures", nargs="*", default=[], choices=["png", "jpeg", "pdf", "svg"],
+                        help="Figure formats to save for each day")
+    parser.add_argument("--xvv-co2", type=float, default=0.95, help="CO2 mixing ratio for the saturation curve")
+    parser.add_argument("--xvv-h2o", type=float, nargs=2, default=[1.0e-5, 9.0e-5], metavar=("MIN", "MAX"),
+                        help="Water vapour mixing ratios for the saturation curves")
+    parser.add_argument("--workers", type=int, default=4, help="Number of parallel worker processes")
+    parser.add_argument("--parse-workers", type=int, default=1,
+                        help="Processes used by each worker to parse the files of a day in parallel")
+    parser.add_argument("--load-filter", metavar="JSON",
+                        help="Rules applied while parsing (also by --sync), as a JSON file or string, e.g. "
+                             "'{\"max_error\": {\"T_err\": 5}, \"requeridas\": [\"T\", \"Pres\"]}'. Profiles repeated "
+                             "in overlapping files are dropped unless it sets \"duplicados\": false")
+    parser.add_argument("--prewarm", action="store_true",
+                        help="Only fetch and parse into the local store, so interactive sessions start hot")
+    parser.add_argument("--data-dir", default=CARPETA_DATOS, help="Folder for the downloaded DDR files")
+    parser.add_argument("--store", default=CARPETA_ALMACEN, help="Folder of the on-disk columnar store")
+    parser.add_argument("--report", help="Write a JSON report of the run to this file")
+    parser.add_argument("--sync", nargs="?", const="", metavar="VOLUME",
+                        help="Fetch and ingest only the days and files not seen before from an MROM volume "
+                             "(default: the current one) into the store, its climatology cube and its Ls-latitude "
+                             "Hovmoller arrays, then exit")
+    parser.add_argument("--cube", help="Climatology cube kept up to date by --sync (default: climatologia.npz in the store)")
+    parser.add_argument("--hovmoller", help="Ls-latitude Hovmoller arrays kept up to date by --sync "
+                                            "(default: hovmoller.npz in the store)")
+    parser.add_argument("--serve", nargs="?", type=int, const=8600, metavar="PORT",
+                        help="Serve queries over the store on a local HTTP API (default port: 8600) until Ctrl+C")
+    parser.add_argument("--host", default="127.0.0.1", help="Address for --serve (default: only this machine)")
+    parser.add_argument("--pds-url", help="PDS base URL or a local mirror folder with the same layout")
+    parser.add_argument("--perf-log", action="store_true",
+                        help="Log one JSON line per pipeline stage (time, bytes, files, rows, peak RSS) to stderr")
+    return parser
+
+def _filtro_carga(texto):
+    '''FiltroCarga de --load-filter (ruta de un JSON o el JSON directamente)'''
+    from mcs.lectura import FiltroCarga
+    if os.path.exists(texto):
+        with open(texto) as f:
+            return FiltroCarga.desde_dict(json.load(f))
+    return FiltroCarga.desde_dict(json.loads(texto))
+
+def sincronizar(args, filtro=None):
+    from mcs.almacen import AlmacenColumnar
+    from mcs.niveles import aviso_sin_nivel
+    from mcs.rendimiento import Medidor, activar
+    from mcs.sincronizacion import sincronizar_volumen
+
+    medidor = activar(Medidor())
+    resumen = sincronizar_volumen(AlmacenColumnar(args.store), args.sync or None, carpeta_datos=args.data_dir,
+                                  ruta_cubo=args.cube, ruta_hovmoller=args.hovmoller, filtro=filtro,
+                                  progreso=lambda dia, n: print(f"{dia}: {n} new files", flush=True))
+    print(f"{resumen['volumen']}: {len(resumen['dias_actualizados'])}/{resumen['dias']} days updated, "
+          f"{resumen['archivos_nuevos']} new files, {resumen['filas']} records", flush=True)
+    aviso = aviso_sin_nivel(resumen['filas_sin_nivel'], resumen['filas'])
+    if aviso:
+        print(f"warning: {aviso}", flush=True)
+    for error in resumen['errores']:
+        print(f"error: {error}", flush=True)
+    resumen['rendimiento'] = medidor.como_dict()
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(resumen, f, indent=1)
+    return 1 if resumen['errores'] else 0
+
+def servir(args):
+    from mcs.servidor import ServidorConsultas
+    ServidorConsultas(args.store).servir(args.host, args.serve)
+    return 0
+
+def exportar_rango(args, fechas, rangos):
+    '''Escribe los días de fechas que están en el almacen en el archivo args.export, sin juntarlos en memoria'''
+    from mcs.almacen import AlmacenColumnar
+    from mcs.exportacion import exportar, formato_de_ruta, lotes_almacen
+    almacen = AlmacenColumnar(args.store)
+    en_almacen = set(almacen.dias())
+    dias = [str(f) for f in fechas if str(f) in en_almacen]
+    try:
+        with warnings.catch_warnings(record=True) as avisos:
+            warnings.simplefilter("always")
+            filas = exportar(lotes_almacen(almacen, dias, rangos or None), args.export,
+                             formato_de_ruta(args.export, args.format))
+    except (ImportError, OSError, ValueError) as e:
+        print(f"{args.export}: error ({e})", flush=True)
+        return False
+    print(f"{args.export}: {filas} records from {len(dias)} day(s)", flush=True)
+    for aviso in avisos:
+        print(f"{args.export}: warning ({aviso.message})", flush=True)
+    return True
+
+def main(argv=None):
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    if args.perf_log:
+        logging.basicConfig(format="%(message)s")
+        logging.getLogger("mcs.rendimiento").setLevel(logging.INFO)
+    if args.pds_url:
+        # También en el entorno, para que lo hereden los procesos trabajadores
+        os.environ["MCS_PDS_URL"] = args.pds_url
+        pds.BASE_URL = args.pds_url.rstrip("/") + "/"
+    try:
+        filtro = _filtro_carga(args.load_filter) if args.load_filter else None
+    except (ValueError, TypeError) as e:
+        parser.error(f"--load-filter: {e}")
+    if args.sync is not None:
+        return sincronizar(args, filtro)
+    if args.serve is not None:
+        return servir(args)
+    if args.start is None:
+        parser.error("--start is required unless --sync or --serve is given")
+    fechas = rango_fechas(args.start, args.end or args.start)
+
+    rangos = {}
+    if args.lat:
+        rangos['Lat'] = tuple(args.lat)
+    if args.lon:
+        rangos['Lon'] = tuple(args.lon)
+    if args.ltst:
+        rangos['LocalTime'] = tuple(args.ltst)
+    if args.pres:
+        rangos['Pres'] = tuple(args.pres)
+    mezcla = {'Xvv_CO2_min': args.xvv_co2, 'Xvv_H2O_min': args.xvv_h2o[0], 'Xvv_H2O_max': args.xvv_h2o[1]}
+
+    opciones = dict(rangos=rangos or None, carpeta_salida=args.output, formato=args.format,
+                    figuras=tuple(args.figures), carpeta_datos=args.data_dir, carpeta_almacen=args.store,
+                    solo_precalentar=args.prewarm, mezcla=mezcla, procesos_parseo=max(1, args.parse_workers),
+                    filtro=filtro)
+
+    resultados = []
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futuros = {executor.submit(procesar_dia, fecha, **opciones): fecha for fecha in fechas}
+        for futuro in as_completed(futuros):
+            fecha = futuros[futuro]
+            try:
+                resumen = futuro.result()
+            except Exception as e:
+                resumen = {'fecha': str(fecha), 'estado': 'error', 'error': str(e)}
+            resultados.append(resumen)
+            print(f"{resumen['fecha']}: {resumen['estado']}"
+                  + (f", {resumen['filas']} records" if 'filas' in resumen else "")
+                  + (f" ({resumen['error']})" if 'error' in resumen else "")
+                  + (f" (warning: {resumen['aviso']})" if 'aviso' in resumen else ""), flush=True)
+
+    resultados.sort(key=lambda r: r['fecha'])
+    error_exportacion = False
+    if args.export:
+        error_exportacion = not exportar_rango(args, fechas, rangos)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(resultados, f, indent=1)
+    return 1 if error_exportacion or any(r['estado'] == 'error' for r in resultados) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+#########################################################################
+#Cubo climatologico: medias, desviaciones y conteos de los perfiles MCS
+#agrupados por latitud, longitud, LTST y nivel de presion
+#########################################################################
+
+import numpy as np
+
+from mcs.niveles import NIVELES_MCS
+
+# Ejes del cubo y columna del DataFrame de la que salen
+EJES = ('lat', 'lon', 'ltst', 'pres')
+COLUMNAS_EJES = {'lat': 'Lat', 'lon': 'Lon', 'ltst': 'LocalTime', 'pres': 'Pres'}
+
+
+def indices_bin(bordes, x):
+    '''Bin de cada valor de x (fuera de [bordes[0], bordes[-1]] queda < 0 o >= numero de bins)'''
+    i = np.searchsorted(bordes, x, side='right') - 1
+    i[x == bordes[-1]] = len(bordes) - 2  # El borde superior se incluye en el ultimo bin
+    return i
+
+
+def bordes_por_defecto():
+    '''
+    Bordes de los bins por defecto:
+    lat  : 5 grados de -90 a 90
+    lon  : un unico bin de 0 a 360 (media zonal)
+    ltst : 1 hora de 0 a 24
+    pres : 5 niveles por decada entre 1e-3 y 1e3 Pa (logaritmico)
+    '''
+    return {
+        'lat': np.arange(-90.0, 90.1, 5.0),
+        'lon': np.array([0.0, 360.0]),
+        'ltst': np.arange(0.0, 24.1, 1.0),
+        'pres': np.logspace(-3, 3, 31),
+    }
+
+
+class CuboClimatologico:
+    '''
+    Acumulador N-D (lat, lon, ltst, pres) de media, desviacion tipica y numero de datos.
+
+    Las reducciones se hacen con np.bincount sobre un indice plano de bin, de forma que
+    cada actualizacion es O(N) en el numero de filas. Los estadisticos se guardan como
+    (conteo, media, M2) y se combinan con la formula de Chan et al., por lo que se pueden
+    ir incorporando dias sucesivos sin volver a cargar los anteriores.
+
+    variables : columnas del DataFrame a acumular (por defecto 'T', 'Dust' y 'H2Oice')
+    bordes    : dict {eje: array de bordes}; los ejes que falten usan bordes_por_defecto()
+    '''
+
+    def __init__(self, variables=('T', 'Dust', 'H2Oice'), bordes=None):
+        self.variables = tuple(variables)
+        self.bordes = bordes_por_defecto()
+        if bordes:
+            for eje, b in bordes.items():
+                if eje not in EJES:
+                    raise ValueError(f"Unknown axis: {eje}")
+                self.bordes[eje] = np.asarray(b, dtype=float)
+        self.forma = tuple(len(self.bordes[eje]) - 1 for eje in EJES)
+        self.dias = set()  # Dias ya incorporados (para no acumular dos veces)
+        self._vaciar()
+
+    def _vaciar(self):
+        n = int(np.prod(self.forma))
+        self.conteo = {v: np.zeros(n, dtype=np.int64) for v in self.variables}
+        self.media_ = {v: np.zeros(n, dtype=float) for v in self.variables}
+        self.m2 = {v: np.zeros(n, dtype=float) for v in self.variables}
+
+    # --- Indexado ---
+    def _indice_plano(self, df):
+        '''Indice plano de bin por fila (-1 si la fila cae fuera del cubo)'''
+        idx = np.zeros(len(df), dtype=np.int64)
+        valido = np.ones(len(df), dtype=bool)
+        for eje, nb in zip(EJES, self.forma):
+            bordes = self.bordes[eje]
+            if eje == 'pres' and 'Nivel' in df.columns:
+                # Bin de cada nivel de la rejilla estandar: las filas en ella solo se indexan
+                nivel = np.asarray(df['Nivel'])
+                i = indices_bin(bordes, NIVELES_MCS.astype(float))[np.maximum(nivel, 0)]
+                fuera = nivel < 0
+                if fuera.any():
+                    i[fuera] = indices_bin(bordes, np.asarray(df['Pres'], dtype=float)[fuera])
+            else:
+                i = indices_bin(bordes, np.asarray(df[COLUMNAS_EJES[eje]], dtype=float))
+            valido &= (i >= 0) & (i < nb)
+            idx = idx * nb + i
+        idx[~valido] = -1
+        return idx
+
+    # --- Acumulacion ---
+    def actualizar(self, df, dia=None):
+        '''
+        Incorpora las filas de df al cubo.
+        dia : identificador opcional (p.ej. la fecha); si ya se incorporo no se vuelve a sumar
+        '''
+        if dia is not None:
+            if dia in self.dias:
+                return False
+            self.dias.add(dia)
+        if df is None or len(df) == 0:
+            return True
+
+        idx = self._indice_plano(df)
+        n = int(np.prod(self.forma))
+        for v in self.variables:
+            if v not in df.columns:
+                continue
+            x = np.asarray(df[v], dtype=float)
+            m = (idx >= 0) & np.isfinite(x)
+            if not m.any():
+                continue
+            i, x = idx[m], x[m]
+
+            # Estadisticos del lote por bin
+            nb = np.bincount(i, minlength=n)
+            sb = np.bincount(i, weights=x, minlength=n)
+            con = nb > 0
+            mb = np.zeros(n)
+            mb[con] = sb[con] / nb[con]
+            m2b = np.bincount(i, weights=(x - mb[i])**2, minlength=n)
+
+            self._combinar_estadisticos(v, nb, mb, m2b)
+        return True
+
+    def _combinar_estadisticos(self, v, nb, mb, m2b):
+        na, ma = self.conteo[v], self.media_[v]
+        nt = na + nb
+        con = nt > 0
+        delta = mb - ma
+        media = ma.copy()
+        media[con] = ma[con] + delta[con] * nb[con] / nt[con]
+        m2 = self.m2[v] + m2b
+        m2[con] += delta[con]**2 * na[con] * nb[con] / nt[con]
+        self.conteo[v], self.media_[v], self.m2[v] = nt, media, m2
+
+    def combinar(self, otro):
+        '''Suma al cubo los estadisticos de otro cubo con los mismos bordes'''
+        if otro.forma != self.forma or any(not np.array_equal(self.bordes[e], otro.bordes[e]) for e in EJES):
+            raise ValueError("Cubes with different bin edges cannot be combined")
+        for v in self.variables:
+            if v in otro.variables:
+                self._combinar_estadisticos(v, otro.conteo[v], otro.media_[v], otro.m2[v])
+        self.dias |= otro.dias
+        return self
+
+    # --- Resultados ---
+    def conteos(self, variable):
+        return self.conteo[variable].reshape(self.forma)
+
+    def media(self, variable):
+        n = self.conteo[variable]
+        res = np.full(n.shape, np.nan)
+        res[n > 0] = self.media_[variable][n > 0]
+        return res.reshape(self.forma)
+
+    def desviacion(self, variable, ddof=1):
+        '''Desviacion tipica por bin (ddof=1 como en pandas.groupby().std())'''
+        n = self.conteo[variable]
+        res = np.full(n.shape, np.nan)
+        m = n > ddof
+        res[m] = np.sqrt(self.m2[variable][m] / (n[m] - ddof))
+        return res.reshape(self.forma)
+
+    def centros(self, eje):
+        b = self.bordes[eje]
+        if eje == 'pres':
+            return np.sqrt(b[:-1] * b[1:])  # Centro geometrico en presion
+        return 0.5 * (b[:-1] + b[1:])
+
+    def reducir(self, ejes):
+        '''
+        Devuelve un cubo nuevo con los ejes indicados colapsados en un unico bin.
+        Ej.: reducir(['lon']) -> media zonal; reducir(['lon', 'pres']) -> seccion lat-LTST
+        '''
+        ejes = [ejes] if isinstance(ejes, str) else list(ejes)
+        ejes_num = tuple(EJES.index(e) for e in ejes)
+        bordes = {e: (self.bordes[e][[0, -1]] if e in ejes else self.bordes[e]) for e in EJES}
+        nuevo = CuboClimatologico(self.variables, bordes)
+        nuevo.dias = set(self.dias)
+        for v in self.variables:
+            n = self.conteo[v].reshape(self.forma)
+            m = self.media_[v].reshape(self.forma)
+            nt = n.sum(axis=ejes_num, keepdims=True)
+            s = (n * m).sum(axis=ejes_num, keepdims=True)
+            mt = np.divide(s, nt, out=np.zeros(nt.shape), where=nt > 0)
+            m2 = (self.m2[v].reshape(self.forma) + n * (m - mt)**2).sum(axis=ejes_num)
+            nuevo.conteo[v] = nt.ravel()
+            nuevo.media_[v] = mt.ravel()
+            nuevo.m2[v] = m2.ravel()
+        return nuevo
+
+    def recortar(self, eje, minimo, maximo):
+        '''Devuelve un cubo nuevo con solo los bins de eje cuyo centro esta en [minimo, maximo]'''
+        k = EJES.index(eje)
+        c = self.centros(eje)
+        dentro = np.flatnonzero((c >= minimo) & (c <= maximo))
+        if dentro.size == 0:
+            return None
+        bordes = dict(self.bordes)
+        bordes[eje] = self.bordes[eje][dentro[0]:dentro[-1] + 2]
+        nuevo = CuboClimatologico(self.variables, bordes)
+        nuevo.dias = set(self.dias)
+        sel = [slice(None)] * len(EJES)
+        sel[k] = slice(dentro[0], dentro[-1] + 1)
+        sel = tuple(sel)
+        for v in self.variables:
+            nuevo.conteo[v] = self.conteo[v].reshape(self.forma)[sel].ravel()
+            nuevo.media_[v] = self.media_[v].reshape(self.forma)[sel].ravel()
+            nuevo.m2[v] = self.m2[v].reshape(self.forma)[sel].ravel()
+        return nuevo
+
+    # --- Persistencia ---
+    def guardar(self, ruta):
+        datos = {f'bordes_{e}': self.bordes[e] for e in EJES}
+        for v in self.variables:
+            datos[f'conteo_{v}'] = self.conteo[v]
+            datos[f'media_{v}'] = self.media_[v]
+            datos[f'm2_{v}'] = self.m2[v]
+        datos['variables'] = np.array(self.variables)
+        datos['dias'] = np.array(sorted(str(d) for d in self.dias))
+        np.savez_compressed(ruta, **datos)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with np.load(ruta) as datos:
+            variables = tuple(str(v) for v in datos['variables'])
+            cubo = cls(variables, {e: datos[f'bordes_{e}'] for e in EJES})
+            for v in variables:
+                cubo.conteo[v] = datos[f'conteo_{v}'].copy()
+                cubo.media_[v] = datos[f'media_{v}'].copy()
+                cubo.m2[v] = datos[f'm2_{v}'].copy()
+            cubo.dias = set(str(d) for d in datos['dias'])
+        return cubo
@@ -0,0 +1,100 @@
+#########################################################################
+#Diagnosticos derivados de cada perfil: gradiente termico vertical, dTheta/dz,
+#frecuencia de Brunt-Vaisala (N2) y altitud integrada hidrostaticamente.
+#Necesitan diferencias dentro de cada perfil: se calculan sobre la tabla
+#plana de niveles con operaciones segmentadas (orden por perfil, mascaras
+#de frontera y sumas acumuladas), sin bucles de Python sobre los perfiles.
+#########################################################################
+
+import numpy as np
+
+from mcs.termodinamica import calcular_temp_potencial
+
+G_MARTE = 3.711  # Gravedad en superficie [m/s2]
+R_MARTE = 191.8  # Constante especifica del aire marciano (95% CO2) [J/(kg K)]
+
+COLUMNAS_DIAGNOSTICOS = ['Lapse', 'dTheta_dz', 'N2', 'Alt_hid']
+
+
+def _vecinos(perfil):
+    '''Índices del nivel anterior y siguiente dentro del mismo perfil (el propio si no hay)'''
+    n = len(perfil)
+    mismo = perfil[1:] == perfil[:-1]
+    indices = np.arange(n)
+    anterior = indices - np.concatenate(([False], mismo))
+    siguiente = indices + np.concatenate((mismo, [False]))
+    return anterior, siguiente
+
+def derivada_por_perfil(perfil, x, z):
+    '''
+    dx/dz en cada nivel con los niveles vecinos de su perfil: diferencia centrada y, en los
+    extremos del perfil, hacia un lado. NaN en perfiles de un solo nivel.
+    perfil, x, z : arrays ordenados por perfil (cada perfil en niveles consecutivos)
+    '''
+    anterior, siguiente = _vecinos(perfil)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        d = (x[siguiente] - x[anterior]) / (z[siguiente] - z[anterior])
+    d[~np.isfinite(d)] = np.nan
+    return d
+
+def altitud_hidrostatica(perfil, pres, T, alt):
+    '''
+    Altitud [km] integrando la ecuación hidrostática (dz = R T / g dln p, T media entre niveles)
+    desde el nivel más bajo de cada perfil, que conserva su altitud. Arrays ordenados por perfil
+    y, dentro de cada uno, de mayor a menor presión. Con un T o p inválidos por debajo, NaN.
+    '''
+    mismo = perfil[1:] == perfil[:-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        espesor = R_MARTE * 0.5 * (T[1:] + T[:-1]) / G_MARTE * np.log(pres[:-1] / pres[1:]) / 1000.0
+    espesor = np.where(mismo, espesor, 0.0)
+    malo = ~np.isfinite(espesor)
+    acumulado = np.concatenate(([0.0], np.cumsum(np.where(malo, 0.0, espesor))))
+    malos = np.concatenate(([0], np.cumsum(malo)))
+    # Primera fila del perfil de cada fila: la suma acumulada se resta desde ahí
+    inicio = np.maximum.accumulate(np.where(np.concatenate(([True], ~mismo)), np.arange(len(perfil)), 0))
+    z = alt[inicio] + acumulado - acumulado[inicio]
+    z[malos != malos[inicio]] = np.nan
+    return z
+
+def calcular_diagnosticos(perfil, pres, T, alt):
+    '''
+    Diagnósticos de cada fila (en el orden de entrada), como dict {columna: array float32}:
+    Lapse     : gradiente térmico vertical -dT/dz [K/km]
+    dTheta_dz : gradiente de temperatura potencial [K/km]
+    N2        : frecuencia de Brunt-Väisälä al cuadrado, g/Theta dTheta/dz [1/s2]
+    Alt_hid   : altitud integrada hidrostáticamente desde el nivel más bajo del perfil [km]
+    '''
+    perfil, pres = np.asarray(perfil), np.asarray(pres, dtype=float)
+    T, alt = np.asarray(T, dtype=float), np.asarray(alt, dtype=float)
+    if len(perfil) == 0:
+        return {col: np.empty(0, dtype=np.float32) for col in COLUMNAS_DIAGNOSTICOS}
+    # Por perfil y, dentro de cada perfil, de abajo arriba (mayor presión primero); orden estable
+    orden = np.lexsort((-pres, perfil))
+    perfil, pres, T, alt = perfil[orden], pres[orden], T[orden], alt[orden]
+
+    theta = calcular_temp_potencial(T, pres)
+    dtheta_dz = derivada_por_perfil(perfil, theta, alt)
+    ordenados = {
+        'Lapse': -derivada_por_perfil(perfil, T, alt),
+        'dTheta_dz': dtheta_dz,
+        'N2': G_MARTE / theta * dtheta_dz / 1000.0,
+        'Alt_hid': altitud_hidrostatica(perfil, pres, T, alt),
+    }
+    resultado = {}
+    for col, valores in ordenados.items():
+        resultado[col] = np.empty(len(orden), dtype=np.float32)
+        resultado[col][orden] = valores
+    return resultado
+
+def anadir_diagnosticos(df):
+    '''
+    Añade a df (en el sitio) las columnas de COLUMNAS_DIAGNOSTICOS si no las tiene ya.
+    Los perfiles deben estar completos en df (p.ej. un archivo o un día, antes de filtrar por presión).
+    '''
+    if df.empty or all(c in df.columns for c in COLUMNAS_DIAGNOSTICOS):
+        return df
+    if any(c not in df.columns for c in ('Perfil', 'Pres', 'T', 'Alt')):
+        return df
+    for col, valores in calcular_diagnosticos(df['Perfil'], df['Pres'], df['T'], df['Alt']).items():
+        df[col] = valores
+    return df
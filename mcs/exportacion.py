@@ -0,0 +1,284 @@
+#########################################################################
+#Exportacion de datos seleccionados (o de varios dias del almacen) a
+#Parquet comprimido por grupos de filas, NetCDF al estilo CF (perfil x
+#nivel de la rejilla estandar) o CSV con gzip. Los datos llegan en lotes
+#(DataFrames) y cada lote se escribe al llegar: no se junta nunca una copia
+#completa de la seleccion. Parquet necesita pyarrow y NetCDF netCDF4
+#(requirements-extra.txt).
+#########################################################################
+
+import datetime
+import gzip
+import os
+import tempfile
+import warnings
+
+import numpy as np
+
+try:
+    import netCDF4
+    use_netcdf = True
+except ImportError:
+    use_netcdf = False
+
+from mcs.diagnosticos import anadir_diagnosticos
+from mcs.niveles import N_NIVELES, NIVELES_MCS, indices_nivel
+from mcs.rendimiento import etapa
+from mcs.termodinamica import anadir_temp_potencial
+
+FORMATOS_EXPORTACION = {'parquet': '.parquet', 'netcdf': '.nc', 'csv': '.csv.gz'}
+TIPOS_MIME = {'parquet': 'application/vnd.apache.parquet', 'netcdf': 'application/x-netcdf', 'csv': 'application/gzip'}
+FILAS_POR_LOTE = 200_000  # Filas por lote (y por grupo de filas del Parquet)
+
+# Columnas de cada perfil (una por perfil en el NetCDF, no por nivel)
+COLUMNAS_PERFIL = ('LocalTime', 'Ls', 'MY')
+# Atributos CF de las columnas conocidas: (standard_name o None, unidades, descripción)
+ATRIBUTOS_CF = {
+    'Pres': ('air_pressure', 'Pa', 'Pressure'),
+    'T': ('air_temperature', 'K', 'Temperature'),
+    'T_err': (None, 'K', 'Temperature error'),
+    'Dust': (None, 'km-1', 'Dust opacity per km'),
+    'Dust_err': (None, 'km-1', 'Dust opacity error'),
+    'H2Ovap': (None, '1e-6', 'Water vapour volume mixing ratio (ppmv)'),
+    'H2Ovap_err': (None, '1e-6', 'Water vapour volume mixing ratio error (ppmv)'),
+    'H2Oice': (None, 'km-1', 'Water ice opacity per km'),
+    'H2Oice_err': (None, 'km-1', 'Water ice opacity error'),
+    'CO2ice': (None, 'km-1', 'CO2 ice opacity per km'),
+    'CO2ice_err': (None, 'km-1', 'CO2 ice opacity error'),
+    'Alt': ('altitude', 'km', 'Altitude above the areoid'),
+    'Lat': ('latitude', 'degrees_north', 'Latitude'),
+    'Lon': ('longitude', 'degrees_east', 'East longitude'),
+    'LocalTime': (None, 'hours', 'Local true solar time'),
+    'Ls': (None, 'degree', 'Areocentric solar longitude'),
+    'MY': (None, '1', 'Mars year'),
+    'Theta': ('air_potential_temperature', 'K', 'Potential temperature'),
+    'Theta_err': (None, 'K', 'Potential temperature error'),
+    'Lapse': (None, 'K km-1', 'Lapse rate -dT/dz'),
+    'dTheta_dz': (None, 'K km-1', 'Vertical gradient of potential temperature'),
+    'N2': ('square_of_brunt_vaisala_frequency_in_air', 's-2', 'Brunt-Vaisala frequency squared'),
+    'Alt_hid': (None, 'km', 'Hydrostatic altitude from the lowest level of the profile'),
+}
+
+
+def formato_de_ruta(ruta, por_defecto='parquet'):
+    '''Formato de exportación según la extensión de ruta (por_defecto si no es ninguna conocida)'''
+    ruta = str(ruta).lower()
+    if ruta.endswith('.csv') or ruta.endswith('.csv.gz'):
+        return 'csv'
+    if ruta.endswith('.nc'):
+        return 'netcdf'
+    if ruta.endswith('.parquet'):
+        return 'parquet'
+    return por_defecto
+
+def lotes_df(df, filas=FILAS_POR_LOTE):
+    '''Lotes de filas de un DataFrame ya en memoria (vistas, sin copiarlo)'''
+    for ini in range(0, len(df), filas):
+        yield df.iloc[ini:ini + filas]
+
+def lotes_almacen(almacen, dias, rangos=None):
+    '''
+    Lotes de los días del almacen dentro de rangos, trozo a trozo y en orden de día, con Theta, los
+    diagnósticos y una columna 'Dia' (la clave 'Perfil' solo es única dentro de cada día).
+    '''
+    for dia in dias:
+        for df in almacen.iterar(rangos, dias=[dia]):
+            df = anadir_temp_potencial(anadir_diagnosticos(df))
+            df.insert(0, 'Dia', dia)
+            yield df
+
+
+def _completar(df, columnas):
+    '''df con las columnas del primer lote; las que le faltan (trozos antiguos del almacen) quedan como NaN'''
+    return df if list(df.columns) == columnas else df.reindex(columns=columnas)
+
+
+# --- Escritores: cada uno recorre los lotes y devuelve el número de filas escritas ---
+def _escribir_parquet(lotes, ruta):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    escritor, filas = None, 0
+    try:
+        for df in lotes:
+            tabla = pa.Table.from_pandas(df, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(ruta, tabla.schema, compression='zstd')
+            else:
+                # Los trozos antiguos del almacen pueden tener otros tipos o no tener alguna columna
+                # (que queda como nula): se ajustan al primer lote
+                for campo in escritor.schema:
+                    if campo.name not in tabla.column_names:
+                        tabla = tabla.append_column(campo, pa.nulls(len(tabla), campo.type))
+                tabla = tabla.select(escritor.schema.names).cast(escritor.schema)
+            escritor.write_table(tabla, row_group_size=FILAS_POR_LOTE)
+            filas += len(df)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return filas
+
+def _escribir_csv(lotes, ruta):
+    filas, columnas = 0, None
+    with gzip.open(ruta, 'wt', newline='', compresslevel=6) as f:
+        for df in lotes:
+            cabecera = columnas is None
+            columnas = columnas or list(df.columns)
+            _completar(df, columnas).to_csv(f, index=False, header=cabecera)
+            filas += len(df)
+    return filas
+
+
+class _EscritorNetCDF:
+    '''
+    NetCDF4 con la representación CF de perfiles en array multidimensional ortogonal: dimensiones
+    profile (ilimitada, crece con cada lote) y level (la rejilla estándar NIVELES_MCS). Las filas fuera
+    de la rejilla (Nivel = SIN_NIVEL) no tienen sitio en ella y solo se cuentan (atributo rows_off_grid).
+    '''
+
+    def __init__(self, ruta, columnas):
+        self.ds = netCDF4.Dataset(ruta, 'w', format='NETCDF4')
+        self.ds.setncatts({'Conventions': 'CF-1.8', 'featureType': 'profile',
+                           'title': 'Mars Climate Sounder (MRO/MCS) atmospheric profiles',
+                           'source': 'MCS Derived Data Records (DDR), NASA PDS Atmospheres Node',
+                           'history': f"{datetime.datetime.now(datetime.timezone.utc):%Y-%m-%dT%H:%M:%SZ} "
+                                      f"exported by MCS-Atmospheric-Profiles"})
+        self.ds.createDimension('profile', None)
+        self.ds.createDimension('level', N_NIVELES)
+        nivel = self.ds.createVariable('level', 'f4', ('level',))
+        nivel.setncatts({'standard_name': 'air_pressure', 'units': 'Pa', 'positive': 'down', 'axis': 'Z',
+                         'long_name': 'MCS standard pressure level'})
+        nivel[:] = NIVELES_MCS
+        perfil = self.ds.createVariable('profile', 'i4', ('profile',))
+        perfil.setncatts({'cf_role': 'profile_id', 'long_name': 'Profile number (unique within each day)'})
+        if 'Dia' in columnas:
+            tiempo = self.ds.createVariable('time', 'f8', ('profile',))
+            tiempo.setncatts({'standard_name': 'time', 'units': 'days since 1970-01-01 00:00:00',
+                              'calendar': 'standard', 'long_name': 'UTC day of the profile'})
+        self.columnas_perfil = [c for c in COLUMNAS_PERFIL if c in columnas]
+        # Pres es la coordenada level; Lat, Lon y Alt cambian con el nivel, así que van como las demás
+        self.columnas_nivel = [c for c in columnas if c not in ('Dia', 'Perfil', 'Nivel', 'Pres')
+                               and c not in self.columnas_perfil]
+        for col, dims in [(c, ('profile',)) for c in self.columnas_perfil] + \
+                         [(c, ('profile', 'level')) for c in self.columnas_nivel]:
+            var = self.ds.createVariable(col, 'f4', dims, fill_value=np.float32(np.nan), zlib=True, complevel=4,
+                                         chunksizes=(1024,) if len(dims) == 1 else (64, N_NIVELES))
+            standard_name, unidades, descripcion = ATRIBUTOS_CF.get(col, (None, None, col))
+            atributos = {'long_name': descripcion}
+            if standard_name is not None:
+                atributos['standard_name'] = standard_name
+            if unidades is not None:
+                atributos['units'] = unidades
+            if len(dims) == 2:
+                atributos['coordinates'] = ('time ' if 'Dia' in columnas else '') + 'Lat Lon level'
+            var.setncatts(atributos)
+        self.columnas = list(columnas)
+        self.perfiles = 0
+        self.filas = 0  # Filas escritas (las que están en la rejilla)
+        self.fuera_rejilla = 0
+
+    def escribir(self, df):
+        '''Añade los perfiles completos de df (sus filas deben ir seguidas)'''
+        if df.empty:
+            return
+        if 'Nivel' not in df.columns:
+            df = df.assign(Nivel=indices_nivel(df['Pres']))  # Trozos anteriores a la columna Nivel
+        df = _completar(df, self.columnas)
+        perfil = df['Perfil'].to_numpy()
+        nuevo = np.r_[True, perfil[1:] != perfil[:-1]]
+        if 'Dia' in df.columns:
+            dia = df['Dia'].to_numpy()
+            nuevo[1:] |= dia[1:] != dia[:-1]
+        fila = np.cumsum(nuevo) - 1
+        primeras = np.flatnonzero(nuevo)
+        n, ini = len(primeras), self.perfiles
+        nivel = df['Nivel'].to_numpy()
+        en_rejilla = nivel >= 0
+        self.fuera_rejilla += int((~en_rejilla).sum())
+        self.filas += int(en_rejilla.sum())
+
+        self.ds['profile'][ini:ini + n] = perfil[primeras]
+        if 'Dia' in df.columns:
+            origen = np.datetime64('1970-01-01', 'D')
+            self.ds['time'][ini:ini + n] = (dia[primeras].astype('datetime64[D]') - origen).astype(np.float64)
+        for col in self.columnas_perfil:
+            self.ds[col][ini:ini + n] = df[col].to_numpy(dtype=np.float32)[primeras]
+        for col in self.columnas_nivel:
+            matriz = np.full((n, N_NIVELES), np.nan, dtype=np.float32)
+            matriz[fila[en_rejilla], nivel[en_rejilla]] = df[col].to_numpy(dtype=np.float32)[en_rejilla]
+            self.ds[col][ini:ini + n, :] = matriz
+        self.perfiles += n
+
+    def cerrar(self):
+        self.ds.setncattr('rows_off_grid', self.fuera_rejilla)
+        self.ds.close()
+
+def _inicio_ultimo_perfil(df):
+    '''Posición de la primera fila del último perfil de df'''
+    distinto = df['Perfil'].to_numpy() != df['Perfil'].iat[-1]
+    if 'Dia' in df.columns:
+        distinto |= df['Dia'].to_numpy() != df['Dia'].iat[-1]
+    return len(df) - int(np.argmax(distinto[::-1])) if distinto.any() else 0
+
+def _escribir_netcdf(lotes, ruta):
+    if not use_netcdf:
+        raise ImportError("NetCDF export needs netCDF4 (pip install -r requirements-extra.txt)")
+    import pandas as pd
+    escritor, resto = None, None
+    try:
+        for df in lotes:
+            if df.empty:
+                continue
+            if resto is not None and len(resto):
+                df = pd.concat([resto, df], ignore_index=True)
+            if escritor is None:
+                escritor = _EscritorNetCDF(ruta, list(df.columns) + (['Nivel'] if 'Nivel' not in df.columns else []))
+            # El último perfil puede seguir en el lote siguiente: se guarda para entonces
+            ultimo = _inicio_ultimo_perfil(df)
+            resto = df.iloc[ultimo:]
+            escritor.escribir(df.iloc[:ultimo])
+        if resto is not None and len(resto):
+            escritor.escribir(resto)
+    finally:
+        if escritor is not None:
+            escritor.cerrar()
+    if escritor is None:
+        return 0
+    if escritor.fuera_rejilla:
+        warnings.warn(f"{escritor.fuera_rejilla} records are not on the MCS pressure levels and were not written "
+                      f"to {os.path.basename(ruta)}", stacklevel=3)
+    return escritor.filas
+
+
+ESCRITORES = {'parquet': _escribir_parquet, 'netcdf': _escribir_netcdf, 'csv': _escribir_csv}
+
+
+def exportar(lotes, ruta, formato=None):
+    '''
+    Escribe los lotes (DataFrames con las mismas columnas) en ruta, uno a uno.
+    formato : 'parquet', 'netcdf' o 'csv' (CSV con gzip); por defecto según la extensión de ruta
+    Devuelve el número de filas escritas. Si falla a medias no deja el archivo incompleto.
+    El NetCDF no tiene sitio para las filas fuera de la rejilla de niveles: no se escriben ni se
+    cuentan, y se avisa con un UserWarning.
+    '''
+    formato = formato or formato_de_ruta(ruta)
+    if formato not in ESCRITORES:
+        raise ValueError(f"Unknown export format: {formato} (use one of {', '.join(ESCRITORES)})")
+    with etapa('exportacion') as e:
+        try:
+            filas = ESCRITORES[formato](lotes, ruta)
+        except BaseException:
+            if os.path.exists(ruta):
+                os.remove(ruta)
+            raise
+        e.contar(filas=filas, bytes=os.path.getsize(ruta) if os.path.exists(ruta) else 0)
+    return filas
+
+def exportar_bytes(lotes, formato):
+    '''Como exportar, pero devuelve el contenido del archivo (para una descarga)'''
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'exportacion' + FORMATOS_EXPORTACION[formato])
+        exportar(lotes, ruta, formato)
+        if not os.path.exists(ruta):
+            return b""
+        with open(ruta, 'rb') as f:
+            return f.read()
@@ -0,0 +1,370 @@
+#########################################################################
+#Graficas de los perfiles MCS (matplotlib): perfiles de temperatura, opacidad
+#y temperatura potencial, productos del cubo climatologico y Hovmoller Ls - latitud.
+#Las figuras se crean con la API de objetos (Figure + lienzo Agg), sin el
+#estado global de pyplot. La app las pinta en un pool acotado de procesos
+#de render, que las codifican a bytes y las liberan: matplotlib no es
+#seguro entre hilos (el parser de mathtext de las etiquetas de los ejes
+#logaritmicos es compartido), asi que varias sesiones pueden pintar a la
+#vez sin mezclar figuras ni acumular memoria en el servidor.
+#########################################################################
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from mcs.rendimiento import Medidor, activar, cronometrar, etapa, registrar
+from mcs.termodinamica import calcular_presion_saturacion, calcular_presion_saturacion_H2O
+
+MAX_RENDER = 2  # Procesos de render (figuras que se pintan a la vez en el servidor)
+TAREAS_POR_PROCESO = 50  # Cada proceso de render se renueva tras estas figuras (devuelve su memoria)
+DPI_PANTALLA = 200  # El mismo que usaba st.pyplot
+# Columnas que usa crear_graficas: solo esas se copian al proceso de render
+COLUMNAS_GRAFICAS = ['Pres', 'Alt', 'Lat', 'Lon', 'T', 'T_err', 'Dust', 'Dust_err', 'H2Oice', 'H2Oice_err',
+                     'Theta', 'Theta_err']
+
+_pool_render = None
+_bloqueo_pool = threading.Lock()
+
+
+def _figura(**kwargs):
+    '''Figure con su propio lienzo Agg (pyplot no la registra, así que no hay que cerrarla)'''
+    fig = Figure(**kwargs)
+    FigureCanvasAgg(fig)
+    return fig
+
+def liberar_figura(fig):
+    '''Suelta los ejes y artistas de una figura que ya no se va a usar'''
+    fig.clear()
+
+def codificar(fig, formato='png', dpi=DPI_PANTALLA):
+    '''Codifica la figura a bytes en el formato dado y la libera'''
+    buf = BytesIO()
+    try:
+        with etapa('savefig', figuras=1) as e:
+            fig.savefig(buf, format=formato, dpi=dpi, bbox_inches='tight')
+            e.contar(bytes=buf.tell())
+    finally:
+        liberar_figura(fig)
+    return buf.getvalue()
+
+def _renderizar_en_proceso(funcion, args, kwargs, formato, dpi):
+    '''Trabajador del pool de render: devuelve (bytes o None, etapas medidas en el trabajador)'''
+    medidor = activar(Medidor())
+    fig = funcion(*args, **kwargs)
+    imagen = None if fig is None else codificar(fig, formato, dpi)
+    return imagen, medidor.etapas
+
+def _pool():
+    global _pool_render
+    with _bloqueo_pool:
+        if _pool_render is None:
+            from mcs.lectura import METODO_INICIO
+            contexto = multiprocessing.get_context(METODO_INICIO)
+            if METODO_INICIO == "forkserver":
+                # El servidor es uno por proceso: se precargan también los módulos de los trabajadores de parseo
+                contexto.set_forkserver_preload(['__main__', 'mcs.lectura', __name__])
+            _pool_render = ProcessPoolExecutor(max_workers=MAX_RENDER, mp_context=contexto,
+                                               max_tasks_per_child=TAREAS_POR_PROCESO)
+        return _pool_render
+
+def renderizar(funcion, *args, formato='png', dpi=DPI_PANTALLA, **kwargs):
+    '''
+    Crea la figura con funcion(*args, **kwargs) (una de las crear_grafica*) y la codifica a bytes en el
+    pool de render, esperando al resultado. Devuelve None si funcion no da figura (no hay datos).
+    Los tiempos de la figura y del savefig se añaden al medidor activo de quien la pide.
+    Si funcion tiene un atributo columnas, de los DataFrames de args solo se envían esas columnas.
+    '''
+    global _pool_render
+    columnas = getattr(funcion, 'columnas', None)
+    if columnas is not None:
+        # Los argumentos se copian (pickle) al proceso de render: sin las columnas que no se pintan
+        args = tuple(a[[c for c in columnas if c in a.columns]] if isinstance(a, pd.DataFrame) else a for a in args)
+    pool = _pool()
+    try:
+        imagen, etapas = pool.submit(_renderizar_en_proceso, funcion, args, kwargs, formato, dpi).result()
+    except BrokenProcessPool:
+        # Un proceso de render ha muerto (p.ej. sin memoria): la siguiente figura arranca un pool nuevo
+        with _bloqueo_pool:
+            if _pool_render is pool:
+                _pool_render = None
+        raise
+    for nombre, datos in etapas.items():
+        registrar(nombre, datos['tiempo_s'], **{c: v for c, v in datos.items() if c not in ('llamadas', 'tiempo_s')})
+    return imagen
+
+
+@cronometrar('figura')
+def crear_graficas(df_filtrado, lat_range, lon_range, local_range, MY, Ls,
+                   Xvv_CO2_min=0.95, Xvv_H2O_min=1.0e-5, Xvv_H2O_max=9.0e-5):
+    '''
+    Figura de 3 paneles (T y Psat, opacidad, temperatura potencial) de los perfiles de df_filtrado.
+    Xvv_* : razones de mezcla para las curvas de presión de saturación
+    Devuelve None si no hay datos en el rango seleccionado.
+    '''
+    if df_filtrado.empty:
+        return None
+    
+    # Crear figura nueva
+    fig = _figura(figsize=(27, 7))
+    ax1, ax2, ax3 = fig.subplots(1, 3)
+    
+    # --- Gráfica 1: Temperatura vs Presión/Altitud ---
+    df_temp = df_filtrado[(df_filtrado['Pres'].notna()) &
+                          (df_filtrado['Alt'].notna()) & 
+                         (df_filtrado['T'].notna()) &
+                         (df_filtrado['Lon'].notna()) &
+                         (df_filtrado['Lat'].notna())].copy()
+    
+    if not df_temp.empty:
+        # Eliminar duplicados
+        #df_temp = df_temp.drop_duplicates(subset=['Alt', 'Pres'])
+        
+        # CREAR EJE SECUNDARIO (como en tu código original)
+        ax1b = ax1.twinx()
+        
+        # 1. PLOT PRINCIPAL: Temperatura vs Presión (eje izquierdo)
+        ax1.errorbar(df_temp['T'], df_temp['Pres'], 
+                    xerr=df_temp['T_err'], fmt='o', ms=3, elinewidth=0.5,
+                    color='firebrick', alpha=0.6, zorder=2, 
+                    label='Temperature Profiles')
+        
+        # 2. EJE SECUNDARIO: Temperatura vs Altitud (transparente, solo para escala y pruebas)
+        ax1b.plot(df_temp['T'], df_temp['Alt'], 'x', color='blue', alpha=0, label=None)
+        
+        # 3. CURVAS DE SATURACIÓN 
+        T_range = np.linspace(50, 300, 100)
+        
+        PsatCO2_min = calcular_presion_saturacion(T_range, Xvv_CO2_min)
+        PsatH2O_min = calcular_presion_saturacion_H2O(T_range, Xvv_H2O_min)
+        PsatH2O_max = calcular_presion_saturacion_H2O(T_range, Xvv_H2O_max)
+        
+        ax1.semilogy(T_range, PsatCO2_min, '--', color='navy', zorder=5,
+                    linewidth=2, label=f'Psat CO₂ X={Xvv_CO2_min:.2f}')
+        ax1.semilogy(T_range, PsatH2O_min, '--', color='lime', zorder=5,
+                    linewidth=2, label=f'Psat H₂O X_min={Xvv_H2O_min:.2e}')
+        ax1.semilogy(T_range, PsatH2O_max, ':', color='lime', zorder=5,
+                    linewidth=2, label=f'Psat H₂O X_max={Xvv_H2O_max:.2e}')
+        
+        # 4. CONFIGURACIÓN DE EJES 
+        ax1.set_xlabel('Temperature [K]', fontsize=15)
+        ax1.set_xlim(50, 300)
+        ax1b.set_ylabel('Altitude [km]', fontsize=15)
+        ax1b.yaxis.labelpad = 10
+        
+        # Sincronización usando relación barométrica (simplificada)
+        alt_min, alt_max = df_temp['Alt'].min(), df_temp['Alt'].max()
+        pres_min, pres_max = df_temp['Pres'].max(), df_temp['Pres'].min()  # ¡INVERTIDO!
+        
+        ax1b.set_ylim(alt_min, alt_max)
+        ax1.set_ylim(pres_min, pres_max)  # Presión invertida: mayor presión abajo
+        
+        # Configurar eje de presión (invertido y logarítmico)
+        ax1.set_yscale('log')
+        ax1.set_ylabel('Pressure [Pa]', color='firebrick', fontsize=15, labelpad=10)
+        ax1b.yaxis.set_label_position("right")
+        
+        ax1.tick_params(axis='y', labelcolor='firebrick', labelsize=14)
+        ax1.tick_params(axis='x', labelsize=14)
+        ax1b.tick_params(axis='y', labelsize=14)
+
+        yticks = np.arange(np.floor(alt_min/20)*20, np.ceil(alt_max/20)*20 + 1, 20)
+        ax1b.set_yticks(yticks)
+
+        ax1.grid(True)
+        
+        # Leyenda
+        lines1, labels1 = ax1.get_legend_handles_labels()
+        ax1.legend(lines1, labels1, loc='upper right', fontsize=13)
+    
+        # --- Gráfica de Opacidad ---
+        df_dust = df_filtrado[df_filtrado['Dust'].notna()]
+        df_ice  = df_filtrado[df_filtrado['H2Oice'].notna()] 
+
+    
+        if not df_dust.empty or not df_ice.empty:
+            ax2b = ax2.twinx()
+            ax2.set_xscale('log')
+            ax2.set_xlim(1e-5, 1)
+        
+            # Usar mismos límites de altitud que la primera gráfica
+            if not df_temp.empty:
+                ax2b.set_ylim(alt_min, alt_max)
+                ax2b.set_yticks(yticks)
+                ax2.set_ylim(pres_min, pres_max)
+            else:
+                # Si no hay datos de temp, calcular de dust/ice - Diria que en principio esta condicion de no encontrar datos en df_temp pero si en df_dust y df_ice no debería ocurrir
+                alt_data = pd.concat([df_dust['Alt'], df_ice['Alt']] if not df_ice.empty else [df_dust['Alt']])
+                pres_data = pd.concat([df_dust['Pres'], df_ice['Pres']] if not df_ice.empty else [df_dust['Pres']])
+                if not alt_data.empty:
+                    ax2b.set_ylim(alt_data.min(), alt_data.max())
+                    ax2.set_ylim(pres_data.max(), pres_data.min())
+        
+            ax2.tick_params(axis='both', labelsize=14)
+            ax2.yaxis.labelpad = 10
+        
+            if not df_dust.empty:
+                ax2.errorbar(df_dust['Dust'], df_dust['Pres'],
+                        xerr=df_dust['Dust_err'], elinewidth=0.5,
+                        fmt='o', color='sienna', ms=3, 
+                        label='Dust', alpha=0.6, capsize=3)
+        
+            if not df_ice.empty:
+                ax2.errorbar(df_ice['H2Oice'], df_ice['Pres'],
+                        xerr=df_ice['H2Oice_err'], elinewidth=0.5,
+                        fmt='o', color='royalblue', ms=3,
+                        label='Ice H₂O', alpha=0.6, capsize=3)
+        
+            ax2.set_xlabel('Opacity', fontsize=15)
+            ax2.set_ylabel('Pressure [Pa]', fontsize=15, color='firebrick')
+            ax2b.yaxis.set_label_position("right")
+        
+            ax2.tick_params(axis='y', labelcolor='firebrick', labelsize=14)
+            ax2.tick_params(axis='x', labelsize=14)
+            ax2b.tick_params(axis='y', labelsize=14)
+            ax2b.set_ylabel('Altitude [km]', fontsize=15)
+            ax2.set_yscale('log')
+            ax2.grid(True)
+            ax2.legend(fontsize=13)
+        else:
+            ax2.text(0.5, 0.5, 'No opacity data available', 
+                ha='center', va='center', transform=ax2.transAxes, fontsize=12)
+            ax2.set_xlabel('Opacity', fontsize=15)
+            ax2.set_ylabel('Pressure [Pa]', fontsize=15)
+            ax2b.set_ylabel('Altitude [km]', fontsize=15)
+        
+        # --- Gráfica de Temperatura Potencial ---
+        df_theta = df_filtrado.copy()
+
+        ax3b = ax3.twinx()
+        ax3.errorbar(df_theta['Theta'], df_theta['Pres'], xerr=df_theta['Theta_err'] , fmt='o', ms=3, elinewidth=0.5, color='darkred', alpha=0.6, zorder=2, label='Potential Temperature Profiles')
+
+        ax3b.plot(df_theta['Theta'], df_theta['Alt'], 'x', color='blue', alpha=0)
+
+        ax3.set_xscale('linear')
+        ax3.set_yscale('log')
+        ax3.set_xlabel('Potential Temperature [K]', fontsize=15)
+        ax3.set_ylabel('Pressure [Pa]', fontsize=15, color='firebrick')
+        ax3b.set_ylabel('Altitude [km]', fontsize=15)
+        ax3.tick_params(axis='x', labelsize=14)
+        ax3.tick_params(axis='y', labelcolor='firebrick', labelsize=14)
+        ax3b.tick_params(axis='y', labelsize=14)
+        ax3.set_xlim(150, 400) # Una vez ejecutado el programa se puede cambiar esto al momento volver a plotear y las gráficas se actualizan en base a estos nuevos límites
+        ax3.set_ylim(pres_min, pres_max)
+        ax3b.set_ylim(alt_min, alt_max)
+        ax3b.set_yticks(yticks)
+        ax3.grid(True)
+        ax3.legend(fontsize=13)
+
+        # Ajustar posición para alineación perfecta (como en Jupyter)
+        pos1 = ax1.get_position()
+        pos2 = ax2.get_position()
+        pos3 = ax3.get_position()
+        ax2.set_position([pos2.x0, pos1.y0, pos2.width, pos1.height])
+        ax3.set_position([pos3.x0, pos1.y0, pos3.width, pos1.height])
+    
+    # Título general
+    fig.suptitle(
+        f"Atmospheric Profiles MY {MY:.0f} Ls = {Ls:.1f}° | "
+        f"Latitude: {lat_range[0]:.1f} to {lat_range[1]:.1f}°N | "
+        f"Longitude: {lon_range[0]:.1f} to {lon_range[1]:.1f}°E | "
+        f"LTST: {local_range[0]:.1f} to {local_range[1]:.1f} hrs",
+        fontsize=18, y=1.02, fontweight = 'bold'
+    )
+    
+    fig.tight_layout()
+
+    # === Fijar límites de altitud de manera definitiva (resuelve el problema del autoescalado dado por twinx()) ===
+    if not df_temp.empty:
+        ax1b.set_autoscale_on(False)
+        ax2b.set_autoscale_on(False)
+        ax3b.set_autoscale_on(False)
+        ax1b.set_ylim(alt_min, alt_max)
+        ax2b.set_ylim(alt_min, alt_max)
+        ax3b.set_ylim(alt_min, alt_max)
+
+    return fig
+
+crear_graficas.columnas = COLUMNAS_GRAFICAS
+
+
+# --- Gráficas de climatología (cubo lat, lon, LTST, presión) ---
+@cronometrar('figura_climatologia')
+def crear_grafica_climatologia(cubo, producto, variable, pres_range=None):
+    '''
+    producto : 'zonal' -> media zonal latitud vs presión
+               'lat_ltst' -> sección latitud vs LTST promediada en pres_range [Pa]
+    '''
+    if producto == 'zonal':
+        red = cubo.reducir(['lon', 'ltst'])
+        x, y = cubo.bordes['lat'], cubo.bordes['pres']
+        campo = red.media(variable)[:, 0, 0, :].T
+        conteo = red.conteos(variable)[:, 0, 0, :].T
+        ylabel = 'Pressure [Pa]'
+    else:
+        sub = cubo if pres_range is None else cubo.recortar('pres', min(pres_range), max(pres_range))
+        if sub is None:
+            return None
+        red = sub.reducir(['lon', 'pres'])
+        x, y = cubo.bordes['lat'], cubo.bordes['ltst']
+        campo = red.media(variable)[:, 0, :, 0].T
+        conteo = red.conteos(variable)[:, 0, :, 0].T
+        ylabel = 'LTST [hrs]'
+
+    if not np.isfinite(campo).any():
+        return None
+
+    fig = _figura(figsize=(18, 6))
+    ax1, ax2 = fig.subplots(1, 2)
+    malla = ax1.pcolormesh(x, y, np.ma.masked_invalid(campo), cmap='RdYlBu_r', shading='flat')
+    fig.colorbar(malla, ax=ax1, label=f'{variable} (mean)')
+    malla2 = ax2.pcolormesh(x, y, np.ma.masked_equal(conteo, 0), cmap='viridis', shading='flat')
+    fig.colorbar(malla2, ax=ax2, label='Number of data')
+    for ax in (ax1, ax2):
+        ax.set_xlabel('Latitude [°N]', fontsize=13)
+        ax.set_ylabel(ylabel, fontsize=13)
+        if producto == 'zonal':
+            ax.set_yscale('log')
+            ax.invert_yaxis()
+    fig.suptitle(f"{'Zonal mean' if producto == 'zonal' else 'Latitude - LTST'} of {variable} | "
+                 f"{len(cubo.dias)} day(s): {', '.join(sorted(cubo.dias))}", fontsize=14)
+    fig.tight_layout()
+    return fig
+
+# --- Hovmöller Ls - latitud de varios años marcianos ---
+@cronometrar('figura_hovmoller')
+def crear_grafica_hovmoller(hov, variable, nivel, anios=None):
+    '''
+    Un panel Ls vs latitud por año marciano con la media de variable en un nivel de la rejilla.
+    hov   : HovmollerLsLat
+    nivel : índice del nivel en NIVELES_MCS (uno de hov.niveles)
+    anios : años a pintar (por defecto todos los que tienen datos de la variable)
+    Devuelve None si no hay datos.
+    '''
+    anios = [a for a in (anios if anios is not None else hov.anios) if hov.conteos(variable, a, nivel).any()]
+    if not anios:
+        return None
+    campos = [hov.media(variable, a, nivel) for a in anios]
+    vmin = min(np.nanmin(c) for c in campos)
+    vmax = max(np.nanmax(c) for c in campos)
+
+    fig = _figura(figsize=(14, 3.5 * len(anios)))
+    axs = fig.subplots(len(anios), 1, sharex=True, squeeze=False)
+    for ax, anio, campo in zip(axs[:, 0], anios, campos):
+        malla = ax.pcolormesh(hov.bordes['ls'], hov.bordes['lat'], np.ma.masked_invalid(campo).T,
+                              cmap='RdYlBu_r', shading='flat', vmin=vmin, vmax=vmax)
+        ax.set_ylabel('Latitude [°N]', fontsize=13)
+        ax.set_title(f"MY {anio}", fontsize=13)
+    axs[-1, 0].set_xlabel('Ls [°]', fontsize=13)
+    axs[-1, 0].set_xlim(hov.bordes['ls'][0], hov.bordes['ls'][-1])
+    fig.colorbar(malla, ax=axs[:, 0].tolist(), label=f'{variable} (mean)')
+    pres = hov.presiones()[hov.niveles.index(nivel)]
+    fig.suptitle(f"{variable} at {pres:.3g} Pa | {len(hov.dias)} day(s)", fontsize=14)
+    return fig
@@ -0,0 +1,153 @@
+#########################################################################
+#Diagrama de Hovmoller Ls - latitud para varios años marcianos: sumas y
+#conteos por (MY, bin de Ls, bin de latitud) de algunas variables en
+#niveles de la rejilla estandar de presion. Se acumula dia a dia al
+#ingerir, y la grafica sale de estos arrays sin releer los perfiles.
+#########################################################################
+
+import numpy as np
+
+from mcs.climatologia import indices_bin
+from mcs.niveles import N_NIVELES, NIVELES_MCS
+
+# Niveles de la rejilla que se acumulan por defecto (~215, 46, 10 y 1 Pa)
+NIVELES_POR_DEFECTO = (10, 20, 30, 45)
+# Columnas de mcs.lectura que hacen falta (los trozos del almacen anteriores a MY y Ls no las tienen)
+COLUMNAS_NECESARIAS = ('MY', 'Ls', 'Lat', 'Nivel')
+
+
+def bordes_por_defecto():
+    '''Bins de 5 grados de Ls (0 a 360) y de latitud (-90 a 90)'''
+    return {'ls': np.arange(0.0, 360.1, 5.0), 'lat': np.arange(-90.0, 90.1, 5.0)}
+
+
+class HovmollerLsLat:
+    '''
+    Sumas y numero de datos de cada variable por año marciano, bin de Ls y bin de latitud,
+    en los niveles de presion elegidos. Cada año es un array (niveles, Ls, latitud) que se
+    crea al llegar su primer dato, asi que el tamaño no depende del numero de perfiles.
+
+    variables : columnas del DataFrame a acumular (por defecto 'T' y 'Dust')
+    niveles   : indices de NIVELES_MCS (las filas de otros niveles o fuera de la rejilla no entran)
+    bordes    : dict opcional {'ls': bordes, 'lat': bordes}
+    '''
+
+    def __init__(self, variables=('T', 'Dust'), niveles=NIVELES_POR_DEFECTO, bordes=None):
+        self.variables = tuple(variables)
+        self.niveles = tuple(int(n) for n in niveles)
+        self.bordes = bordes_por_defecto()
+        for eje, b in (bordes or {}).items():
+            if eje not in self.bordes:
+                raise ValueError(f"Unknown axis: {eje}")
+            self.bordes[eje] = np.asarray(b, dtype=float)
+        self.forma = (len(self.niveles), len(self.bordes['ls']) - 1, len(self.bordes['lat']) - 1)
+        # Posicion de cada nivel de la rejilla en self.niveles (-1 si no se acumula)
+        self._posicion = np.full(N_NIVELES, -1, dtype=np.int64)
+        self._posicion[list(self.niveles)] = np.arange(len(self.niveles))
+        self.suma = {}  # (MY, variable) -> array con forma self.forma
+        self.conteo = {}
+        self.dias = set()
+
+    @property
+    def anios(self):
+        return sorted({my for my, _ in self.suma})
+
+    def presiones(self):
+        '''Presion (Pa) de cada nivel acumulado'''
+        return NIVELES_MCS[list(self.niveles)]
+
+    # --- Acumulacion ---
+    def actualizar(self, df, dia=None):
+        '''
+        Suma las filas de df (con las columnas MY, Ls, Lat y Nivel de mcs.lectura).
+        dia : identificador opcional; si ya se incorporo no se vuelve a sumar
+        '''
+        if dia is not None:
+            if dia in self.dias:
+                return False
+            self.dias.add(dia)
+        if df is None or len(df) == 0 or any(c not in df.columns for c in COLUMNAS_NECESARIAS):
+            return True
+
+        nivel = np.asarray(df['Nivel'])
+        k = np.where(nivel >= 0, self._posicion[np.maximum(nivel, 0)], -1)
+        i_ls = indices_bin(self.bordes['ls'], np.asarray(df['Ls'], dtype=float))
+        i_lat = indices_bin(self.bordes['lat'], np.asarray(df['Lat'], dtype=float))
+        _, nls, nlat = self.forma
+        my = np.asarray(df['MY'])
+        valido = (k >= 0) & (my >= 0) & (i_ls >= 0) & (i_ls < nls) & (i_lat >= 0) & (i_lat < nlat)
+        idx = (k * nls + i_ls) * nlat + i_lat
+        n = int(np.prod(self.forma))
+        for anio in np.unique(my[valido]):
+            filas_anio = valido & (my == anio)
+            for v in self.variables:
+                if v not in df.columns:
+                    continue
+                x = np.asarray(df[v], dtype=float)
+                m = filas_anio & np.isfinite(x)
+                if not m.any():
+                    continue
+                clave = (int(anio), v)
+                if clave not in self.suma:
+                    self.suma[clave] = np.zeros(self.forma)
+                    self.conteo[clave] = np.zeros(self.forma, dtype=np.int64)
+                self.suma[clave] += np.bincount(idx[m], weights=x[m], minlength=n).reshape(self.forma)
+                self.conteo[clave] += np.bincount(idx[m], minlength=n).reshape(self.forma)
+        return True
+
+    def combinar(self, otro):
+        '''Suma los arrays de otro Hovmoller con los mismos niveles y bordes'''
+        if (otro.niveles != self.niveles
+                or any(not np.array_equal(self.bordes[e], otro.bordes[e]) for e in self.bordes)):
+            raise ValueError("Hovmoller arrays with different levels or bin edges cannot be combined")
+        for clave in otro.suma:
+            if clave[1] not in self.variables:
+                continue
+            if clave in self.suma:
+                self.suma[clave] += otro.suma[clave]
+                self.conteo[clave] += otro.conteo[clave]
+            else:
+                self.suma[clave] = otro.suma[clave].copy()
+                self.conteo[clave] = otro.conteo[clave].copy()
+        self.dias |= otro.dias
+        return self
+
+    # --- Resultados ---
+    def conteos(self, variable, anio, nivel):
+        '''Numero de datos (Ls, latitud) de un año y un nivel de la rejilla'''
+        clave = (int(anio), variable)
+        if clave not in self.conteo:
+            return np.zeros(self.forma[1:], dtype=np.int64)
+        return self.conteo[clave][self.niveles.index(nivel)]
+
+    def media(self, variable, anio, nivel):
+        '''Media (Ls, latitud) de un año y un nivel de la rejilla (NaN donde no hay datos)'''
+        clave = (int(anio), variable)
+        if clave not in self.suma:
+            return np.full(self.forma[1:], np.nan)
+        k = self.niveles.index(nivel)
+        n = self.conteo[clave][k]
+        return np.divide(self.suma[clave][k], n, out=np.full(n.shape, np.nan), where=n > 0)
+
+    # --- Persistencia ---
+    def guardar(self, ruta):
+        datos = {'bordes_ls': self.bordes['ls'], 'bordes_lat': self.bordes['lat'],
+                 'variables': np.array(self.variables), 'niveles': np.array(self.niveles),
+                 'dias': np.array(sorted(str(d) for d in self.dias))}
+        for (anio, v) in self.suma:
+            datos[f'suma_{v}_{anio}'] = self.suma[(anio, v)]
+            datos[f'conteo_{v}_{anio}'] = self.conteo[(anio, v)]
+        np.savez_compressed(ruta, **datos)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with np.load(ruta) as datos:
+            hov = cls(tuple(str(v) for v in datos['variables']), datos['niveles'],
+                      {'ls': datos['bordes_ls'], 'lat': datos['bordes_lat']})
+            for nombre in datos.files:
+                if nombre.startswith('suma_'):
+                    v, anio = nombre[len('suma_'):].rsplit('_', 1)
+                    hov.suma[(int(anio), v)] = datos[nombre].copy()
+                    hov.conteo[(int(anio), v)] = datos[f'conteo_{v}_{anio}'].copy()
+            hov.dias = set(str(d) for d in datos['dias'])
+        return hov
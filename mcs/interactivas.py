@@ -0,0 +1,156 @@
+#########################################################################
+#Graficas interactivas (Plotly, WebGL) de los tres paneles de perfiles:
+#T y Psat, opacidad y temperatura potencial. El servidor no envia todos
+#los puntos: los diezma a una rejilla del tamaño aproximado del panel en
+#pantalla (un punto por celda) dentro de la ventana visible. Al hacer zoom
+#(seleccionando puntos) se vuelve a diezmar solo esa ventana, con mas
+#detalle. Plotly es opcional (requirements-extra.txt).
+#########################################################################
+
+import numpy as np
+
+try:
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    use_plotly = True
+except ImportError:
+    use_plotly = False
+
+from mcs.rendimiento import cronometrar
+from mcs.termodinamica import calcular_presion_saturacion, calcular_presion_saturacion_H2O
+
+# Rejilla de diezmado de cada panel (celdas en x, y): unos 2 px por celda en un panel de ~600 x 600 px
+CELDAS = (300, 300)
+# Ejes x por defecto de cada panel (los mismos que en mcs.graficas.crear_graficas) y si son logarítmicos
+EJES_X = {'T': ((50.0, 300.0), False), 'opacidad': ((1e-5, 1.0), True), 'Theta': ((150.0, 400.0), False)}
+PANELES = ('T', 'opacidad', 'Theta')
+
+
+def diezmar(x, y, rango_x, rango_y, log_x=False, log_y=True, celdas=CELDAS):
+    '''
+    Índices de los puntos a dibujar: los que caen dentro de la ventana (rango_x, rango_y), uno por
+    celda de una rejilla celdas[0] x celdas[1] sobre ella (el primero en el orden de las filas).
+    Las celdas se reparten en escala logarítmica en los ejes log_x / log_y.
+    '''
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    ejes = [(x, (min(rango_x), max(rango_x)), log_x, celdas[0]), (y, (min(rango_y), max(rango_y)), log_y, celdas[1])]
+    dentro = np.ones(len(x), dtype=bool)
+    for v, (a, b), _, _ in ejes:
+        dentro &= (v >= a) & (v <= b)  # Los NaN quedan fuera
+    filas = np.flatnonzero(dentro)
+    celda = np.zeros(len(filas), dtype=np.int64)
+    for v, (a, b), log, n in ejes:
+        v = v[filas]
+        if log:
+            v, a, b = np.log10(v), np.log10(a), np.log10(b)
+        celda = celda * n + np.clip(((v - a) / ((b - a) or 1.0) * n).astype(np.int64), 0, n - 1)
+    _, primera = np.unique(celda, return_index=True)
+    return filas[np.sort(primera)]
+
+def _ampliar(rango, log, margen=0.05):
+    '''Rango con un margen relativo a cada lado (en escala logarítmica si log)'''
+    a, b = rango
+    if log:
+        a, b = np.log10(a), np.log10(b)
+    d = (b - a) * margen or abs(a) * margen or 1.0
+    a, b = a - d, b + d
+    return (float(10**a), float(10**b)) if log else (float(a), float(b))
+
+def ventana_seleccion(puntos, paneles):
+    '''
+    Ventana de zoom a partir de los puntos seleccionados en la gráfica (evento de st.plotly_chart):
+    {'panel': panel, 'x': (min, max), 'y': (min, max)}, o None si no hay puntos de datos.
+    paneles : panel de cada traza de la figura (None en las curvas de saturación)
+    '''
+    puntos = [p for p in puntos if paneles[p['curve_number']] is not None]
+    if not puntos:
+        return None
+    panel = paneles[puntos[0]['curve_number']]
+    puntos = [p for p in puntos if paneles[p['curve_number']] == panel]
+    x = [float(p['x']) for p in puntos]
+    y = [float(p['y']) for p in puntos]
+    return {'panel': panel, 'x': _ampliar((min(x), max(x)), EJES_X[panel][1]), 'y': _ampliar((min(y), max(y)), True)}
+
+@cronometrar('figura_interactiva')
+def crear_graficas_interactivas(df_filtrado, lat_range, lon_range, local_range, MY, Ls, ventana=None,
+                                Xvv_CO2_min=0.95, Xvv_H2O_min=1.0e-5, Xvv_H2O_max=9.0e-5, celdas=CELDAS):
+    '''
+    Figura Plotly de 3 paneles (como mcs.graficas.crear_graficas) con trazas Scattergl diezmadas.
+    ventana : zoom de ventana_seleccion (None = todo el rango); la presión se aplica a los tres paneles
+    Devuelve (figura, info) con info = {'paneles': panel de cada traza, 'puntos': dibujados, 'total': filas
+    con datos}, o (None, None) si no hay datos en el rango seleccionado.
+    '''
+    if not use_plotly:
+        raise ImportError("Interactive plots need plotly (pip install -r requirements-extra.txt)")
+    df = df_filtrado[df_filtrado['Pres'].notna() & df_filtrado['Alt'].notna() & df_filtrado['T'].notna()]
+    if df.empty:
+        return None, None
+
+    pres = df['Pres'].to_numpy(dtype=float)
+    pres = pres[pres > 0]  # Eje logarítmico
+    if not len(pres):
+        return None, None
+    rango_y = ventana['y'] if ventana else (float(pres.min()), float(pres.max()))
+    rangos_x = {p: ventana['x'] if ventana and ventana['panel'] == p else EJES_X[p][0] for p in PANELES}
+
+    fig = make_subplots(rows=1, cols=3, shared_yaxes=True, horizontal_spacing=0.03,
+                        subplot_titles=("Temperature", "Opacity", "Potential Temperature"))
+    paneles = []
+    info = {'paneles': paneles, 'puntos': 0, 'total': 0}
+
+    def anadir_puntos(panel, columna, columna_err, nombre, color):
+        datos = df[df[columna].notna()]
+        if datos.empty:
+            return
+        x = datos[columna].to_numpy(dtype=float)
+        y = datos['Pres'].to_numpy(dtype=float)
+        i = diezmar(x, y, rangos_x[panel], rango_y, EJES_X[panel][1], True, celdas)
+        info['puntos'] += len(i)
+        info['total'] += len(x)
+        fig.add_trace(go.Scattergl(
+            x=x[i], y=y[i], mode='markers', name=nombre, opacity=0.6,
+            marker=dict(color=color, size=4),
+            error_x=dict(type='data', array=datos[columna_err].to_numpy(dtype=float)[i], thickness=0.5, width=0,
+                         color=color),
+            customdata=datos['Alt'].to_numpy(dtype=float)[i],
+            hovertemplate=f"{nombre}: %{{x:.4g}}<br>Pressure: %{{y:.3g}} Pa<br>Altitude: %{{customdata:.1f}} km"
+                          "<extra></extra>"),
+            row=1, col=PANELES.index(panel) + 1)
+        paneles.append(panel)
+
+    # --- Temperatura y curvas de saturación ---
+    anadir_puntos('T', 'T', 'T_err', 'Temperature', 'firebrick')
+    T_range = np.linspace(50, 300, 100)
+    for psat, nombre, color, linea in (
+            (calcular_presion_saturacion(T_range, Xvv_CO2_min), f'Psat CO₂ X={Xvv_CO2_min:.2f}', 'navy', 'dash'),
+            (calcular_presion_saturacion_H2O(T_range, Xvv_H2O_min), f'Psat H₂O X_min={Xvv_H2O_min:.2e}', 'lime', 'dash'),
+            (calcular_presion_saturacion_H2O(T_range, Xvv_H2O_max), f'Psat H₂O X_max={Xvv_H2O_max:.2e}', 'lime', 'dot')):
+        fig.add_trace(go.Scatter(x=T_range, y=psat, mode='lines', name=nombre,
+                                 line=dict(color=color, dash=linea, width=2)), row=1, col=1)
+        paneles.append(None)
+
+    # --- Opacidad ---
+    anadir_puntos('opacidad', 'Dust', 'Dust_err', 'Dust', 'sienna')
+    anadir_puntos('opacidad', 'H2Oice', 'H2Oice_err', 'Ice H₂O', 'royalblue')
+
+    # --- Temperatura potencial ---
+    if 'Theta' in df.columns:
+        anadir_puntos('Theta', 'Theta', 'Theta_err', 'Potential Temperature', 'darkred')
+
+    # Presión logarítmica y creciente hacia abajo (rango en log10 en los ejes logarítmicos de Plotly)
+    fig.update_yaxes(type='log', range=[np.log10(max(rango_y)), np.log10(min(rango_y))], showgrid=True)
+    fig.update_yaxes(title_text="Pressure [Pa]", row=1, col=1)
+    for k, panel in enumerate(PANELES, start=1):
+        (a, b), log = rangos_x[panel], EJES_X[panel][1]
+        fig.update_xaxes(type='log' if log else 'linear', range=[np.log10(a), np.log10(b)] if log else [a, b],
+                         row=1, col=k)
+    fig.update_xaxes(title_text="Temperature [K]", row=1, col=1)
+    fig.update_xaxes(title_text="Opacity", row=1, col=2)
+    fig.update_xaxes(title_text="Potential Temperature [K]", row=1, col=3)
+    fig.update_layout(
+        title=(f"Atmospheric Profiles MY {MY:.0f} Ls = {Ls:.1f}° | "
+               f"Latitude: {lat_range[0]:.1f} to {lat_range[1]:.1f}°N | "
+               f"Longitude: {lon_range[0]:.1f} to {lon_range[1]:.1f}°E | "
+               f"LTST: {local_range[0]:.1f} to {local_range[1]:.1f} hrs"),
+        height=650, dragmode='select', legend=dict(orientation='h', y=-0.15))
+    return fig, info
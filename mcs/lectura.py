@@ -0,0 +1,822 @@
+#########################################################################
+#Lectura de los archivos DDR (.TAB) de MCS
+#Capa de datos sin Streamlit: cada carga devuelve, ademas del DataFrame,
+#un informe estructurado (lineas procesadas/ignoradas, tiempos, rangos)
+#que la aplicacion o un trabajo por lotes pueden mostrar como quieran.
+#Varios archivos se pueden parsear en paralelo en un pool de procesos:
+#cada trabajador deja sus columnas en memoria compartida (sin pickle).
+#########################################################################
+
+import mmap
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from marstime import Mars_Ls, Mars_Year, dt64_2j2000_ott
+from mcs.diagnosticos import COLUMNAS_DIAGNOSTICOS, anadir_diagnosticos
+from mcs.niveles import SIN_NIVEL, aviso_sin_nivel, indices_nivel
+from mcs.rendimiento import registrar
+
+CODIFICACION = "latin1"
+VALOR_RELLENO = -9999  # Valor de relleno de los DDR (dato no disponible)
+
+# Esquema compacto del DataFrame combinado: clave entera de perfil, float32 para magnitudes y errores
+# y el nivel de la rejilla estándar de presión (mcs.niveles; -1 si la fila está fuera de ella).
+# Ls y MY salen de la fecha y hora UTC de la cabecera de cada perfil (MY -1 si no se puede leer)
+COLUMNAS_DDR = [
+    'Pres', 'T', 'T_err', 'Dust', 'Dust_err',
+    'H2Ovap', 'H2Ovap_err', 'H2Oice', 'H2Oice_err',
+    'CO2ice', 'CO2ice_err', 'Alt', 'Lat', 'Lon'
+]
+ESQUEMA = {'Perfil': np.int32, **{col: np.float32 for col in COLUMNAS_DDR}, 'LocalTime': np.float32,
+           'Ls': np.float32, 'MY': np.int8, 'Nivel': np.int8, **{col: np.float32 for col in COLUMNAS_DIAGNOSTICOS}}
+
+# Columnas de las que se dan rangos en los informes
+COLUMNAS_RANGOS = ['Pres', 'T', 'Alt', 'Lat', 'Lon', 'LocalTime']
+
+MAX_EJEMPLOS_IGNORADOS = 3  # Lineas ignoradas que se guardan como ejemplo en el informe
+
+# Lectura sobre el buffer mapeado: bytes ASCII que se usan y tamaño de los bloques de líneas
+_SALTO, _COMA, _COMILLA, _GUION, _PUNTO, _MAS = 10, 44, 34, 45, 46, 43
+_BLANCOS = (32, 9, 13, 11, 12)  # Lo que quita str.strip() (salvo el salto de línea, que separa las líneas)
+LINEAS_POR_BLOQUE = 8192  # Acota la memoria temporal al decodificar archivos grandes
+BYTES_POR_BLOQUE = 8 * 1024**2  # Idem al buscar los saltos de línea
+ANCHO_MAX_CAMPO = 32  # Campos más largos se consideran no numéricos
+
+# Campos de la cabecera de cada perfil (0 = primera columna): LTST (fracción de día), Profile_lat y Profile_lon
+CAMPO_LTST, CAMPO_LAT, CAMPO_LON = 11, 12, 13
+# Las filas de un perfil están cerca de su posición de cabecera pero no en ella (geometría del limbo):
+# un perfil solo se salta si su cabecera está más allá de este margen (grados) de los rangos pedidos
+MARGEN_CABECERA_LAT = 5.0
+MARGEN_CABECERA_LON = 10.0
+LAT_MAX_MARGEN_LON = 80.0  # Más cerca de los polos la longitud no se usa para saltar perfiles
+
+# Carga en paralelo: procesos por defecto de la app y método de arranque de los trabajadores.
+# forkserver: los trabajadores nacen de un proceso limpio con mcs.lectura ya importado
+# (fork directamente desde un servidor con hilos, como Streamlit, no es seguro)
+PROCESOS_CARGA = os.cpu_count() or 1
+METODO_INICIO = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+# --- Funciones auxiliares ---
+def convertir_longitud(lon):
+    return lon % 360
+
+def convertir_float(texto):
+    '''float() que devuelve NaN en lugar de lanzar ValueError (equivale a pd.to_numeric(errors='coerce'))'''
+    try:
+        return float(texto.replace(',', '.'))
+    except ValueError:
+        return np.nan
+
+def calcular_rangos(df, columnas=COLUMNAS_RANGOS):
+    '''Rangos (min, max) de las columnas presentes en df'''
+    return {col: (float(df[col].min()), float(df[col].max())) for col in columnas if col in df.columns and len(df)}
+
+def combinar_rangos(r1, r2):
+    res = dict(r1)
+    for col, (minimo, maximo) in r2.items():
+        if col in res:
+            res[col] = (np.nanmin([res[col][0], minimo]), np.nanmax([res[col][1], maximo]))
+        else:
+            res[col] = (minimo, maximo)
+    return res
+
+
+# --- Informes de carga ---
+class InformeCarga:
+    '''Resultado de cargar un archivo DDR'''
+
+    def __init__(self, archivo):
+        self.archivo = str(archivo)
+        self.lineas_totales = 0
+        self.lineas_procesadas = 0
+        self.lineas_ignoradas = 0
+        self.filas_finales = 0
+        self.filas_descartadas = 0  # Filas de datos que no cumplen el FiltroCarga
+        self.perfiles_duplicados = 0  # Perfiles ya cargados (FiltroCarga.duplicados)
+        self.perfiles_fuera_rango = 0  # Perfiles saltados por su cabecera (FiltroCarga.rangos)
+        self.filas_sin_nivel = 0  # Filas cuya presión no está en la rejilla de niveles de MCS
+        self.claves = []  # Claves (fecha y hora UTC de la cabecera) de los perfiles nuevos, se guardan con el trozo
+        self.primera_linea = None  # Primera línea de datos, como ejemplo
+        self.local_time_primera = None  # LocalTime asignado a la primera línea de datos
+        self.ignoradas = []  # Primeras líneas ignoradas y el motivo
+        self.tiempo_lectura = 0.0  # s
+        self.tiempo_parseo = 0.0  # s
+        self.rangos = {}
+        self.error = None
+
+    @property
+    def tiempo_total(self):
+        return self.tiempo_lectura + self.tiempo_parseo
+
+    @property
+    def correcto(self):
+        return self.error is None and self.filas_finales > 0
+
+    def ignorar(self, motivo):
+        self.lineas_ignoradas += 1
+        if len(self.ignoradas) < MAX_EJEMPLOS_IGNORADOS:
+            self.ignoradas.append(motivo)
+
+    def como_dict(self):
+        return {
+            'archivo': Path(self.archivo).name,
+            'lineas_totales': self.lineas_totales,
+            'lineas_procesadas': self.lineas_procesadas,
+            'lineas_ignoradas': self.lineas_ignoradas,
+            'filas_finales': self.filas_finales,
+            'filas_descartadas': self.filas_descartadas,
+            'perfiles_duplicados': self.perfiles_duplicados,
+            'perfiles_fuera_rango': self.perfiles_fuera_rango,
+            'filas_sin_nivel': self.filas_sin_nivel,
+            'tiempo_lectura_s': round(self.tiempo_lectura, 4),
+            'tiempo_parseo_s': round(self.tiempo_parseo, 4),
+            'error': self.error,
+        }
+
+    def __str__(self):
+        if self.error:
+            return f"{Path(self.archivo).name}: error ({self.error})"
+        return (f"{Path(self.archivo).name}: {self.lineas_procesadas} processed lines, "
+                f"{self.lineas_ignoradas} ignored, {self.filas_finales} records, {self.tiempo_total:.2f} s")
+
+
+class InformeCargaMultiple:
+    '''Resultado de cargar varios archivos DDR: los informes por archivo y los totales'''
+
+    def __init__(self):
+        self.informes = []
+        self.rangos = {}
+        self.tiempo_total = 0.0  # s, tiempo de pared de toda la carga
+
+    def anadir(self, informe):
+        self.informes.append(informe)
+        self.rangos = combinar_rangos(self.rangos, informe.rangos)
+
+    @property
+    def archivos(self):
+        return len(self.informes)
+
+    @property
+    def archivos_validos(self):
+        return sum(i.correcto for i in self.informes)
+
+    @property
+    def errores(self):
+        return [i for i in self.informes if i.error]
+
+    @property
+    def lineas_procesadas(self):
+        return sum(i.lineas_procesadas for i in self.informes)
+
+    @property
+    def lineas_ignoradas(self):
+        return sum(i.lineas_ignoradas for i in self.informes)
+
+    @property
+    def filas(self):
+        return sum(i.filas_finales for i in self.informes)
+
+    @property
+    def filas_descartadas(self):
+        return sum(i.filas_descartadas for i in self.informes)
+
+    @property
+    def perfiles_duplicados(self):
+        return sum(i.perfiles_duplicados for i in self.informes)
+
+    @property
+    def perfiles_fuera_rango(self):
+        return sum(i.perfiles_fuera_rango for i in self.informes)
+
+    @property
+    def filas_sin_nivel(self):
+        return sum(i.filas_sin_nivel for i in self.informes)
+
+    @property
+    def aviso_niveles(self):
+        '''Aviso si la mayoría de filas no está en la rejilla de niveles (None si no)'''
+        return aviso_sin_nivel(self.filas_sin_nivel, self.filas)
+
+    def tabla(self):
+        '''DataFrame con una fila por archivo'''
+        return pd.DataFrame([i.como_dict() for i in self.informes])
+
+    def como_dict(self):
+        return {
+            'archivos': self.archivos,
+            'archivos_validos': self.archivos_validos,
+            'lineas_procesadas': self.lineas_procesadas,
+            'lineas_ignoradas': self.lineas_ignoradas,
+            'filas': self.filas,
+            'filas_descartadas': self.filas_descartadas,
+            'perfiles_duplicados': self.perfiles_duplicados,
+            'perfiles_fuera_rango': self.perfiles_fuera_rango,
+            'filas_sin_nivel': self.filas_sin_nivel,
+            'tiempo_total_s': round(self.tiempo_total, 4),
+            'rangos': {c: [float(a), float(b)] for c, (a, b) in self.rangos.items()},
+            'informes': [i.como_dict() for i in self.informes],
+        }
+
+    def __str__(self):
+        duplicados = f", {self.perfiles_duplicados} duplicate profiles dropped" if self.perfiles_duplicados else ""
+        fuera = f", {self.perfiles_fuera_rango} profiles outside the load ranges skipped" if self.perfiles_fuera_rango else ""
+        return (f"{self.archivos_validos}/{self.archivos} files, {self.lineas_procesadas} processed lines, "
+                f"{self.lineas_ignoradas} ignored, {self.filas} records in {self.tiempo_total:.2f} s{duplicados}{fuera}")
+
+
+# --- Filtro declarativo de la carga ---
+class FiltroCarga:
+    '''
+    Reglas que se aplican mientras se decodifica cada archivo: las filas que no las cumplen no
+    llegan a crearse (ni a pasar a float32, al DataFrame o al almacen).
+
+    requeridas : columnas que deben tener valor (no NaN ni de relleno); por defecto las que hacen
+                 falta para situar y pintar un punto ('Pres', 'T', 'Alt', 'Lat', 'Lon')
+    max_error  : {columna: máximo}, p.ej. {'T_err': 5.0}; se descartan las filas con un error mayor
+    rellenos   : valores que significan dato no disponible (pasan a NaN)
+    duplicados : descartar los perfiles repetidos (misma fecha y hora UTC en la cabecera), p.ej.
+                 en archivos DDR que se solapan (por defecto sí); entre archivos solo en una misma carga
+    rangos     : {columna: (mínimo, máximo)} de las filas que se quieren (extremos incluidos, como
+                 filtrar_rangos). Con 'Lat', 'Lon' o 'LocalTime' los perfiles cuya cabecera queda fuera
+                 se saltan sin decodificar sus niveles; el resto de filas se filtran después de calcular
+                 los diagnósticos de sus perfiles (que necesitan los perfiles completos)
+    '''
+
+    def __init__(self, requeridas=('Pres', 'T', 'Alt', 'Lat', 'Lon'), max_error=None,
+                 rellenos=(VALOR_RELLENO,), duplicados=True, rangos=None):
+        self.requeridas = tuple(requeridas)
+        self.max_error = dict(max_error or {})
+        self.rellenos = tuple(float(v) for v in rellenos)
+        self.duplicados = bool(duplicados)
+        self.rangos = {col: (float(a), float(b)) for col, (a, b) in (rangos or {}).items()}
+        desconocidas = [c for c in (*self.requeridas, *self.max_error, *self.rangos) if c not in (*COLUMNAS_DDR, 'LocalTime')]
+        if desconocidas:
+            raise ValueError(f"Unknown columns in load filter: {', '.join(desconocidas)}")
+
+    @classmethod
+    def desde_dict(cls, datos):
+        '''Filtro a partir de un dict (p.ej. leído de un JSON) con las mismas claves que __init__'''
+        desconocidas = set(datos) - {'requeridas', 'max_error', 'rellenos', 'duplicados', 'rangos'}
+        if desconocidas:
+            raise ValueError(f"Unknown load filter keys: {', '.join(sorted(desconocidas))}")
+        return cls(**datos)
+
+    def con_rangos(self, rangos):
+        '''Copia del filtro con otros rangos'''
+        return FiltroCarga(**{**self.como_dict(), 'rangos': rangos})
+
+    def como_dict(self):
+        return {'requeridas': list(self.requeridas), 'max_error': self.max_error,
+                'rellenos': list(self.rellenos), 'duplicados': self.duplicados,
+                'rangos': {col: list(r) for col, r in self.rangos.items()}}
+
+    @property
+    def salta_perfiles(self):
+        '''True si hay perfiles que se pueden saltar enteros a partir de su cabecera'''
+        return self.duplicados or any(col in self.rangos for col in ('Lat', 'Lon', 'LocalTime'))
+
+    def conservar(self, vals, local_time, rangos=True):
+        '''
+        Máscara de las filas (vals: n x 14 en el orden de COLUMNAS_DDR) que cumplen las reglas.
+        rangos : si es False no se aplican los rangos (ver en_rangos)
+        '''
+        columna = lambda col: local_time if col == 'LocalTime' else vals[:, COLUMNAS_DDR.index(col)]
+        conservar = np.ones(len(vals), dtype=bool)
+        for col in self.requeridas:
+            conservar &= ~np.isnan(columna(col))
+        for col, maximo in self.max_error.items():
+            conservar &= ~(columna(col) > maximo)
+        if rangos:
+            conservar &= self.en_rangos(vals, local_time)
+        return conservar
+
+    def en_rangos(self, vals, local_time):
+        '''Máscara de las filas (como en conservar) dentro de los rangos'''
+        dentro = np.ones(len(vals), dtype=bool)
+        for col, (minimo, maximo) in self.rangos.items():
+            x = local_time if col == 'LocalTime' else vals[:, COLUMNAS_DDR.index(col)]
+            dentro &= (x >= minimo) & (x <= maximo)
+        return dentro
+
+    def fuera_de_rango(self, local_time, lat, lon):
+        '''
+        Perfiles (arrays de sus valores de cabecera) que no pueden tener ninguna fila dentro de los rangos.
+        Es conservador: con la cabecera ilegible (NaN) el perfil no se salta.
+        '''
+        fuera = np.zeros(len(lat), dtype=bool)
+        if 'LocalTime' in self.rangos:
+            # Todas las filas de un perfil tienen la hora local de su cabecera
+            minimo, maximo = self.rangos['LocalTime']
+            fuera |= (local_time < minimo) | (local_time > maximo)
+        if 'Lat' in self.rangos:
+            minimo, maximo = self.rangos['Lat']
+            fuera |= (lat < minimo - MARGEN_CABECERA_LAT) | (lat > maximo + MARGEN_CABECERA_LAT)
+        if 'Lon' in self.rangos:
+            minimo, maximo = self.rangos['Lon']
+            x = np.mod(lon, 360)
+            # Distancia angular al intervalo (la longitud es circular)
+            distancia = np.min([np.maximum(np.maximum(minimo - (x + d), (x + d) - maximo), 0) for d in (-360, 0, 360)],
+                               axis=0)
+            fuera |= (distancia > MARGEN_CABECERA_LON) & (np.abs(lat) <= LAT_MAX_MARGEN_LON)
+        return fuera
+
+    def __repr__(self):
+        return f"FiltroCarga({self.como_dict()})"
+
+# El de la app, la línea de comandos y la sincronización: el almacen guarda lo mismo sea quien sea quien ingiere un día
+FILTRO_POR_DEFECTO = FiltroCarga()
+
+
+# --- Lectura ---
+def _es_blanco(buf):
+    blanco = buf == _BLANCOS[0]
+    for c in _BLANCOS[1:]:
+        blanco |= buf == c
+    return blanco
+
+def decodificar_floats(buf, ini, fin):
+    '''
+    Convierte los campos ASCII buf[ini:fin] (buf array uint8) a float64 sin crear objetos str.
+    Devuelve (valores, validos): los campos que float() no aceptaría quedan a NaN con validos=False.
+    ini, fin : arrays de posiciones con la misma forma
+    '''
+    forma = np.shape(ini)
+    ini = np.ravel(ini)
+    fin = np.ravel(fin)
+    if ini.size == 0:
+        return np.full(forma, np.nan), np.zeros(forma, dtype=bool)
+
+    # Quitar los blancos de los extremos de cada campo (equivale a strip())
+    a, b = int(ini.min()), int(fin.max())
+    llenos = np.flatnonzero(~_es_blanco(buf[a:b])) + a
+    i0 = np.searchsorted(llenos, ini)
+    i1 = np.searchsorted(llenos, fin)
+    vacio = i1 <= i0
+    llenos = np.append(llenos, b)
+    ini = np.where(vacio, ini, llenos[i0])
+    fin = np.where(vacio, ini, llenos[np.maximum(i1 - 1, 0)] + 1)
+    largo = fin - ini
+    n = len(ini)
+
+    # Se recorren los campos columna a columna (a lo sumo ANCHO_MAX_CAMPO pasadas vectorizadas)
+    validos = ~vacio & (largo <= ANCHO_MAX_CAMPO)
+    mantisa = np.zeros(n)  # Dígitos de la mantisa como entero (exacto hasta 15 dígitos)
+    exponente = np.zeros(n, dtype=np.int64)
+    decimales = np.zeros(n, dtype=np.int64)
+    hay_digitos = np.zeros(n, dtype=bool)
+    hay_digitos_exp = np.zeros(n, dtype=bool)
+    visto_punto = np.zeros(n, dtype=bool)
+    en_exp = np.zeros(n, dtype=bool)
+    p_exp = np.full(n, -2)
+    negativo = np.zeros(n, dtype=bool)
+    negativo_exp = np.zeros(n, dtype=bool)
+    ultimo = len(buf) - 1
+    for j in range(int(min(largo.max(), ANCHO_MAX_CAMPO))):
+        activo = j < largo
+        c = buf[np.minimum(ini + j, ultimo)]
+        digito = activo & (c >= 48) & (c <= 57)
+        d = c.astype(np.int64) - 48
+        m = digito & ~en_exp
+        mantisa = np.where(m, mantisa * 10 + d, mantisa)
+        decimales += m & visto_punto
+        hay_digitos |= m
+        m = digito & en_exp
+        exponente = np.where(m, exponente * 10 + d, exponente)
+        hay_digitos_exp |= m
+
+        punto = activo & (c == _PUNTO)
+        validos &= ~(punto & (visto_punto | en_exp))
+        visto_punto |= punto
+        e = activo & ((c == 69) | (c == 101))
+        validos &= ~(e & en_exp)
+        en_exp |= e
+        p_exp = np.where(e, j, p_exp)
+        # El signo solo puede ir al principio o justo después de la 'e'
+        signo = activo & ((c == _GUION) | (c == _MAS))
+        validos &= ~(signo & (j != 0) & (j != p_exp + 1))
+        negativo |= signo & (j == 0) & (c == _GUION)
+        negativo_exp |= signo & (j == p_exp + 1) & (c == _GUION)
+        validos &= ~(activo & ~(digito | punto | e | signo))  # Otros caracteres o espacios en medio
+    validos &= hay_digitos & (~en_exp | hay_digitos_exp)
+
+    # 10**k es exacto hasta k=22: una sola división/multiplicación da el mismo redondeo que float()
+    exponente = np.where(negativo_exp, -exponente, exponente) - decimales
+    with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+        valores = np.where(exponente < 0, mantisa / 10.0**np.minimum(-exponente, 400),
+                           mantisa * 10.0**np.minimum(exponente, 400))
+    valores = np.where(negativo, -valores, valores)
+    valores[~validos] = np.nan
+    return valores.reshape(forma), validos.reshape(forma)
+
+def _local_time_cabecera(campo):
+    '''Hora local (h) a partir del campo 12 de una cabecera (bytes): fracción de día o hh:mm:ss'''
+    try:
+        raw = campo.decode(CODIFICACION).strip().replace('"', '').replace("'", "")
+        try:
+            # si viene normalizado (ej: 0.5) -> multiplicar por 24
+            return float(raw.replace(',', '.')) * 24
+        except ValueError:
+            # si por lo que sea viniese en formato hh:mm:ss -> convertir a horas
+            if ':' in raw:
+                hh, mm, ss = raw.split(':')
+                return float(hh) + float(mm) / 60.0 + float(ss) / 3600.0
+            return np.nan
+    except Exception:
+        return np.nan
+
+def _utc_cabecera(campo):
+    '''Fecha y hora UTC (numpy.datetime64, NaT si no se puede leer) de los campos 2 y 3 de una cabecera (bytes)'''
+    try:
+        fecha, hora = campo.decode(CODIFICACION).replace('"', '').split(',')
+        return np.datetime64(f"{fecha.strip()}T{hora.strip()}", 'ms')
+    except ValueError:
+        return np.datetime64('NaT', 'ms')
+
+def fechas_marcianas_perfiles(utc):
+    '''MY (int8, -1 si la fecha es NaT) y Ls (float32) de un array de datetime64 UTC, sin bucles de Python'''
+    j2000 = dt64_2j2000_ott(utc)
+    my = Mars_Year(j2000)
+    return np.where(np.isnan(my), -1, my).astype(np.int8), Mars_Ls(j2000).astype(np.float32)
+
+def _linea(buf, ini, fin):
+    return bytes(buf[ini:fin]).decode(CODIFICACION)
+
+def _parsear_buffer(buf, informe, filtro=FILTRO_POR_DEFECTO, vistos=None):
+    '''
+    Recorre el buffer mapeado por bloques de líneas localizando separadores con NumPy.
+    Devuelve (perfil, valores (14 x n) float32, local_time, utc) de las filas de datos que cumplen filtro
+    salvo sus rangos por fila (de los perfiles que no se saltan enteros por la cabecera), con utc la fecha y hora UTC de cada perfil (datetime64, indexado por perfil).
+    vistos : dict {fecha y hora UTC de la cabecera: perfil} de los perfiles ya cargados; con
+             filtro.duplicados los que vuelven a aparecer no se decodifican y los nuevos se añaden
+    '''
+    if filtro.duplicados and vistos is None:
+        vistos = {}
+    saltos = np.concatenate([np.flatnonzero(buf[a:a + BYTES_POR_BLOQUE] == _SALTO) + a
+                             for a in range(0, len(buf), BYTES_POR_BLOQUE)])
+    inicios = np.concatenate(([0], saltos + 1))
+    finales = np.concatenate((saltos, [len(buf)]))
+    del saltos
+    informe.lineas_totales = len(inicios)
+
+    valores = np.empty((len(COLUMNAS_DDR), len(inicios)), dtype=np.float32)
+    perfil = np.empty(len(inicios), dtype=np.int32)
+    local_time = np.empty(len(inicios), dtype=np.float32)
+    n = 0
+    perfil_actual = -1  # Clave entera del perfil actual (se incrementa en cada cabecera)
+    local_time_actual = np.nan  # Hora local del bloque actual (se actualiza al encontrar una cabecera)
+    utc = []  # Fecha y hora UTC de cada cabecera (la de índice p es la del perfil p)
+    saltar_actual = False  # Si el perfil actual se salta (repetido o fuera de los rangos)
+
+    for a in range(0, len(inicios), LINEAS_POR_BLOQUE):
+        base = inicios[a]
+        ini = inicios[a:a + LINEAS_POR_BLOQUE] - base
+        fin = finales[a:a + LINEAS_POR_BLOQUE] - base
+        sub = buf[base:fin[-1] + base]
+
+        # Tres primeros caracteres no blancos de cada línea (sin strip() ni split())
+        llenos = np.flatnonzero(~_es_blanco(sub))
+        k = np.searchsorted(llenos, ini)
+        llenos = np.append(llenos, [len(sub), len(sub), len(sub)])
+        p1, p2, p3 = llenos[k], llenos[k + 1], llenos[k + 2]
+        sub_ext = np.append(sub, [32])
+        no_vacia = p1 < fin
+        c1 = sub_ext[np.minimum(p1, len(sub))]
+        empieza_num = no_vacia & (c1 >= 48) & (c1 <= 57)
+        # Primera columna exactamente '0'
+        cero = empieza_num & (c1 == 48) & (p2 < fin) & (sub_ext[np.minimum(p2, len(sub))] == _COMA)
+
+        comas = np.flatnonzero(sub == _COMA)
+        k = np.searchsorted(comas, ini)
+        n_comas = np.searchsorted(comas, fin) - k
+        comas = np.append(comas, np.full(16, len(sub)))
+
+        # Cabecera: >15 columnas, primera '0' y segunda una fecha entre comillas
+        guiones = np.flatnonzero(sub == _GUION)
+        c2_ini, c2_fin = comas[k] + 1, comas[k + 1]
+        cabecera = (cero & (n_comas >= 15) & (p3 < fin) & (sub_ext[np.minimum(p3, len(sub))] == _COMILLA)
+                    & (np.searchsorted(guiones, c2_fin) > np.searchsorted(guiones, c2_ini)))
+        datos = cero & (n_comas == 14)
+
+        # Líneas que no empiezan por número: encabezado/metadata del archivo
+        informe.lineas_ignoradas += int((no_vacia & ~empieza_num).sum())
+
+        # Hora local de cada cabecera (hay una por perfil, se decodifican una a una)
+        i_cab = np.flatnonzero(cabecera)
+        lt_cab = np.array([_local_time_cabecera(bytes(sub[comas[k[i] + CAMPO_LTST - 1] + 1:comas[k[i] + CAMPO_LTST]]))
+                           for i in i_cab], dtype=np.float64)
+        utc.extend(_utc_cabecera(bytes(sub[comas[k[i]] + 1:comas[k[i] + 2]])) for i in i_cab)
+
+        # Perfil y hora local de cada línea: los de la última cabecera anterior
+        n_cab = np.cumsum(cabecera)
+        perfil_bloque = perfil_actual + n_cab
+        ultima = np.maximum.accumulate(np.where(cabecera, np.arange(len(ini)), -1))
+        lt_bloque = np.where(ultima >= 0, np.append(lt_cab, np.nan)[np.maximum(n_cab - 1, 0)], local_time_actual)
+        # Perfiles que se saltan enteros, sin decodificar sus filas: repetidos y fuera de los rangos
+        if filtro.salta_perfiles:
+            saltar_cab = np.zeros(len(i_cab), dtype=bool)
+            if filtro.duplicados:
+                # La clave es la fecha y hora UTC (columnas 2 y 3 de la cabecera)
+                for j, i in enumerate(i_cab):
+                    clave = bytes(sub[comas[k[i]] + 1:comas[k[i] + 2]]).strip()
+                    saltar_cab[j] = clave in vistos
+                    if not saltar_cab[j]:
+                        vistos[clave] = int(perfil_bloque[i])
+                informe.perfiles_duplicados += int(saltar_cab.sum())
+            if filtro.rangos:
+                kc = k[i_cab]
+                lat_cab, _ = decodificar_floats(sub, comas[kc + CAMPO_LAT - 1] + 1, comas[kc + CAMPO_LAT])
+                lon_cab, _ = decodificar_floats(sub, comas[kc + CAMPO_LON - 1] + 1, comas[kc + CAMPO_LON])
+                fuera = filtro.fuera_de_rango(lt_cab, lat_cab, lon_cab) & ~saltar_cab
+                informe.perfiles_fuera_rango += int(fuera.sum())
+                saltar_cab |= fuera
+            saltar_bloque = np.where(ultima >= 0, np.append(saltar_cab, False)[np.maximum(n_cab - 1, 0)], saltar_actual)
+            if len(i_cab):
+                saltar_actual = bool(saltar_cab[-1])
+            informe.filas_descartadas += int((datos & saltar_bloque).sum())
+            datos = datos & ~saltar_bloque
+        if len(i_cab):
+            perfil_actual += len(i_cab)
+            local_time_actual = lt_cab[-1]
+
+        # Campos numéricos de las filas de datos, decodificados directamente del buffer
+        i_dat = np.flatnonzero(datos)
+        kd = k[i_dat]
+        campos_ini = comas[kd[:, None] + np.arange(14)] + 1
+        campos_fin = np.concatenate((comas[kd[:, None] + np.arange(1, 14)], fin[i_dat, None]), axis=1)
+        vals, validos = decodificar_floats(sub, campos_ini, campos_fin)
+
+        # La segunda columna debe ser numérica; si no, la línea se ignora
+        malas = ~validos[:, 0]
+        for i in i_dat[malas][:max(0, MAX_EJEMPLOS_IGNORADOS - len(informe.ignoradas))]:
+            informe.ignoradas.append(f"error: could not convert string to float: "
+                                     f"{_linea(sub, comas[k[i]] + 1, comas[k[i] + 1]).strip()!r}")
+        informe.lineas_ignoradas += int(malas.sum())
+        i_dat, vals = i_dat[~malas], vals[~malas]
+
+        # Resto de líneas que empiezan por número (cabeceras incluidas): no son filas de datos
+        otras = np.flatnonzero(empieza_num & ~datos)
+        for i in otras[:max(0, MAX_EJEMPLOS_IGNORADOS - len(informe.ignoradas))]:
+            linea = _linea(sub, ini[i], fin[i])
+            informe.ignoradas.append(f"{n_comas[i] + 1} columns, start with '{linea.split(',')[0].strip()}': {linea[:100]}")
+        informe.lineas_ignoradas += len(otras)
+
+        if len(i_dat) and informe.primera_linea is None:
+            informe.primera_linea = _linea(sub, ini[i_dat[0]], fin[i_dat[0]]).strip()
+            informe.local_time_primera = float(lt_bloque[i_dat[0]])
+        informe.lineas_procesadas += len(i_dat)
+        # Filtrar valores inválidos (-9999) y convertir longitud antes de pasar a float32
+        for relleno in filtro.rellenos:
+            vals[vals == relleno] = np.nan
+        lon = vals[:, COLUMNAS_DDR.index('Lon')]
+        np.mod(lon, 360, out=lon)
+        # Reglas del filtro: solo se guardan las filas que las cumplen. Los rangos se aplican en _cargar_archivo,
+        # con los diagnósticos ya calculados sobre los perfiles completos
+        conservar = filtro.conservar(vals, lt_bloque[i_dat], rangos=False)
+        informe.filas_descartadas += int((~conservar).sum())
+        i_dat, vals = i_dat[conservar], vals[conservar]
+        m = len(i_dat)
+        valores[:, n:n + m] = vals.T
+        perfil[n:n + m] = perfil_bloque[i_dat]
+        local_time[n:n + m] = lt_bloque[i_dat]
+        n += m
+
+    return perfil[:n], valores[:, :n], local_time[:n], np.array(utc, dtype='datetime64[ms]')
+
+def _cargar_archivo(archivo, filtro=FILTRO_POR_DEFECTO, vistos=None):
+    informe = InformeCarga(archivo)
+    if filtro.duplicados and vistos is None:
+        vistos = {}
+    n_vistos = len(vistos) if vistos is not None else 0
+    try:
+        t0 = time.perf_counter()
+        with open(archivo, 'rb') as f:
+            if Path(archivo).stat().st_size == 0:
+                informe.lineas_totales = 1
+                return pd.DataFrame(), informe
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                buf = np.frombuffer(mm, dtype=np.uint8)
+                t1 = time.perf_counter()
+                informe.tiempo_lectura = t1 - t0
+                perfil, valores, local_time, utc = _parsear_buffer(buf, informe, filtro, vistos)
+                del buf  # El mapeo no se puede cerrar mientras haya vistas de NumPy sobre él
+        if vistos is not None:
+            informe.claves = list(vistos)[n_vistos:]  # Las nuevas quedan al final del dict
+
+        if not len(perfil):
+            informe.tiempo_parseo = time.perf_counter() - t1
+            return pd.DataFrame(), informe
+
+        # DataFrame con el esquema compacto; las filas que no cumplen las reglas del filtro ya no están
+        # MY y Ls se calculan una vez por perfil y se reparten a sus filas
+        my, ls = fechas_marcianas_perfiles(utc)
+        columnas = {'Perfil': perfil, **{col: valores[k] for k, col in enumerate(COLUMNAS_DDR)}, 'LocalTime': local_time,
+                    'Ls': ls[perfil], 'MY': my[perfil], 'Nivel': indices_nivel(valores[0])}
+        # Los diagnósticos por perfil necesitan los perfiles completos: antes de quitar las filas fuera de los rangos
+        df_final = anadir_diagnosticos(pd.DataFrame(columnas))
+        if filtro.rangos:
+            dentro = filtro.en_rangos(valores.T, local_time)
+            informe.filas_descartadas += int((~dentro).sum())
+            df_final = df_final[dentro].reset_index(drop=True)
+        del valores, columnas
+
+        informe.filas_finales = len(df_final)
+        informe.filas_sin_nivel = int((df_final['Nivel'] == SIN_NIVEL).sum())
+        informe.rangos = calcular_rangos(df_final)
+        informe.tiempo_parseo = time.perf_counter() - t1
+        return df_final, informe
+
+    except Exception as e:
+        informe.error = str(e)
+        return pd.DataFrame(), informe
+
+def cargar_archivo(archivo, filtro=None, vistos=None):
+    '''
+    Parsea un archivo DDR. Devuelve (DataFrame con el esquema ESQUEMA, InformeCarga).
+    Si el archivo no se puede leer, el DataFrame está vacío y el error queda en informe.error.
+    El archivo se mapea en memoria y se decodifica directamente desde los bytes, sin
+    read() ni split() (no se crea un str por línea).
+    filtro : FiltroCarga (por defecto FILTRO_POR_DEFECTO) que se aplica al decodificar
+    vistos : dict de perfiles ya cargados, para descartar los repetidos (ver _parsear_buffer)
+    '''
+    df, informe = _cargar_archivo(archivo, filtro or FILTRO_POR_DEFECTO, vistos)
+    _registrar_parseo(archivo, informe)
+    return df, informe
+
+def _registrar_parseo(archivo, informe):
+    try:
+        tamano = Path(archivo).stat().st_size
+    except OSError:
+        tamano = 0
+    registrar('parseo', informe.tiempo_total, archivos=1, bytes=tamano, lineas=informe.lineas_totales,
+              filas=informe.filas_finales)
+
+def _archivos_tab(directorio):
+    return sorted(Path(directorio).glob("*.TAB"))
+
+
+# --- Carga en paralelo ---
+def _parsear_a_memoria_compartida(archivo, filtro):
+    '''
+    Trabajador del pool: parsea un archivo y copia sus columnas (ESQUEMA, una tras otra) a un
+    bloque de memoria compartida. Devuelve (nombre del bloque o None, filas, InformeCarga,
+    perfiles {fecha y hora UTC: perfil} si filtro.duplicados).
+    '''
+    vistos = {} if filtro.duplicados else None
+    df, informe = _cargar_archivo(archivo, filtro, vistos)
+    if df.empty:
+        return None, 0, informe, vistos
+    n = len(df)
+    bloque = shared_memory.SharedMemory(create=True, size=n * sum(np.dtype(t).itemsize for t in ESQUEMA.values()))
+    desplazamiento = 0
+    for col, tipo in ESQUEMA.items():
+        destino = np.ndarray(n, dtype=tipo, buffer=bloque.buf, offset=desplazamiento)
+        destino[:] = df[col].to_numpy()
+        desplazamiento += destino.nbytes
+    del destino  # No puede quedar ninguna vista al cerrar el bloque
+    bloque.close()  # Lo libera (unlink) el proceso principal al leerlo
+    return bloque.name, n, informe, vistos
+
+def _leer_memoria_compartida(nombre, n):
+    '''DataFrame con las columnas que dejó un trabajador; el bloque se libera tras copiarlas'''
+    bloque = shared_memory.SharedMemory(name=nombre)
+    try:
+        columnas = {}
+        desplazamiento = 0
+        for col, tipo in ESQUEMA.items():
+            columnas[col] = np.ndarray(n, dtype=tipo, buffer=bloque.buf, offset=desplazamiento).copy()
+            desplazamiento += columnas[col].nbytes
+    finally:
+        bloque.close()
+        bloque.unlink()
+    return pd.DataFrame(columnas, copy=False)
+
+def _liberar_memoria_compartida(nombre):
+    bloque = shared_memory.SharedMemory(name=nombre)
+    bloque.close()
+    bloque.unlink()
+
+def iterar_archivos(archivos, procesos=1, progreso=None, filtro=None, vistos=None):
+    '''
+    Parsea archivos y devuelve (archivo, DataFrame, InformeCarga) de cada uno, siempre en el orden de archivos.
+    procesos : con más de 1 (None = PROCESOS_CARGA) se reparten en un pool de procesos
+    progreso : función opcional progreso(hechos, total) llamada tras cada archivo
+    filtro   : FiltroCarga; con filtro.duplicados, un perfil que ya estaba en un archivo anterior se descarta
+    vistos   : dict de perfiles ya cargados antes (p.ej. los del día en el almacen); se completa con los nuevos
+    '''
+    archivos = list(archivos)
+    filtro = filtro or FILTRO_POR_DEFECTO
+    if filtro.duplicados and vistos is None:
+        vistos = {}
+    procesos = PROCESOS_CARGA if procesos is None else procesos
+    procesos = min(procesos, len(archivos))
+    if procesos <= 1:
+        for hechos, archivo in enumerate(archivos, 1):
+            df, informe = cargar_archivo(archivo, filtro, vistos)
+            if progreso is not None:
+                progreso(hechos, len(archivos))
+            yield archivo, df, informe
+        return
+
+    contexto = multiprocessing.get_context(METODO_INICIO)
+    if METODO_INICIO == "forkserver":
+        # Solo tiene efecto antes de arrancar el servidor; con __main__ precargado los trabajadores no lo reimportan
+        contexto.set_forkserver_preload(['__main__', __name__])
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as executor:
+        futuros = [executor.submit(_parsear_a_memoria_compartida, str(a), filtro) for a in archivos]
+        leidos = 0
+        try:
+            # Se recorren en el orden de archivos aunque terminen en otro orden
+            for hechos, (archivo, futuro) in enumerate(zip(archivos, futuros), 1):
+                nombre, n, informe, perfiles = futuro.result()
+                leidos = hechos
+                df = _leer_memoria_compartida(nombre, n) if nombre is not None else pd.DataFrame()
+                if perfiles:
+                    # Cada trabajador solo ve su archivo: los repetidos entre archivos se quitan aquí
+                    repetidos = [p for clave, p in perfiles.items() if clave in vistos]
+                    informe.claves = [clave for clave in informe.claves if clave not in vistos]
+                    vistos.update((clave, p) for clave, p in perfiles.items() if clave not in vistos)
+                    if repetidos and not df.empty:
+                        quitar = df['Perfil'].isin(repetidos).to_numpy()
+                        informe.perfiles_duplicados += len(repetidos)
+                        informe.filas_descartadas += int(quitar.sum())
+                        df = df[~quitar].reset_index(drop=True)
+                        informe.filas_finales = len(df)
+                        informe.filas_sin_nivel = int((df['Nivel'] == SIN_NIVEL).sum())
+                        informe.rangos = calcular_rangos(df)
+                _registrar_parseo(archivo, informe)  # El medidor del trabajador no es el de este proceso
+                if progreso is not None:
+                    progreso(hechos, len(archivos))
+                yield archivo, df, informe
+        finally:
+            # Recorrido interrumpido (p.ej. una carga cancelada desde progreso): los archivos pendientes
+            # no se parsean y se liberan los bloques de memoria compartida que nadie va a leer
+            for futuro in futuros[leidos:]:
+                futuro.cancel()
+            for futuro in futuros[leidos:]:
+                if not futuro.cancelled() and futuro.exception() is None and futuro.result()[0] is not None:
+                    _liberar_memoria_compartida(futuro.result()[0])
+
+def cargar_multiples_archivos(directorio, procesos=1, progreso=None, filtro=None):
+    '''
+    Carga todos los .TAB de directorio. Devuelve (DataFrame combinado, InformeCargaMultiple).
+    La clave 'Perfil' se desplaza para que sea única en el DataFrame combinado.
+    procesos : número de procesos para parsear los archivos en paralelo (None = PROCESOS_CARGA);
+               el resultado es el mismo que con 1
+    progreso : función opcional progreso(hechos, total) llamada tras cada archivo
+    filtro   : FiltroCarga que se aplica al decodificar (por defecto FILTRO_POR_DEFECTO)
+    '''
+    t0 = time.perf_counter()
+    informe_total = InformeCargaMultiple()
+    dfs = []
+    n_perfiles = 0
+    for archivo, df, informe in iterar_archivos(_archivos_tab(directorio), procesos, progreso, filtro):
+        informe_total.anadir(informe)
+        if not df.empty:
+            # Desplazar la clave de perfil para que sea única en el DataFrame combinado
+            df['Perfil'] += n_perfiles
+            n_perfiles = int(df['Perfil'].max()) + 1
+            dfs.append(df)
+    informe_total.tiempo_total = time.perf_counter() - t0
+    if dfs:
+        df_total = pd.concat(dfs, ignore_index=True)
+        # Para guardar los datos: mcs.exportacion (Parquet, NetCDF o CSV, por lotes)
+        return df_total, informe_total
+    return pd.DataFrame(), informe_total
+
+def cargar_multiples_archivos_almacen(directorio, almacen, dia=None, procesos=1, progreso=None, filtro=None):
+    '''
+    Modo streaming: cada archivo se parsea y se vuelca como un trozo del almacen en disco,
+    sin mantener en memoria los DataFrames anteriores ni hacer un pd.concat final.
+    Devuelve el InformeCargaMultiple (informe.filas = filas añadidas).
+    procesos, progreso, filtro : como en cargar_multiples_archivos
+    '''
+    t0 = time.perf_counter()
+    informe_total = InformeCargaMultiple()
+    n_perfiles = 0
+    anadidos = []
+    try:
+        for archivo, df, informe in iterar_archivos(_archivos_tab(directorio), procesos, progreso, filtro):
+            informe_total.anadir(informe)
+            if not df.empty:
+                df['Perfil'] += n_perfiles
+                n_perfiles = int(df['Perfil'].max()) + 1
+                nombre = f"{dia}/{archivo.stem}" if dia else archivo.stem
+                # Los diagnósticos por perfil ya vienen del parseo, calculados con los perfiles completos
+                almacen.anadir(nombre, df, dia=dia, claves=informe.claves)
+                anadidos.append(nombre)
+            del df
+    except BaseException:
+        # Carga interrumpida (p.ej. cancelada desde progreso): el día no se queda a medias en el almacen
+        for nombre in anadidos:
+            almacen.eliminar(nombre)
+        raise
+    informe_total.tiempo_total = time.perf_counter() - t0
+    return informe_total
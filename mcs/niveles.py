@@ -0,0 +1,78 @@
+#########################################################################
+#Rejilla estandar de niveles de presion de los perfiles MCS (DDR)
+#Los perfiles se dan en 105 niveles fijos, 15 por decada desde 1000 Pa.
+#Cada fila guarda su nivel como un indice pequeño (int8) a la tabla de
+#presiones; las filas fuera de la rejilla tienen SIN_NIVEL y conservan su
+#presion explicita. Agrupar por nivel es indexar, sin comparar floats.
+#Una presion esta en un nivel si coincide con el salvo TOLERANCIA_NIVEL
+#(relativa), asi que no depende de con cuantas cifras la escriba el DDR.
+#########################################################################
+
+import numpy as np
+
+N_NIVELES = 105
+# Presiones de la rejilla tal como aparecen en los DDR (6 cifras significativas), de mayor a menor
+NIVELES_MCS = np.array([float(f"{p:.5e}") for p in 10**(3 - np.arange(N_NIVELES) / 15)], dtype=np.float32)
+SIN_NIVEL = -1
+# Diferencia relativa máxima con la presión del nivel (entre dos niveles hay un 17%)
+TOLERANCIA_NIVEL = 1e-4
+# Si más de esta fracción de filas queda fuera de la rejilla, se avisa (el Hovmoller y el NetCDF las pierden)
+FRACCION_AVISO_SIN_NIVEL = 0.5
+
+
+def indices_nivel(pres, niveles=NIVELES_MCS, rtol=TOLERANCIA_NIVEL):
+    '''
+    Nivel de cada presión (int8): índice del nivel más cercano si coincide con él salvo rtol, SIN_NIVEL si no
+    pres    : array de presiones (Pa)
+    niveles : tabla de presiones de la rejilla, en orden decreciente
+    rtol    : diferencia relativa máxima con la presión del nivel
+    '''
+    pres = np.asarray(pres, dtype=np.float32)
+    i = np.clip(np.searchsorted(-niveles, -pres), 1, len(niveles) - 1)
+    # El más cercano de los dos niveles entre los que cae la presión
+    i = np.where(np.abs(niveles[i - 1] - pres) < np.abs(niveles[i] - pres), i - 1, i)
+    return np.where(np.isclose(pres, niveles[i], rtol=rtol, atol=0.0), i, SIN_NIVEL).astype(np.int8)
+
+def aviso_sin_nivel(filas_sin_nivel, filas):
+    '''Mensaje de aviso si más de FRACCION_AVISO_SIN_NIVEL de las filas están fuera de la rejilla (None si no)'''
+    if filas and filas_sin_nivel > FRACCION_AVISO_SIN_NIVEL * filas:
+        return (f"{filas_sin_nivel} of {filas} records are not on the MCS pressure levels: they are left out of "
+                f"the Ls-latitude Hovmoller and the NetCDF export")
+    return None
+
+
+def presiones(nivel, pres=None, niveles=NIVELES_MCS):
+    '''
+    Presión de cada fila a partir de su nivel.
+    pres : presiones explícitas para las filas con SIN_NIVEL (NaN si no se dan)
+    '''
+    nivel = np.asarray(nivel)
+    en_rejilla = nivel >= 0
+    resultado = niveles[np.where(en_rejilla, nivel, 0)]
+    if not en_rejilla.all():
+        resultado[~en_rejilla] = np.nan if pres is None else np.asarray(pres, dtype=np.float32)[~en_rejilla]
+    return resultado
+
+
+def matriz_perfiles(df, columna, n_niveles=N_NIVELES):
+    '''
+    Matriz perfil x nivel de una columna (NaN donde el perfil no tiene ese nivel).
+    Las filas fuera de la rejilla no entran. Devuelve (claves de perfil, matriz).
+    '''
+    nivel = df['Nivel'].to_numpy()
+    en_rejilla = nivel >= 0
+    perfiles, fila = np.unique(df['Perfil'].to_numpy()[en_rejilla], return_inverse=True)
+    matriz = np.full((len(perfiles), n_niveles), np.nan, dtype=np.float32)
+    matriz[fila, nivel[en_rejilla]] = df[columna].to_numpy()[en_rejilla]
+    return perfiles, matriz
+
+
+def media_por_nivel(df, columna, n_niveles=N_NIVELES):
+    '''Media y número de datos válidos de una columna en cada nivel de la rejilla'''
+    nivel = df['Nivel'].to_numpy()
+    x = df[columna].to_numpy(dtype=float)
+    m = (nivel >= 0) & np.isfinite(x)
+    n = np.bincount(nivel[m], minlength=n_niveles)
+    suma = np.bincount(nivel[m], weights=x[m], minlength=n_niveles)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return suma / n, n
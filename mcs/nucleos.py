@@ -0,0 +1,56 @@
+#########################################################################
+#Nucleos compilados (Numba, opcional) de mcs.termodinamica: Cp(T)/R, su
+#derivada y el error de la temperatura potencial elemento a elemento, en
+#una sola pasada y sin arrays temporales. La temperatura potencial no
+#tiene nucleo propio: su coste es la potencia, igual compilada que en
+#NumPy, y ya usa el de Cp(T)/R. Si numba no esta instalado
+#(use_numba=False) termodinamica usa la version NumPy, con el mismo
+#resultado. termodinamica lo importa en la primera llamada con arrays, asi
+#que ni el arranque de la app ni los procesos de parseo cargan numba.
+#########################################################################
+
+import math
+
+try:
+    from numba import njit, vectorize
+    use_numba = True
+except ImportError:
+    use_numba = False
+
+# Coeficientes de Cp(T)/R (Capitelli et al. 2005), los mismos que en termodinamica.frac_T
+A1, A2, A3, A4, A5, A6, A7 = (-6.54120227e-7, 2.74075894e-3, -2.7641862e-1, 1.956385613e3,
+                              -2.76968792e5, 2.128976190e7, -6.65634099e8)
+
+
+if use_numba:
+    # error_model='numpy': dividir por cero da inf/NaN como en NumPy en vez de lanzar ZeroDivisionError
+    # Potencias negativas como divisiones: x**(-2) lanza ZeroDivisionError en T=0 aunque el error_model sea
+    # 'numpy' (NumPy da inf) y con exponente float (pow) es más lento
+    @njit(cache=True, error_model='numpy')
+    def _frac_T(T):
+        x = T/1.0e5
+        return A1/(x*x) + A2/x + A3 + A4*x + A5*x**2 + A6*x**3 + A7*x**4
+
+    @njit(cache=True, error_model='numpy')
+    def _frac_T_dev(T):
+        return -2.0*A1*(1/1.0e5)**(-2)/(T*T*T) - A2*(1/1.0e5)**(-1)/(T*T) + A4*(1/1.0e5) \
+            + A5*(1/1.0e5)**2*T + A6*(1/1.0e5)**3*T**2 + A7*(1/1.0e5)**4*T**3
+
+    @njit(cache=True, error_model='numpy')
+    def _temp_potencial_err(T, T_err, P, P0):
+        f_T = _frac_T(T)
+        a = P0/P
+        return a**(1.0 / f_T) * abs(1 - T * math.log(a) * _frac_T_dev(T) / f_T**2) * T_err
+
+    # Ufuncs sin firmas: se compilan al primer uso para cada tipo de entrada (y se guardan en __pycache__)
+    @vectorize(cache=True)
+    def frac_T(T):
+        return _frac_T(T)
+
+    @vectorize(cache=True)
+    def frac_T_dev(T):
+        return _frac_T_dev(T)
+
+    @vectorize(cache=True)
+    def temp_potencial_err(T, T_err, P, P0):
+        return _temp_potencial_err(T, T_err, P, P0)
@@ -0,0 +1,110 @@
+#########################################################################
+#Acceso al servidor PDS (atmos.nmsu.edu): rutas de los volumenes MROM,
+#listado de los DDR de un dia y descarga paralela. Sin dependencias de Streamlit.
+#BASE_URL puede ser tambien una carpeta local con la misma estructura
+#(espejo del PDS), p.ej. MCS_PDS_URL=/datos/espejo_pds para pruebas.
+#requests y bs4 se importan al usarse (no retrasan el arranque de la app).
+#########################################################################
+
+import os
+import shutil
+
+from mcs.rendimiento import etapa
+
+BASE_URL = os.environ.get("MCS_PDS_URL", "https://atmos.nmsu.edu/PDS/data/").rstrip("/") + "/"
+
+
+def es_local(url):
+    '''True si la url es una ruta de un espejo local y no un servidor http(s)'''
+    return not url.startswith(("http://", "https://"))
+
+def _ruta_local(url):
+    return url[len("file://"):] if url.startswith("file://") else url
+
+
+# Calcula MROM DDR partiendo de MROM_2001 = septiembre 2006
+def fecha_a_mrom_ddr(year, month):
+    base_year, base_month = 2006, 9
+    numero = 2001 + (year - base_year) * 12 + (month - base_month)
+    return f"MROM_{numero:04d}"
+
+def construir_url(fecha):
+    y, m, d = fecha.year, fecha.month, fecha.day
+    mrom = fecha_a_mrom_ddr(y, m)
+    fecha_str = f"{y}{m:02d}{d:02d}"
+    url = f"{BASE_URL}{mrom}/DATA/{y}/{y}{m:02d}/{fecha_str}/"
+    return url
+
+def existe_url(url):
+    '''True si el servidor responde 200 a un HEAD (p.ej. la carpeta del día existe)'''
+    if es_local(url):
+        return os.path.exists(_ruta_local(url))
+    import requests
+    return requests.head(url).status_code == 200
+
+def _enlaces(url):
+    '''Nombres enlazados en el listado de una carpeta (las subcarpetas acaban en '/')'''
+    if es_local(url):
+        ruta = _ruta_local(url)
+        if not os.path.isdir(ruta):
+            return []
+        return sorted(n + "/" if os.path.isdir(os.path.join(ruta, n)) else n for n in os.listdir(ruta))
+    import requests
+    from bs4 import BeautifulSoup
+    r = requests.get(url)
+    if r.status_code != 200:
+        return []
+    soup = BeautifulSoup(r.text, "html.parser")
+    return [link.get("href") for link in soup.find_all("a") if link.get("href")]
+
+# Listar solo archivos DDR
+def listar_tab_files_ddr(url):
+    return [url + href for href in _enlaces(url) if href.upper().endswith("_DDR.TAB")]
+
+def listar_subcarpetas(url):
+    '''Urls de las subcarpetas de un listado (sin la carpeta padre ni enlaces absolutos)'''
+    return [url + href for href in _enlaces(url)
+            if href.endswith("/") and not href.startswith(("/", "?", ".", "http"))]
+
+# --- Descarga paralela ---
+def descargar_archivos(urls, carpeta_destino, progreso=None):
+    '''
+    Descarga las urls en carpeta_destino con 6 hilos.
+    progreso : función opcional progreso(hechos, total) llamada tras cada archivo
+    '''
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    os.makedirs(carpeta_destino, exist_ok=True)
+    paths = []
+
+    def descargar(u):
+        nombre = u.split("/")[-1]
+        destino = os.path.join(carpeta_destino, nombre)
+        if es_local(u):
+            if not os.path.exists(_ruta_local(u)):
+                return None
+            shutil.copyfile(_ruta_local(u), destino)
+            return destino
+        import requests
+        r = requests.get(u)
+        if r.status_code == 200:
+            with open(destino, "wb") as f:
+                f.write(r.content)
+            return destino
+        return None
+
+    with etapa('descarga') as e, ThreadPoolExecutor(max_workers=6) as executor:
+        futuros = {executor.submit(descargar, u): u for u in urls}
+        try:
+            for i, futuro in enumerate(as_completed(futuros), 1):
+                resultado = futuro.result()
+                if resultado:
+                    paths.append(resultado)
+                    e.contar(archivos=1, bytes=os.path.getsize(resultado))
+                if progreso is not None:
+                    progreso(i, len(urls))
+        except BaseException:
+            # Descarga interrumpida (p.ej. cancelada desde progreso): no se empiezan las que faltan
+            for futuro in futuros:
+                futuro.cancel()
+            raise
+    return paths
@@ -0,0 +1,132 @@
+#########################################################################
+#Etapas del proceso de un dia de datos MCS, sin Streamlit:
+#descarga -> lectura -> almacen -> filtrado -> Theta -> exportacion y figuras
+#Las usan tanto la aplicacion como la linea de comandos (python -m mcs)
+#########################################################################
+
+import datetime
+import os
+import warnings
+from pathlib import Path
+
+from mcs.almacen import AlmacenColumnar
+from mcs.diagnosticos import anadir_diagnosticos
+from mcs.lectura import cargar_multiples_archivos_almacen
+from mcs.pds import construir_url, existe_url, listar_tab_files_ddr, descargar_archivos
+from mcs.rendimiento import Medidor, activar, etapa
+from mcs.termodinamica import anadir_temp_potencial
+
+CARPETA_DATOS = "data"
+CARPETA_ALMACEN = "data/almacen"  # Almacen columnar compartido por la app y los trabajos por lotes
+
+
+def carpeta_dia(fecha, carpeta_datos=CARPETA_DATOS):
+    return os.path.join(carpeta_datos, str(fecha))
+
+def obtener_dia(fecha, carpeta_datos=CARPETA_DATOS, progreso=None):
+    '''
+    Descarga los DDR del día que no estén ya en disco.
+    Devuelve la lista de rutas locales, o None si el PDS no tiene carpeta para esa fecha.
+    '''
+    url_dia = construir_url(fecha)
+    if not existe_url(url_dia):
+        return None
+    carpeta = carpeta_dia(fecha, carpeta_datos)
+    urls = listar_tab_files_ddr(url_dia)
+    pendientes = [u for u in urls if not os.path.exists(os.path.join(carpeta, u.split("/")[-1]))]
+    descargar_archivos(pendientes, carpeta, progreso=progreso)
+    return [os.path.join(carpeta, u.split("/")[-1]) for u in urls
+            if os.path.exists(os.path.join(carpeta, u.split("/")[-1]))]
+
+def ingerir_dia(fecha, almacen, carpeta_datos=CARPETA_DATOS, progreso=None, forzar=False, procesos=1, filtro=None):
+    '''
+    Descarga y parsea un día en el almacen, salvo que ya esté (a no ser que forzar=True).
+    procesos : procesos para parsear los archivos del día en paralelo
+    filtro   : FiltroCarga que se aplica al parsear
+    Devuelve el InformeCargaMultiple, o None si el día ya estaba o no hay datos en el PDS.
+    '''
+    dia = str(fecha)
+    if dia in almacen.dias() and not forzar:
+        return None
+    if obtener_dia(fecha, carpeta_datos, progreso) is None:
+        return None
+    return cargar_multiples_archivos_almacen(carpeta_dia(fecha, carpeta_datos), almacen, dia=dia, procesos=procesos,
+                                             filtro=filtro)
+
+def cargar_dia(fecha, almacen, rangos=None):
+    '''Filtra un día del almacen y añade Theta y Theta_err (y los diagnósticos si el día es anterior a ellos)'''
+    df = almacen.cargar(rangos, dias=[str(fecha)])
+    return anadir_temp_potencial(anadir_diagnosticos(df))
+
+def rango_fechas(inicio, fin):
+    n = (fin - inicio).days
+    return [inicio + datetime.timedelta(days=i) for i in range(n + 1)]
+
+def procesar_dia(fecha, rangos=None, carpeta_salida=None, formato='parquet', figuras=(),
+                 carpeta_datos=CARPETA_DATOS, carpeta_almacen=CARPETA_ALMACEN, solo_precalentar=False,
+                 mezcla=None, procesos_parseo=1, filtro=None):
+    '''
+    Proceso completo de un día, pensado para ejecutarse en un proceso trabajador.
+    formato  : 'parquet', 'netcdf' o 'csv' (con gzip); el parquet necesita pyarrow y el NetCDF netCDF4
+    figuras  : formatos de imagen a guardar ('png', 'pdf', ...)
+    mezcla   : dict opcional con Xvv_CO2_min, Xvv_H2O_min y Xvv_H2O_max para crear_graficas
+    solo_precalentar : solo descarga y parsea en el almacen (para que la app arranque en caliente)
+    procesos_parseo  : procesos para parsear en paralelo los archivos del día
+    filtro           : FiltroCarga que se aplica al parsear (duplicados, errores, variables requeridas)
+    Devuelve un dict con el resumen del día (con los tiempos y contadores por etapa en 'rendimiento').
+    '''
+    medidor = activar(Medidor())
+    resumen = _procesar_dia(fecha, rangos, carpeta_salida, formato, figuras, carpeta_datos, carpeta_almacen,
+                            solo_precalentar, mezcla, procesos_parseo, filtro)
+    resumen['rendimiento'] = medidor.como_dict()
+    return resumen
+
+def _procesar_dia(fecha, rangos, carpeta_salida, formato, figuras, carpeta_datos, carpeta_almacen,
+                  solo_precalentar, mezcla, procesos_parseo, filtro):
+    almacen = AlmacenColumnar(carpeta_almacen)
+    informe = ingerir_dia(fecha, almacen, carpeta_datos, procesos=procesos_parseo, filtro=filtro)
+    resumen = {'fecha': str(fecha), 'ingerido': informe is not None,
+               'informe': informe.como_dict() if informe is not None else None}
+    if informe is not None and informe.aviso_niveles:
+        resumen['aviso'] = informe.aviso_niveles
+    if str(fecha) not in almacen.dias():
+        resumen['estado'] = 'no data'
+        return resumen
+    if solo_precalentar:
+        resumen['estado'] = 'prewarmed'
+        return resumen
+
+    df = cargar_dia(fecha, almacen, rangos)
+    resumen['filas'] = len(df)
+    salidas = []
+    if carpeta_salida is not None and not df.empty:
+        Path(carpeta_salida).mkdir(parents=True, exist_ok=True)
+        from mcs.exportacion import FORMATOS_EXPORTACION, exportar, lotes_df
+        ruta = os.path.join(carpeta_salida, f"mcs_{fecha}{FORMATOS_EXPORTACION[formato]}")
+        with warnings.catch_warnings(record=True) as avisos:
+            warnings.simplefilter("always")
+            exportar(lotes_df(df), ruta, formato)
+        # Filas que el NetCDF no puede guardar, junto al aviso de la carga si lo hay
+        avisos = ([resumen['aviso']] if 'aviso' in resumen else []) + [str(a.message) for a in avisos]
+        if avisos:
+            resumen['aviso'] = "; ".join(avisos)
+        salidas.append(ruta)
+
+        if figuras:
+            from marstime import marstime
+            from mcs.graficas import crear_graficas, liberar_figura
+
+            MT = marstime(datetime.datetime(fecha.year, fecha.month, fecha.day))
+            r = rangos or {}
+            fig = crear_graficas(df, r.get('Lat', (-90.0, 90.0)), r.get('Lon', (0.0, 360.0)),
+                                 r.get('LocalTime', (0.0, 24.0)), MT.MY, MT.Ls, **(mezcla or {}))
+            if fig is not None:
+                for fmt in figuras:
+                    ruta = os.path.join(carpeta_salida, f"profile_mcs_{fecha}.{fmt}")
+                    with etapa('savefig', figuras=1):
+                        fig.savefig(ruta, format=fmt, dpi=300, bbox_inches='tight')
+                    salidas.append(ruta)
+                liberar_figura(fig)
+    resumen['salidas'] = salidas
+    resumen['estado'] = 'ok'
+    return resumen
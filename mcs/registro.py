@@ -0,0 +1,158 @@
+#########################################################################
+#Registro de datos compartido entre sesiones (un unico servidor Streamlit
+#para varios usuarios). Cada conjunto de datos (p.ej. un dia) se guarda una
+#sola vez como columnas .npy y todas las sesiones reciben un DataFrame de
+#solo lectura sobre esos archivos con memoria mapeada (sin copias).
+#La memoria crece con los dias distintos cargados, no con los usuarios.
+#########################################################################
+
+import re
+import shutil
+import threading
+import time
+import weakref
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CARPETA_REGISTRO = "data/registro"
+LIMITE_BYTES = 2 * 1024**3  # Tamaño a partir del cual se desalojan los datos sin referencias
+
+
+def _nombre_carpeta(clave):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(clave))
+
+
+class VistaDatos:
+    '''
+    Referencia de una sesión a un conjunto de datos del registro.
+    df es de solo lectura y se comparte con el resto de sesiones.
+    La referencia se libera con liberar() o cuando el objeto se destruye (fin de la sesión).
+    '''
+
+    def __init__(self, registro, clave, df):
+        self.clave = clave
+        self.df = df
+        self._finalizador = weakref.finalize(self, registro._liberar, clave)
+
+    def liberar(self):
+        self._finalizador()
+
+    @property
+    def liberada(self):
+        return not self._finalizador.alive
+
+
+class RegistroDatos:
+    '''
+    Registro del proceso con contador de referencias por conjunto de datos.
+
+    raiz         : carpeta donde se guardan las columnas .npy de cada conjunto
+    limite_bytes : si el total supera este valor se desalojan (LRU) los conjuntos
+                   que no tiene ninguna sesión; los referenciados nunca se desalojan
+    '''
+
+    def __init__(self, raiz=CARPETA_REGISTRO, limite_bytes=LIMITE_BYTES):
+        self.raiz = Path(raiz)
+        self.limite_bytes = limite_bytes
+        self._bloqueo = threading.Lock()
+        self._entradas = {}  # clave -> {'df', 'refs', 'bytes', 'ultimo_uso'}
+        self._cargando = {}  # clave -> threading.Event (evita cargar dos veces lo mismo)
+        # Restos de una ejecución anterior del servidor
+        if self.raiz.exists():
+            shutil.rmtree(self.raiz, ignore_errors=True)
+
+    def __contains__(self, clave):
+        with self._bloqueo:
+            return clave in self._entradas
+
+    def adquirir(self, clave, cargador):
+        '''
+        Devuelve una VistaDatos de 'clave'. Si no está en el registro se llama a cargador()
+        (que debe devolver un DataFrame) una sola vez aunque lo pidan varias sesiones a la vez.
+        Si cargador devuelve un DataFrame vacío no se registra y se devuelve None.
+        '''
+        while True:
+            with self._bloqueo:
+                entrada = self._entradas.get(clave)
+                if entrada is not None:
+                    entrada['refs'] += 1
+                    entrada['ultimo_uso'] = time.time()
+                    return VistaDatos(self, clave, entrada['df'])
+                evento = self._cargando.get(clave)
+                if evento is None:
+                    evento = self._cargando[clave] = threading.Event()
+                    cargo_yo = True
+                else:
+                    cargo_yo = False
+            if not cargo_yo:
+                evento.wait()
+                with self._bloqueo:
+                    if clave not in self._entradas:
+                        return None  # La carga de la otra sesión falló o no tenía datos
+                continue
+
+            try:
+                df = cargador()
+                if df is None or df.empty:
+                    return None
+                df_mapeado, n_bytes = self._mapear(clave, df)
+                del df
+                with self._bloqueo:
+                    # Se registra ya con la referencia de quien lo carga para que no se desaloje antes de devolverlo
+                    self._entradas[clave] = {'df': df_mapeado, 'refs': 1, 'bytes': n_bytes,
+                                             'ultimo_uso': time.time()}
+                vista = VistaDatos(self, clave, df_mapeado)
+            finally:
+                with self._bloqueo:
+                    del self._cargando[clave]
+                evento.set()
+            self._desalojar()
+            return vista
+
+    def _mapear(self, clave, df):
+        '''Escribe las columnas a disco y devuelve un DataFrame de solo lectura sobre ellas (mmap)'''
+        carpeta = self.raiz / _nombre_carpeta(clave)
+        if carpeta.exists():
+            shutil.rmtree(carpeta)
+        carpeta.mkdir(parents=True)
+        columnas = {}
+        n_bytes = 0
+        for i, col in enumerate(df.columns):
+            valores = np.ascontiguousarray(df[col].to_numpy())
+            ruta = carpeta / f"{i:03d}.npy"
+            np.save(ruta, valores, allow_pickle=False)
+            columnas[col] = np.load(ruta, mmap_mode='r')
+            n_bytes += valores.nbytes
+        return pd.DataFrame(columnas, copy=False), n_bytes
+
+    def _liberar(self, clave):
+        with self._bloqueo:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                entrada['refs'] = max(0, entrada['refs'] - 1)
+        self._desalojar()
+
+    def _desalojar(self):
+        '''Desaloja los conjuntos sin referencias (el menos usado primero) mientras se supere el límite'''
+        with self._bloqueo:
+            total = sum(e['bytes'] for e in self._entradas.values())
+            libres = sorted((e['ultimo_uso'], c) for c, e in self._entradas.items() if e['refs'] == 0)
+            eliminados = []
+            for _, clave in libres:
+                if total <= self.limite_bytes:
+                    break
+                total -= self._entradas[clave]['bytes']
+                del self._entradas[clave]
+                eliminados.append(clave)
+        for clave in eliminados:
+            # En Linux los mapeos abiertos siguen siendo válidos aunque se borren los archivos
+            shutil.rmtree(self.raiz / _nombre_carpeta(clave), ignore_errors=True)
+
+    def estado(self):
+        '''DataFrame con los conjuntos registrados, sus referencias y su tamaño'''
+        with self._bloqueo:
+            filas = [{'dataset': str(c), 'sessions': e['refs'], 'MB': round(e['bytes'] / 1e6, 2),
+                      'rows': len(e['df'])} for c, e in self._entradas.items()]
+        return pd.DataFrame(filas, columns=['dataset', 'sessions', 'MB', 'rows'])
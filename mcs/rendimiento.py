@@ -0,0 +1,137 @@
+#########################################################################
+#Instrumentacion del proceso: tiempos y contadores por etapa
+#(descarga, parseo, almacen, figura, savefig...), caudales derivados
+#(archivos/s, filas/s, MB/s) y pico de memoria (RSS) del proceso.
+#Cada etapa terminada se emite como una linea JSON en el logger
+#'mcs.rendimiento' y el total se puede guardar como informe JSON.
+#########################################################################
+
+import contextvars
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+    use_resource = True
+except ImportError:  # Windows
+    use_resource = False
+
+log = logging.getLogger("mcs.rendimiento")
+
+
+def pico_rss_mb():
+    '''Pico de memoria residente del proceso en MB (None si no se puede medir)'''
+    if not use_resource:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024**2 if sys.platform == "darwin" else pico / 1024  # bytes en macOS, KB en Linux
+
+
+class Etapa:
+    '''Ejecución en curso de una etapa; contar() suma contadores (bytes, archivos, filas...)'''
+
+    def __init__(self, nombre, contadores):
+        self.nombre = nombre
+        self.contadores = dict(contadores)
+
+    def contar(self, **contadores):
+        for clave, valor in contadores.items():
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+
+
+class Medidor:
+    '''Acumula por etapa el número de llamadas, el tiempo total y los contadores'''
+
+    def __init__(self):
+        self.etapas = {}
+        self.inicio = time.time()
+        self._bloqueo = threading.Lock()
+
+    @contextmanager
+    def etapa(self, nombre, **contadores):
+        e = Etapa(nombre, contadores)
+        t0 = time.perf_counter()
+        try:
+            yield e
+        finally:
+            self.registrar(nombre, time.perf_counter() - t0, **e.contadores)
+
+    def registrar(self, nombre, tiempo_s, **contadores):
+        '''Añade una ejecución ya medida de una etapa'''
+        with self._bloqueo:
+            acumulado = self.etapas.setdefault(nombre, {'llamadas': 0, 'tiempo_s': 0.0})
+            acumulado['llamadas'] += 1
+            acumulado['tiempo_s'] += tiempo_s
+            for clave, valor in contadores.items():
+                acumulado[clave] = acumulado.get(clave, 0) + valor
+        if log.isEnabledFor(logging.INFO):
+            log.info(json.dumps({'etapa': nombre, 'tiempo_s': round(tiempo_s, 6), **contadores,
+                                 'pico_rss_mb': pico_rss_mb()}))
+
+    def reiniciar(self):
+        with self._bloqueo:
+            self.etapas = {}
+            self.inicio = time.time()
+
+    def resumen(self):
+        '''{etapa: {llamadas, tiempo_s, contadores..., caudales <contador>_por_s}}'''
+        with self._bloqueo:
+            etapas = {nombre: dict(datos) for nombre, datos in self.etapas.items()}
+        for datos in etapas.values():
+            t = datos['tiempo_s']
+            for clave in [c for c in datos if c not in ('llamadas', 'tiempo_s')]:
+                if clave == 'bytes':
+                    datos['MB_por_s'] = datos['bytes'] / 1e6 / t if t > 0 else None
+                else:
+                    datos[f'{clave}_por_s'] = datos[clave] / t if t > 0 else None
+        return etapas
+
+    def como_dict(self):
+        return {'inicio': self.inicio, 'pico_rss_mb': pico_rss_mb(), 'etapas': self.resumen()}
+
+    def tabla(self):
+        '''DataFrame con una fila por etapa'''
+        import pandas as pd
+        filas = [{'stage': nombre, **datos} for nombre, datos in self.resumen().items()]
+        return pd.DataFrame(filas)
+
+    def guardar(self, ruta):
+        with open(ruta, 'w') as f:
+            json.dump(self.como_dict(), f, indent=1)
+
+
+# Medidor activo: cada sesión de la app o trabajo por lotes puede activar el suyo;
+# si no, todo se acumula en el del proceso
+MEDIDOR_PROCESO = Medidor()
+_medidor_actual = contextvars.ContextVar("medidor", default=None)
+
+
+def medidor_actual():
+    return _medidor_actual.get() or MEDIDOR_PROCESO
+
+def activar(medidor):
+    '''Hace que las etapas del hilo/contexto actual se registren en medidor'''
+    _medidor_actual.set(medidor)
+    return medidor
+
+def etapa(nombre, **contadores):
+    '''with etapa('descarga') as e: ...; e.contar(bytes=n) -- en el medidor activo'''
+    return medidor_actual().etapa(nombre, **contadores)
+
+def registrar(nombre, tiempo_s, **contadores):
+    medidor_actual().registrar(nombre, tiempo_s, **contadores)
+
+def cronometrar(nombre):
+    '''Decorador que mide cada llamada de la función como la etapa nombre'''
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with etapa(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
@@ -0,0 +1,395 @@
+#########################################################################
+#Servicio local de consultas HTTP sobre el almacen columnar, para otras
+#herramientas: perfiles por dias o rango de Ls, caja lat/lon/LTST y rango
+#de presion, en JSON o Arrow IPC. Es un servidor asyncio (solo biblioteca
+#estandar) que resuelve cada consulta en un pool de hilos leyendo solo los
+#grupos de filas que pueden cumplirla (estadisticas del almacen), y guarda
+#las respuestas en una cache LRU: una consulta repetida no toca el disco,
+#y si llegan varias iguales a la vez se resuelven una sola vez.
+#
+#  python -m mcs --serve
+#  curl 'http://127.0.0.1:8600/profiles?start=2009-07-25&lat=-30,30&pres=10,100&columns=T,Pres,Lat,Lon'
+#########################################################################
+
+import asyncio
+import datetime
+import functools
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from mcs.almacen import NOMBRE_INDICE, AlmacenColumnar
+from mcs.diagnosticos import COLUMNAS_DIAGNOSTICOS, anadir_diagnosticos
+from mcs.lectura import fechas_marcianas_perfiles
+from mcs.proceso import CARPETA_ALMACEN
+from mcs.rendimiento import Medidor, activar, etapa
+from mcs.termodinamica import anadir_temp_potencial
+
+HOST = "127.0.0.1"  # Solo la máquina local, salvo que se pida otra cosa
+PUERTO = 8600
+MAX_CONSULTAS = 4  # Consultas que se resuelven a la vez (hilos)
+MAX_BYTES_CACHE = 512 * 1024**2  # Respuestas que se guardan (LRU)
+LIMITE_POR_DEFECTO = 100_000  # Filas de /profiles si no se pide otro limit (una consulta sin rangos sería todo el almacen)
+# Columnas que se calculan al leer (los trozos antiguos del almacen no tienen los diagnósticos)
+COLUMNAS_DERIVADAS = ['Theta', 'Theta_err'] + COLUMNAS_DIAGNOSTICOS
+# Parámetros de rango de la URL y su columna
+RANGOS = {'lat': 'Lat', 'lon': 'Lon', 'ltst': 'LocalTime', 'pres': 'Pres'}
+TIPOS = {'json': 'application/json', 'arrow': 'application/vnd.apache.arrow.stream'}
+MENSAJES_HTTP = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                 500: 'Internal Server Error', 501: 'Not Implemented'}
+
+
+class ErrorConsulta(ValueError):
+    '''Parámetros de la consulta no válidos (respuesta 400)'''
+
+
+# --- Consultas ---
+def _par(texto, nombre):
+    try:
+        a, b = (float(x) for x in texto.split(','))
+    except ValueError:
+        raise ErrorConsulta(f"{nombre} must be two numbers: MIN,MAX") from None
+    return a, b
+
+def _dia(texto, nombre):
+    try:
+        return str(datetime.date.fromisoformat(texto))
+    except ValueError:
+        raise ErrorConsulta(f"{nombre} must be a date (YYYY-MM-DD)") from None
+
+def leer_consulta(parametros, columnas_validas):
+    '''
+    Consulta normalizada (un dict que sirve de clave de la caché) a partir de los parámetros de la URL.
+    parametros       : dict {nombre: [valores]} (urllib.parse.parse_qs)
+    columnas_validas : columnas que se pueden pedir
+    '''
+    p = {k: v[-1] for k, v in parametros.items()}
+    desconocidos = set(p) - {'start', 'end', 'ls', 'my', 'columns', 'format', 'limit', *RANGOS}
+    if desconocidos:
+        raise ErrorConsulta(f"Unknown parameters: {', '.join(sorted(desconocidos))}")
+    consulta = {'start': _dia(p['start'], 'start') if 'start' in p else None,
+                'end': _dia(p['end'], 'end') if 'end' in p else None,
+                'ls': _par(p['ls'], 'ls') if 'ls' in p else None,
+                'rangos': {RANGOS[k]: tuple(sorted(_par(p[k], k))) for k in RANGOS if k in p},
+                'format': p.get('format', 'json'), 'my': None, 'columns': None, 'limit': LIMITE_POR_DEFECTO}
+    if consulta['format'] not in TIPOS:
+        raise ErrorConsulta(f"format must be one of {', '.join(TIPOS)}")
+    try:
+        if 'my' in p:
+            consulta['my'] = int(p['my'])
+        if 'limit' in p:
+            consulta['limit'] = max(0, int(p['limit']))
+    except ValueError:
+        raise ErrorConsulta("my and limit must be integers") from None
+    if 'columns' in p:
+        columnas = [c for c in p['columns'].split(',') if c]
+        invalidas = [c for c in columnas if c not in columnas_validas]
+        if invalidas:
+            raise ErrorConsulta(f"Unknown columns: {', '.join(invalidas)}")
+        consulta['columns'] = list(dict.fromkeys(columnas))
+    return consulta
+
+@functools.lru_cache(maxsize=4096)
+def fechas_marcianas_dia(dia):
+    '''((MY, MY), (Ls, Ls)) al principio y al final de un día UTC'''
+    inicio = np.datetime64(dia, 's')
+    my, ls = fechas_marcianas_perfiles(np.array([inicio, inicio + np.timedelta64(86400, 's')]))
+    return (int(my[0]), int(my[1])), (float(ls[0]), float(ls[1]))
+
+def _tramos_ls(a, b):
+    '''Intervalos de Ls de a a b (pasando por 360 si b < a)'''
+    return [(a, b)] if a <= b else [(a, 360.0), (0.0, b)]
+
+def dias_consulta(dias, consulta):
+    '''
+    Días del almacen que pueden tener datos de la consulta: por fecha y, sin leerlos, por el Ls y el
+    año marciano de su principio y su final.
+    '''
+    dias = [d for d in dias if (consulta['start'] is None or d >= consulta['start'])
+            and (consulta['end'] is None or d <= consulta['end'])]
+    if consulta['my'] is not None:
+        dias = [d for d in dias if consulta['my'] in fechas_marcianas_dia(d)[0]]
+    if consulta['ls'] is not None:
+        pedidos = _tramos_ls(*consulta['ls'])
+        dias = [d for d in dias if any(a <= y and x <= b for x, y in _tramos_ls(*fechas_marcianas_dia(d)[1])
+                                       for a, b in pedidos)]
+    return dias
+
+def lotes_consulta(almacen, dias, consulta):
+    '''
+    DataFrames con las filas de la consulta, trozo a trozo, con una columna 'Dia' (Perfil es único por día).
+    Sin ninguna fila, un único DataFrame vacío con las columnas de la respuesta.
+    '''
+    # Ls y MY no tienen estadísticas en el almacen: los días ya se han elegido por ellos (dias_consulta)
+    # y aquí se filtran las filas después de leer; el resto de rangos descarta grupos de filas sin leerlos
+    ls, my = consulta['ls'], consulta['my']
+    extra = (['Ls'] if ls is not None else []) + (['MY'] if my is not None else [])
+    pedidas = consulta['columns']
+    # Solo se leen las columnas pedidas, salvo que haya que calcular alguna derivada
+    columnas = None
+    if pedidas is not None and not any(c in COLUMNAS_DERIVADAS for c in pedidas):
+        # Al menos una columna guardada: sin ninguna (p.ej. solo 'Dia') el trozo no tendría filas
+        columnas = list(dict.fromkeys([c for c in pedidas if c != 'Dia'] + extra)) or ['Perfil']
+    def respuesta(df, dia):
+        if columnas is None:
+            df = anadir_temp_potencial(anadir_diagnosticos(df))
+        df.insert(0, 'Dia', dia)
+        # Los trozos antiguos pueden no tener alguna columna pedida: se devuelve vacía (NaN)
+        return df if pedidas is None else df.reindex(columns=pedidas)
+
+    vacia = True
+    for dia in dias:
+        for df in almacen.iterar(consulta['rangos'] or None, columnas, dias=[dia]):
+            if extra:
+                df = df[mascara_consulta(df, ls, my)]
+            if not df.empty:
+                vacia = False
+                yield respuesta(df, dia)
+    if vacia:
+        yield respuesta(almacen.vacio(columnas), None)
+
+def mascara_consulta(df, ls=None, my=None):
+    '''Filas con Ls entre ls (pasando por 360 si ls[1] < ls[0]) y del año marciano my'''
+    mascara = np.ones(len(df), dtype=bool)
+    if ls is not None:
+        valores = df['Ls'].to_numpy()
+        mascara &= np.logical_or.reduce([(valores >= a) & (valores <= b) for a, b in _tramos_ls(*ls)])
+    if my is not None:
+        mascara &= df['MY'].to_numpy() == my
+    return mascara
+
+def codificar(lotes, formato, limite=None):
+    '''Cuerpo de la respuesta (JSON 'split' o un stream Arrow IPC) con hasta limite filas; devuelve (bytes, filas)'''
+    partes, filas = [], 0
+    for df in lotes:
+        if limite is not None and filas + len(df) >= limite:
+            partes.append(df.iloc[:limite - filas])
+            filas = limite
+            break
+        partes.append(df)
+        filas += len(df)
+    if formato == 'arrow':
+        import pyarrow as pa
+        tablas = [pa.Table.from_pandas(df, preserve_index=False) for df in partes]
+        esquema = tablas[0].schema if tablas else pa.schema([])
+        sumidero = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sumidero, esquema) as escritor:
+            for tabla in tablas:
+                # Los trozos antiguos del almacen pueden tener otros tipos: se ajustan al primero
+                escritor.write_table(tabla.select(esquema.names).cast(esquema))
+        return sumidero.getvalue().to_pybytes(), filas
+    if not partes:
+        return b'{"columns":[],"data":[]}', 0
+    import pandas as pd
+    return pd.concat(partes, ignore_index=True).to_json(orient='split', index=False).encode(), filas
+
+
+class CacheRespuestas:
+    '''
+    Respuestas codificadas (bytes, filas) por consulta, acotadas en bytes; se desaloja la menos usada.
+    Solo se usa desde el bucle de eventos, así que no necesita bloqueo.
+    '''
+
+    def __init__(self, max_bytes=MAX_BYTES_CACHE):
+        self.max_bytes = max_bytes
+        self._respuestas = OrderedDict()
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        respuesta = self._respuestas.get(clave)
+        if respuesta is None:
+            self.fallos += 1
+            return None
+        self._respuestas.move_to_end(clave)
+        self.aciertos += 1
+        return respuesta
+
+    def guardar(self, clave, respuesta):
+        if len(respuesta[0]) > self.max_bytes or clave in self._respuestas:
+            return
+        self._respuestas[clave] = respuesta
+        self.bytes += len(respuesta[0])
+        while self.bytes > self.max_bytes:
+            _, (cuerpo, _) = self._respuestas.popitem(last=False)
+            self.bytes -= len(cuerpo)
+
+    def vaciar(self):
+        self._respuestas.clear()
+        self.bytes = 0
+
+    def como_dict(self):
+        return {'entries': len(self._respuestas), 'MB': round(self.bytes / 1e6, 3), 'max_MB': self.max_bytes / 1e6,
+                'hits': self.aciertos, 'misses': self.fallos}
+
+
+# --- Servidor HTTP ---
+class ServidorConsultas:
+    '''
+    Servidor HTTP/1.1 (solo GET) de consultas al almacen:
+      /          descripción de la API
+      /days      días del almacen con su número de filas, MY y Ls
+      /profiles  filas de la consulta (parámetros en leer_consulta)
+      /stats     caché, consultas en curso y tiempos por etapa
+    max_consultas   : hilos que resuelven consultas a la vez
+    max_bytes_cache : tamaño de la caché de respuestas
+    '''
+
+    def __init__(self, carpeta_almacen=CARPETA_ALMACEN, max_consultas=MAX_CONSULTAS, max_bytes_cache=MAX_BYTES_CACHE):
+        self.almacen = AlmacenColumnar(carpeta_almacen)
+        self.cache = CacheRespuestas(max_bytes_cache)
+        self.medidor = Medidor()
+        self.inicio = time.time()
+        self._pool = ThreadPoolExecutor(max_workers=max_consultas, thread_name_prefix="consulta")
+        self._en_curso = {}  # clave -> futuro de la consulta que se está resolviendo
+        self._generacion = None
+
+    def _comprobar_almacen(self):
+        '''Si el índice del almacen ha cambiado (p.ej. por --sync) se relee y se vacía la caché'''
+        try:
+            generacion = os.stat(self.almacen.raiz / NOMBRE_INDICE).st_mtime_ns
+        except FileNotFoundError:
+            generacion = None
+        if generacion != self._generacion:
+            self.almacen.refrescar()
+            self.cache.vaciar()
+            self._generacion = generacion
+        return generacion
+
+    def columnas_validas(self):
+        columnas = {c for meta in self.almacen.trozos.values() for c in meta["columnas"]}
+        return columnas | set(COLUMNAS_DERIVADAS) | {'Dia'}
+
+    def _resolver(self, consulta):
+        '''Se ejecuta en el pool: lee del almacen y codifica la respuesta'''
+        activar(self.medidor)
+        with etapa('consulta') as e:
+            dias = dias_consulta(self.almacen.dias(), consulta)
+            cuerpo, filas = codificar(lotes_consulta(self.almacen, dias, consulta), consulta['format'],
+                                      consulta['limit'])
+            e.contar(filas=filas, bytes=len(cuerpo))
+        return cuerpo, filas
+
+    def _dias(self):
+        filas = []
+        for dia in self.almacen.dias():
+            my, ls = fechas_marcianas_dia(dia)
+            filas.append({'day': dia, 'rows': self.almacen.num_filas(dias=[dia]), 'MY': my[0],
+                          'Ls': [round(ls[0], 3), round(ls[1], 3)]})
+        return filas
+
+    def _terminada(self, clave, futuro):
+        del self._en_curso[clave]
+        if not futuro.cancelled() and futuro.exception() is None:
+            self.cache.guardar(clave, futuro.result())
+
+    async def _perfiles(self, parametros):
+        '''(estado, tipo, cuerpo, cabeceras extra) de /profiles'''
+        generacion = self._comprobar_almacen()
+        try:
+            consulta = leer_consulta(parametros, self.columnas_validas())
+        except ErrorConsulta as e:
+            return _error(400, str(e))
+        clave = (generacion, json.dumps(consulta, sort_keys=True))
+        respuesta, origen = self.cache.obtener(clave), 'hit'
+        if respuesta is None:
+            futuro = self._en_curso.get(clave)
+            origen = 'shared' if futuro is not None else 'miss'
+            if futuro is None:
+                futuro = asyncio.get_running_loop().run_in_executor(self._pool, self._resolver, consulta)
+                self._en_curso[clave] = futuro
+                futuro.add_done_callback(functools.partial(self._terminada, clave))
+            try:
+                # shield: si se corta una conexión no se cancela la consulta que esperan las demás
+                respuesta = await asyncio.shield(futuro)
+            except ImportError:
+                return _error(501, "Arrow output needs pyarrow")
+            except Exception as e:
+                return _error(500, f"{type(e).__name__}: {e}")
+        cuerpo, filas = respuesta
+        return 200, TIPOS[consulta['format']], cuerpo, {'X-Rows': filas, 'X-Row-Limit': consulta['limit'],
+                                                        'X-Cache': origen}
+
+    async def responder(self, metodo, destino):
+        '''(estado, tipo, cuerpo, cabeceras extra) de una petición'''
+        if metodo != 'GET':
+            return _error(405, "Only GET is supported")
+        url = urlsplit(destino)
+        if url.path == '/profiles':
+            return await self._perfiles(parse_qs(url.query, keep_blank_values=True))
+        if url.path == '/days':
+            self._comprobar_almacen()
+            dias = await asyncio.get_running_loop().run_in_executor(self._pool, self._dias)
+            return _json(200, dias)
+        if url.path == '/stats':
+            return _json(200, {'uptime_s': round(time.time() - self.inicio, 1), 'store': str(self.almacen.raiz),
+                               'cache': self.cache.como_dict(), 'in_flight': len(self._en_curso),
+                               'stages': self.medidor.resumen()})
+        if url.path == '/':
+            return _json(200, {'endpoints': {
+                '/days': "Days in the store with their rows, Mars year and Ls at the start and end of the day",
+                '/profiles': "Rows of the store. Parameters: start, end (YYYY-MM-DD); ls=MIN,MAX (may wrap, "
+                             "e.g. 350,10); my; lat, lon, ltst, pres=MIN,MAX; columns=A,B,...; "
+                             f"format=json|arrow; limit (default {LIMITE_POR_DEFECTO} rows; the X-Row-Limit "
+                             "header gives the limit applied)",
+                '/stats': "Cache, queries in flight and per-stage timings"}})
+        return _error(404, f"Unknown path: {url.path}")
+
+    async def _atender(self, lector, escritor):
+        '''Una conexión: atiende peticiones mientras el cliente la mantenga abierta'''
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+                try:
+                    metodo, destino, version = linea.decode('latin-1').split()
+                    cabeceras = {}
+                    while (cabecera := await lector.readline()) not in (b'\r\n', b'\n', b''):
+                        nombre, _, valor = cabecera.decode('latin-1').partition(':')
+                        cabeceras[nombre.strip().lower()] = valor.strip()
+                except ValueError:  # Línea mal formada o demasiado larga
+                    estado, tipo, cuerpo, extra = _error(400, "Malformed request")
+                    version, cabeceras = 'HTTP/1.0', {}
+                else:
+                    estado, tipo, cuerpo, extra = await self.responder(metodo, destino)
+                seguir = version == 'HTTP/1.1' and cabeceras.get('connection', '').lower() != 'close'
+                cabecera = (f"HTTP/1.1 {estado} {MENSAJES_HTTP[estado]}\r\nContent-Type: {tipo}\r\n"
+                            f"Content-Length: {len(cuerpo)}\r\nConnection: {'keep-alive' if seguir else 'close'}\r\n"
+                            + "".join(f"{k}: {v}\r\n" for k, v in extra.items()) + "\r\n")
+                escritor.write(cabecera.encode('latin-1') + cuerpo)
+                await escritor.drain()
+                if not seguir:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            escritor.close()
+
+    async def _servir(self, host, puerto):
+        servidor = await asyncio.start_server(self._atender, host, puerto)
+        print(f"Serving the MCS store {self.almacen.raiz} on http://{host}:{puerto}/", flush=True)
+        async with servidor:
+            await servidor.serve_forever()
+
+    def servir(self, host=HOST, puerto=PUERTO):
+        '''Atiende peticiones hasta Ctrl+C'''
+        try:
+            asyncio.run(self._servir(host, puerto))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._pool.shutdown(cancel_futures=True)
+
+
+def _json(estado, datos):
+    return estado, TIPOS['json'], json.dumps(datos).encode(), {}
+
+def _error(estado, mensaje):
+    return _json(estado, {'error': mensaje})
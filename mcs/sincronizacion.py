@@ -0,0 +1,167 @@
+#########################################################################
+#Sincronizacion incremental del volumen MROM en curso: MCS sigue
+#publicando dias (y archivos dentro de un dia) en el volumen del mes.
+#Se recuerda por volumen y dia que archivos se han descargado y parseado,
+#y solo se ingiere la diferencia en el almacen, en el cubo climatologico
+#y en el Hovmoller Ls - latitud de varios años.
+#
+#  python -m mcs --sync                         # volumen del mes actual
+#  python -m mcs --sync MROM_2035 --pds-url /datos/espejo_pds
+#########################################################################
+
+import datetime
+import json
+import os
+import re
+from pathlib import Path
+
+from mcs import pds
+from mcs.climatologia import CuboClimatologico
+from mcs.hovmoller import HovmollerLsLat
+from mcs.lectura import FILTRO_POR_DEFECTO, cargar_archivo
+from mcs.niveles import SIN_NIVEL
+from mcs.proceso import CARPETA_DATOS, carpeta_dia
+
+ARCHIVO_ESTADO = "sincronizacion.json"  # En la raiz del almacen
+ARCHIVO_CUBO = "climatologia.npz"  # Cubo climatologico mantenido por la sincronizacion
+ARCHIVO_HOVMOLLER = "hovmoller.npz"  # Sumas y conteos (MY, Ls, latitud) mantenidos por la sincronizacion
+
+
+def volumen_actual(fecha=None):
+    '''Volumen MROM que corresponde a una fecha (por defecto, hoy en UTC)'''
+    fecha = fecha or datetime.datetime.now(datetime.timezone.utc).date()
+    return pds.fecha_a_mrom_ddr(fecha.year, fecha.month)
+
+def listar_dias_volumen(volumen):
+    '''{dia 'YYYY-MM-DD': url de la carpeta} de los días publicados en un volumen (DATA/año/mes/día)'''
+    dias = {}
+    for url_anio in pds.listar_subcarpetas(f"{pds.BASE_URL}{volumen}/DATA/"):
+        for url_mes in pds.listar_subcarpetas(url_anio):
+            for url_dia in pds.listar_subcarpetas(url_mes):
+                nombre = url_dia.rstrip("/").split("/")[-1]
+                if re.fullmatch(r"\d{8}", nombre):
+                    dias[f"{nombre[:4]}-{nombre[4:6]}-{nombre[6:]}"] = url_dia
+    return dias
+
+
+class EstadoSincronizacion:
+    '''
+    Qué archivos de cada volumen y día se han ingerido ya, guardado como JSON junto al almacen:
+    {"version": 1, "volumenes": {volumen: {dia: {"archivos": {nombre: filas}, "perfiles": n}}}}
+    "perfiles" es el siguiente valor libre de 'Perfil' en ese día (para que siga siendo único).
+    '''
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self.datos = {"version": 1, "volumenes": {}}
+        if self.ruta.exists():
+            with open(self.ruta) as f:
+                self.datos = json.load(f)
+
+    def dia(self, volumen, dia):
+        return self.datos["volumenes"].setdefault(volumen, {}).setdefault(dia, {"archivos": {}, "perfiles": None})
+
+    def archivos(self, volumen, dia):
+        return set(self.dia(volumen, dia)["archivos"])
+
+    def marcar(self, volumen, dia, nombre, filas):
+        self.dia(volumen, dia)["archivos"][nombre] = int(filas)
+
+    def guardar(self):
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.ruta.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.datos, f, indent=1)
+        os.replace(tmp, self.ruta)
+
+
+def _siguiente_perfil(almacen, dia):
+    '''Primer 'Perfil' libre de un día del almacen (días ingeridos antes de usar la sincronización)'''
+    n = 0
+    for nombre, meta in almacen.trozos.items():
+        if meta.get("dia") == dia and meta["filas"]:
+            n = max(n, int(almacen.leer_trozo(nombre, ['Perfil'])['Perfil'].max()) + 1)
+    return n
+
+def sincronizar_volumen(almacen, volumen=None, carpeta_datos=CARPETA_DATOS, ruta_cubo=None, progreso=None,
+                        ruta_hovmoller=None, filtro=None):
+    '''
+    Descarga y parsea solo los días y archivos del volumen que no se habían ingerido todavía.
+    Cada archivo nuevo se añade como un trozo del almacen y se suma al cubo de ruta_cubo
+    (por defecto climatologia.npz en la raiz del almacen; ruta_cubo=False para no mantenerlo)
+    y al Hovmoller de ruta_hovmoller (por defecto hovmoller.npz; False para no mantenerlo).
+    progreso : función opcional progreso(dia, archivos_nuevos)
+    filtro   : FiltroCarga al parsear (por defecto FILTRO_POR_DEFECTO, el de la app); se descartan los perfiles
+               que ya estaban en el almacen o en otro archivo nuevo del mismo día
+    Devuelve un dict con el resumen de la sincronización.
+    '''
+    volumen = volumen or volumen_actual()
+    filtro = filtro or FILTRO_POR_DEFECTO
+    estado = EstadoSincronizacion(almacen.raiz / ARCHIVO_ESTADO)
+    cubo = None
+    if ruta_cubo is not False:
+        ruta_cubo = Path(ruta_cubo or almacen.raiz / ARCHIVO_CUBO)
+        cubo = CuboClimatologico.cargar(ruta_cubo) if ruta_cubo.exists() else CuboClimatologico()
+    hov = None
+    if ruta_hovmoller is not False:
+        ruta_hovmoller = Path(ruta_hovmoller or almacen.raiz / ARCHIVO_HOVMOLLER)
+        hov = HovmollerLsLat.cargar(ruta_hovmoller) if ruta_hovmoller.exists() else HovmollerLsLat()
+
+    resumen = {'volumen': volumen, 'dias': 0, 'dias_actualizados': [], 'archivos_nuevos': 0, 'filas': 0, 'filas_sin_nivel': 0, 'errores': []}
+    dias = listar_dias_volumen(volumen)
+    resumen['dias'] = len(dias)
+    for dia, url_dia in sorted(dias.items()):
+        conocidos = estado.archivos(volumen, dia)
+        nuevos = [u for u in pds.listar_tab_files_ddr(url_dia) if u.split("/")[-1] not in conocidos]
+        if not nuevos:
+            continue
+        if progreso is not None:
+            progreso(dia, len(nuevos))
+
+        fecha = datetime.date.fromisoformat(dia)
+        carpeta = carpeta_dia(fecha, carpeta_datos)
+        pendientes = [u for u in nuevos if not os.path.exists(os.path.join(carpeta, u.split("/")[-1]))]
+        pds.descargar_archivos(pendientes, carpeta)
+
+        info_dia = estado.dia(volumen, dia)
+        if info_dia["perfiles"] is None:
+            info_dia["perfiles"] = _siguiente_perfil(almacen, dia)
+        # Los perfiles del día que ya están en el almacen (de otras sincronizaciones o de la app) también cuentan
+        vistos = dict.fromkeys(almacen.claves_perfiles(dias=[dia])) if filtro.duplicados else None
+        for nombre in sorted(u.split("/")[-1] for u in nuevos):
+            ruta = Path(carpeta) / nombre
+            if not ruta.exists():
+                continue  # Descarga fallida: se vuelve a intentar en la siguiente sincronización
+            trozo = f"{dia}/{ruta.stem}"
+            if trozo in almacen:
+                # Ya parseado (p.ej. por la app); solo falta sumarlo al cubo
+                df = almacen.leer_trozo(trozo)
+            else:
+                df, informe = cargar_archivo(ruta, filtro, vistos)
+                if informe.error:
+                    resumen['errores'].append(f"{nombre}: {informe.error}")
+                    continue
+                if not df.empty:
+                    df['Perfil'] += info_dia["perfiles"]
+                    info_dia["perfiles"] = int(df['Perfil'].max()) + 1
+                    almacen.anadir(trozo, df, dia=dia, claves=informe.claves)  # Los diagnósticos ya vienen del parseo
+            if cubo is not None:
+                cubo.actualizar(df)
+                cubo.dias.add(dia)
+            if hov is not None:
+                hov.actualizar(df)
+                hov.dias.add(dia)
+            estado.marcar(volumen, dia, nombre, len(df))
+            resumen['archivos_nuevos'] += 1
+            resumen['filas'] += len(df)
+            if 'Nivel' in df:
+                resumen['filas_sin_nivel'] += int((df['Nivel'] == SIN_NIVEL).sum())
+
+        # Se guarda tras cada día para no repetir trabajo si la sincronización se interrumpe
+        if cubo is not None:
+            cubo.guardar(ruta_cubo)
+        if hov is not None:
+            hov.guardar(ruta_hovmoller)
+        estado.guardar()
+        resumen['dias_actualizados'].append(dia)
+    return resumen
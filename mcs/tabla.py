@@ -0,0 +1,84 @@
+#########################################################################
+#Tabla paginada de los datos seleccionados: el navegador solo recibe la
+#pagina visible. El orden y las columnas se resuelven en el servidor sobre
+#el DataFrame en cache; los indices de cada orden se guardan, asi que
+#pasar de pagina no vuelve a ordenar, y para las primeras paginas basta
+#con una particion parcial (argpartition) en vez de ordenar todo.
+#########################################################################
+
+from collections import OrderedDict
+
+import numpy as np
+
+from mcs.rendimiento import etapa
+
+FILAS_POR_PAGINA = 100
+MAX_ORDENES = 4  # Órdenes (columna, sentido) que se guardan por tabla
+
+
+def indices_ordenados(valores, descendente=False, hasta=None):
+    '''
+    Posiciones que ordenan valores (NaN al final en los dos sentidos; a igualdad, en el orden original).
+    hasta : si se da, solo se garantizan ordenadas las hasta primeras posiciones (se devuelven solo esas)
+    '''
+    valores = np.asarray(valores, dtype=float)
+    nan = np.isnan(valores)
+    clave = np.where(nan, np.inf, -valores if descendente else valores)
+    if hasta is None or hasta >= len(clave) // 2:
+        # Por (es NaN, clave), de forma estable: los NaN van detrás de los +inf
+        orden = np.lexsort((clave, nan))
+        return orden if hasta is None else orden[:hasta]
+    if hasta <= 0:
+        return np.zeros(0, dtype=np.int64)
+    # Particiona las hasta primeras y ordena solo esas, con el mismo resultado que el orden completo
+    corte = clave[np.argpartition(clave, hasta - 1)[hasta - 1]]
+    menores = np.flatnonzero(clave < corte)
+    # Empates en el corte: argpartition puede coger cualquiera, se toman los primeros del orden completo
+    empates = np.flatnonzero(clave == corte)
+    empates = empates[np.argsort(nan[empates], kind='stable')][:hasta - len(menores)]
+    primeras = np.concatenate([menores, empates])
+    return primeras[np.lexsort((primeras, clave[primeras], nan[primeras]))]
+
+
+class TablaPaginada:
+    '''
+    Páginas de un DataFrame con orden y columnas elegidos en el servidor.
+    df : DataFrame a mostrar (no se copia)
+    '''
+
+    def __init__(self, df, max_ordenes=MAX_ORDENES):
+        self.df = df
+        self.max_ordenes = max_ordenes
+        self._ordenes = OrderedDict()  # (columna, descendente) -> (índices, completo)
+
+    @property
+    def num_filas(self):
+        return len(self.df)
+
+    def num_paginas(self, filas_pagina=FILAS_POR_PAGINA):
+        return max(1, -(-len(self.df) // filas_pagina))
+
+    def _orden(self, columna, descendente, hasta):
+        '''Índices del orden (columna, descendente), al menos hasta las hasta primeras filas'''
+        clave = (columna, descendente)
+        guardado = self._ordenes.get(clave)
+        if guardado is None or not (guardado[1] or len(guardado[0]) >= hasta):
+            parcial = indices_ordenados(self.df[columna].to_numpy(), descendente, hasta)
+            guardado = (parcial, len(parcial) == len(self.df))
+            self._ordenes[clave] = guardado
+            while len(self._ordenes) > self.max_ordenes:
+                self._ordenes.popitem(last=False)
+        self._ordenes.move_to_end(clave)
+        return guardado[0]
+
+    def pagina(self, numero, filas_pagina=FILAS_POR_PAGINA, columnas=None, orden=None, descendente=False):
+        '''
+        DataFrame con las filas de la página numero (desde 1) y las columnas pedidas (None = todas).
+        orden : columna por la que ordenar (None = orden original)
+        '''
+        numero = min(max(1, numero), self.num_paginas(filas_pagina))
+        ini, fin = (numero - 1) * filas_pagina, min(numero * filas_pagina, len(self.df))
+        with etapa('tabla', filas=fin - ini):
+            posiciones = np.arange(ini, fin) if orden is None else self._orden(orden, descendente, fin)[ini:fin]
+            df = self.df.iloc[posiciones]
+            return df if columnas is None else df[list(columnas)]
@@ -0,0 +1,167 @@
+#########################################################################
+#Termodinamica de la atmosfera de Marte: Cp(T)/R, temperatura potencial
+#y presiones de saturacion de CO2 y H2O
+#########################################################################
+
+import numpy as np
+
+
+def _nucleos(x):
+    '''
+    Módulo mcs.nucleos (Numba) si x es un array float64 y numba está instalado; None para seguir con NumPy
+    (que con float32 calcula en float32, así que el resultado tampoco cambia de tipo)
+    '''
+    if np.ndim(x) == 0 or np.asarray(x).dtype != np.float64:
+        return None
+    from mcs import nucleos
+    return nucleos if nucleos.use_numba else None
+
+# Función para Cp(T)/R
+def frac_T(T):
+    '''Definimos los coeficientes para la expresión 
+    a1, a2, a3, a4, a5, a6, a7
+
+    Fuente : Capitelli, M., Giordano, D., & Warmbein, B. (Eds.). (2005). 
+            Tables of internal partition functions and thermodynamic properties of high-temperature Mars-atmosphere species from 50K to 50000K. 
+            The Netherlands: European Space Agency.
+    '''
+    a1 = -6.54120227e-7
+    a2 = 2.74075894e-3
+    a3 = -2.7641862e-1
+    a4 = 1.956385613e3
+    a5 = -2.76968792e5
+    a6 = 2.128976190e7
+    a7 = -6.65634099e8
+
+    nucleos = _nucleos(T)
+    if nucleos is not None:
+        return nucleos.frac_T(T)
+
+    fract = a1*(T/1.0e5)**(-2) + a2*(T/1.0e5)**(-1) + a3 + a4*(T/1.0e5) + a5*(T/1.0e5)**2 + a6*(T/1.0e5)**3 + a7*(T/1.0e5)**4
+
+    return fract
+
+def frac_T_dev(T):
+    '''
+    Derivada de frac_T
+    '''
+
+    a1 = -6.54120227e-7
+    a2 = 2.74075894e-3
+    a3 = -2.7641862e-1
+    a4 = 1.956385613e3
+    a5 = -2.76968792e5
+    a6 = 2.128976190e7
+    a7 = -6.65634099e8
+
+    nucleos = _nucleos(T)
+    if nucleos is not None:
+        return nucleos.frac_T_dev(T)
+
+    fract_dev = -2.0*a1*(1/1.0e5)**(-2)*T**(-3) - a2*(1/1.0e5)**(-1)*T**(-2) + a4*(1/1.0e5) + a5*(1/1.0e5)**2*T + a6*(1/1.0e5)**3*T**2 + a7*(1/1.0e5)**4*T**3
+
+    return fract_dev
+
+
+
+def calcular_temp_potencial(T, P, P0=610.0):
+    """
+    Calcula la temperatura potencial θ [K] para Marte.
+    T : array-like de temperaturas [K]
+    P : array-like de presiones [Pa]
+    P0 : presión de referencia [Pa] (por defecto 610 Pa)
+    """
+    T = np.array(T, dtype=float)
+    P = np.array(P, dtype=float)
+
+    Cp_R = frac_T(T)  # Cp(T)/R
+    R_Cp = 1.0 / Cp_R # R/Cp(T)
+    
+    theta = T * (P0 / P)**R_Cp
+    return theta
+
+def calcular_temp_potencial_err(T,T_err, P, P0=610.0):
+    '''
+    Calcula el error en la temperatura potencial θ [K] para Marte.
+    T : array-like de temperaturas [K]
+    T_err : array-like de errores de temperatura [K]
+    P : array-like de presiones [Pa]
+    P0 : presión de referencia [Pa] (por defecto 610 Pa)
+
+    Asume único error en T sacado a partir de los datos de MCS. 
+    '''
+
+    T = np.array(T, dtype=float)
+    T_err = np.array(T_err, dtype=float)
+    P = np.array(P, dtype=float)
+
+    nucleos = _nucleos(T)
+    if nucleos is not None:
+        return nucleos.temp_potencial_err(T, T_err, P, float(P0))
+
+    f_T = frac_T(T)  # Cp(T)/R
+    f_T_prim = frac_T_dev(T) # [Cp(T)/R]'
+    n_T = 1.0 / f_T # R/Cp(T)
+
+    a = P0/P
+
+    theta_err = a**n_T * np.abs(1 - T * np.log(a) * f_T_prim / f_T**2) * T_err
+    return theta_err
+
+
+
+
+def calcular_presion_saturacion(T, xvvco2):
+    '''
+    Fuente: Hu, R., Cahoy, K., & Zuber, M. T. (2012). 
+    Mars atmospheric CO2 condensation above the north and south poles as revealed by radio occultation, climate sounder, and laser ranging observations. 
+    Journal of Geophysical Research: Planets, 117(E7).
+    '''
+    T = np.array(T)
+    logPsat = np.zeros_like(T)
+    
+    mask_high = T > 216.56
+    mask_low = ~mask_high
+    
+    if np.any(mask_high):
+        T_high = T[mask_high]
+        logPsat[mask_high] = (3.128082 - 867.2124/T_high + 18.65612e-3*T_high - 
+                              72.48820e-6*T_high**2 + 93e-9*T_high**3)
+    
+    if np.any(mask_low):
+        T_low = T[mask_low]
+        logPsat[mask_low] = (6.760956 - 1284.07/(T_low - 4.718) + 
+                             1.256e-4*(T_low - 143.15))
+    
+    return (10**logPsat)*1.0e5/xvvco2
+
+def calcular_presion_saturacion_H2O(T, xvvh2o):
+    '''
+    Fuente: Richardson, M. I., & Wilson, R. J. (2002). 
+    Investigation of the nature and stability of the Martian seasonal water cycle with a general circulation model. 
+    Journal of Geophysical Research: Planets, 107(E5), 7-1.
+    '''
+    T = np.array(T)
+    Psat = 611 * np.exp(22.5*(1 - 273.16/T))
+    return Psat/xvvh2o
+
+
+def anadir_temp_potencial(df):
+    '''
+    Añade las columnas Theta y Theta_err a df (en el sitio) y las coloca justo después de T_err.
+    Devuelve el DataFrame con las columnas reordenadas.
+    '''
+    if 'T' not in df.columns or 'Pres' not in df.columns:
+        return df
+    df['Theta'] = calcular_temp_potencial(df['T'], df['Pres'])
+    df['Theta_err'] = calcular_temp_potencial_err(df['T'], df['T_err'], df['Pres'])
+
+    # Reordenar columnas: colocar Theta y Theta_err justo después de T_err
+    cols = list(df.columns)
+    if 'T_err' in cols:
+        idx = cols.index('T_err') + 1
+        for col in ['Theta', 'Theta_err']:
+            cols.insert(idx, cols.pop(cols.index(col)))
+            idx += 1
+        df = df[cols]
+    return df
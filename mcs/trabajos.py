@@ -0,0 +1,182 @@
+#########################################################################
+#Trabajos en segundo plano (descarga y parseo de un dia) para que la app
+#no se bloquee mientras se cargan los datos. Un registro unico del
+#servidor los reparte en un pool de hilos y los identifica por un id; las
+#sesiones consultan su estado y, si dos piden lo mismo (misma clave),
+#comparten un solo trabajo. Cada trabajo sabe que sesiones lo esperan
+#(suscriptores): una sesion que cancela deja de esperarlo, y el trabajo solo
+#se cancela cuando ya no lo espera ninguna.
+#########################################################################
+
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_TRABAJOS = 2  # Trabajos a la vez (cada carga ya reparte el parseo en procesos)
+CADUCIDAD_S = 600  # Tiempo que se conserva un trabajo terminado para las sesiones que lo esperan
+
+PENDIENTE, EJECUTANDO, TERMINADO, ERROR, CANCELADO = 'pending', 'running', 'done', 'error', 'cancelled'
+
+
+class TrabajoCancelado(Exception):
+    '''Se lanza desde Trabajo.progreso cuando se ha pedido cancelar el trabajo'''
+
+
+class Trabajo:
+    '''
+    Estado de un trabajo. La función del trabajo recibe el Trabajo y llama a progreso() de vez en
+    cuando: así se informa de la fase y el avance, y es donde se interrumpe si se cancela.
+    '''
+
+    def __init__(self, clave, descripcion=""):
+        self.id = uuid.uuid4().hex[:12]
+        self.clave = clave
+        self.descripcion = descripcion
+        self.estado = PENDIENTE
+        self.fase = ""
+        self.hechos = 0
+        self.total = 0
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.fin = None
+        self._cancelar = threading.Event()
+        self._futuro = None
+        self._suscriptores = set()
+        self._bloqueo = threading.Lock()
+
+    @property
+    def terminado(self):
+        return self.estado in (TERMINADO, ERROR, CANCELADO)
+
+    @property
+    def fraccion(self):
+        '''Avance de la fase actual entre 0 y 1 (None si no se conoce el total)'''
+        return self.hechos / self.total if self.total else None
+
+    def progreso(self, fase=None, hechos=0, total=0):
+        '''Actualiza la fase y el avance; lanza TrabajoCancelado si se ha pedido cancelar'''
+        if fase is not None:
+            self.fase = fase
+        self.hechos, self.total = hechos, total
+        if self._cancelar.is_set():
+            raise TrabajoCancelado()
+
+    @property
+    def suscriptores(self):
+        '''Número de sesiones que esperan el trabajo'''
+        return len(self._suscriptores)
+
+    def suscribir(self, suscriptor):
+        '''Añade suscriptor a los que esperan el trabajo; False si ya se ha cancelado (hay que enviar otro)'''
+        with self._bloqueo:
+            if self._cancelar.is_set():
+                return False
+            if suscriptor is not None:
+                self._suscriptores.add(suscriptor)
+            return True
+
+    def cancelar(self, suscriptor=None):
+        '''
+        suscriptor deja de esperar el trabajo, que se cancela si ya no lo espera nadie (sin suscriptor, siempre).
+        Al cancelarlo, si aún no ha empezado no se ejecuta; si se ejecuta, para en el siguiente progreso().
+        Devuelve True si se ha cancelado el trabajo.
+        '''
+        with self._bloqueo:
+            self._suscriptores.discard(suscriptor)
+            if suscriptor is not None and self._suscriptores:
+                return False
+            self._cancelar.set()
+        if self._futuro is not None and self._futuro.cancel():
+            self.fin = time.time()
+            self.estado = CANCELADO
+        return True
+
+    def como_dict(self):
+        return {'job': self.id, 'description': self.descripcion, 'status': self.estado, 'sessions': self.suscriptores,
+                'stage': self.fase,
+                'progress': f"{self.hechos}/{self.total}" if self.total else "",
+                'seconds': round((self.fin or time.time()) - self.creado, 1), 'error': self.error or ""}
+
+
+class RegistroTrabajos:
+    '''
+    Registro de trabajos del proceso, con un pool de max_trabajos hilos.
+    caducidad : segundos que se guarda un trabajo terminado; al olvidarlo se llama a su función
+                liberar(resultado), si la tiene (p.ej. para soltar una VistaDatos)
+    '''
+
+    def __init__(self, max_trabajos=MAX_TRABAJOS, caducidad=CADUCIDAD_S):
+        self.caducidad = caducidad
+        self._pool = ThreadPoolExecutor(max_workers=max_trabajos, thread_name_prefix="trabajo")
+        self._bloqueo = threading.Lock()
+        self._trabajos = {}  # id -> Trabajo
+        self._por_clave = {}  # clave -> id del último trabajo con esa clave
+        self._liberar = {}  # id -> función liberar(resultado)
+
+    def enviar(self, clave, funcion, descripcion="", liberar=None, suscriptor=None):
+        '''
+        Ejecuta funcion(trabajo) en segundo plano y devuelve el Trabajo. Si ya hay uno con la misma
+        clave pendiente, en marcha o terminado bien (y sin caducar), se devuelve ese en su lugar.
+        suscriptor : quien espera el trabajo (p.ej. el id de la sesión), para Trabajo.cancelar
+        '''
+        self._purgar()
+        with self._bloqueo:
+            anterior = self._trabajos.get(self._por_clave.get(clave))
+            if anterior is not None and anterior.estado not in (ERROR, CANCELADO) and anterior.suscribir(suscriptor):
+                return anterior
+            trabajo = Trabajo(clave, descripcion)
+            trabajo.suscribir(suscriptor)
+            self._trabajos[trabajo.id] = trabajo
+            self._por_clave[clave] = trabajo.id
+            if liberar is not None:
+                self._liberar[trabajo.id] = liberar
+            # Con el contexto de quien lo envía: sus etapas van a su medidor de rendimiento
+            trabajo._futuro = self._pool.submit(contextvars.copy_context().run, self._ejecutar, trabajo, funcion)
+        return trabajo
+
+    def obtener(self, id_trabajo):
+        self._purgar()
+        with self._bloqueo:
+            return self._trabajos.get(id_trabajo)
+
+    def _ejecutar(self, trabajo, funcion):
+        estado = CANCELADO
+        if not trabajo._cancelar.is_set():
+            trabajo.estado = EJECUTANDO
+            try:
+                trabajo.resultado = funcion(trabajo)
+                estado = TERMINADO
+            except TrabajoCancelado:
+                pass
+            except Exception as e:
+                trabajo.error = f"{type(e).__name__}: {e}"
+                estado = ERROR
+        # fin antes que el estado: un trabajo terminado siempre tiene fin
+        trabajo.fin = time.time()
+        trabajo.estado = estado
+
+    def _purgar(self):
+        '''Olvida los trabajos terminados hace más de caducidad segundos'''
+        ahora = time.time()
+        with self._bloqueo:
+            caducados = [t for t in self._trabajos.values() if t.terminado and ahora - t.fin > self.caducidad]
+            for t in caducados:
+                del self._trabajos[t.id]
+                if self._por_clave.get(t.clave) == t.id:
+                    del self._por_clave[t.clave]
+            liberar = [(self._liberar.pop(t.id), t) for t in caducados if t.id in self._liberar]
+        for funcion, t in liberar:
+            if t.resultado is not None:
+                funcion(t.resultado)
+
+    def estado(self):
+        '''DataFrame con los trabajos del registro (el más reciente primero)'''
+        import pandas as pd
+        self._purgar()
+        with self._bloqueo:
+            filas = [t.como_dict() for t in sorted(self._trabajos.values(), key=lambda t: -t.creado)]
+        return pd.DataFrame(filas, columns=['job', 'description', 'status', 'sessions', 'stage', 'progress', 'seconds',
+                                            'error'])
@@ -0,0 +1,32 @@
+#########################################################################
+#Archivos DDR pequeños para los tests, con el formato de los de MCS (como
+#benchmarks/generador_ddr.py): metadatos, una cabecera por perfil con la
+#fecha y hora UTC entre comillas y filas de 15 columnas con -9999 de relleno.
+#########################################################################
+
+from pathlib import Path
+
+from mcs.niveles import NIVELES_MCS
+
+
+def perfil_ddr(hora, lat=10.0, lon=20.0, ltst=0.5, niveles=10, relleno=(), fecha="2009-07-25"):
+    '''
+    Líneas de un perfil: su cabecera y una fila por nivel, empezando por el de mayor presión.
+    relleno : niveles con la temperatura a -9999
+    '''
+    lineas = [f'0, "{fecha}", "{hora}", 123.4, 300.1, 1.6, 5000, 1, 0.1, 0.2, 50.0, '
+              f'{ltst:.5f}, {lat:.3f}, {lon:.3f}, 3390, 20, 1, 2']
+    for k in range(niveles):
+        T = -9999 if k in relleno else 180 + 2 * k + lat / 10
+        lineas.append(f'0, {NIVELES_MCS[k]:.5e}, {T:.2f}, 1.00, 1.000e-03, 1e-4, -9999, -9999, 5.000e-04, '
+                      f'1e-5, -9999, -9999, {k * 1.0:.2f}, {lat + k * 0.01:.3f}, {lon:.3f}')
+    return lineas
+
+def escribir_ddr(ruta, *perfiles):
+    '''Escribe un .TAB con las líneas de metadatos y las de cada perfil (listas de líneas). Devuelve la ruta.'''
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    lineas = ['PDS_VERSION_ID = PDS3', '"1","Date","UTC"'] + [linea for perfil in perfiles for linea in perfil]
+    with open(ruta, 'w', encoding='latin1', newline='') as f:
+        f.write('\r\n'.join(lineas) + '\r\n')
+    return ruta
@@ -0,0 +1,35 @@
+#########################################################################
+#Almacen columnar: las agregaciones trozo a trozo no suman dos veces un
+#dia ya incorporado.
+#
+#  python -m pytest tests
+#########################################################################
+
+from conftest import escribir_ddr, perfil_ddr
+from mcs.almacen import AlmacenColumnar
+from mcs.climatologia import CuboClimatologico
+from mcs.lectura import cargar_multiples_archivos_almacen
+
+
+def _guardar_dia(almacen, carpeta, dia, *perfiles):
+    escribir_ddr(carpeta / dia / "F000_DDR.TAB", *perfiles)
+    return cargar_multiples_archivos_almacen(carpeta / dia, almacen, dia=dia)
+
+def _filas_cubo(cubo):
+    return int(cubo.conteo['T'].sum())
+
+
+def test_agregar_sin_dias_no_repite(tmp_path):
+    almacen = AlmacenColumnar(tmp_path / "almacen")
+    _guardar_dia(almacen, tmp_path, "2009-07-25", perfil_ddr("00:10:00.5"), perfil_ddr("00:20:00.5", lat=-30.0))
+    _guardar_dia(almacen, tmp_path, "2009-07-26", perfil_ddr("00:10:00.5", fecha="2009-07-26"))
+
+    cubo = almacen.agregar(CuboClimatologico())
+    assert _filas_cubo(cubo) == 30  # 3 perfiles de 10 niveles
+    assert cubo.dias == {"2009-07-25", "2009-07-26"}
+    assert _filas_cubo(almacen.agregar(cubo)) == 30
+
+    # Solo se suma el día nuevo
+    _guardar_dia(almacen, tmp_path, "2009-07-27", perfil_ddr("00:10:00.5", fecha="2009-07-27"))
+    assert _filas_cubo(almacen.agregar(cubo)) == 40
+    assert _filas_cubo(almacen.agregar(cubo, dias=["2009-07-25", "2009-07-27"])) == 40
@@ -0,0 +1,60 @@
+#########################################################################
+#Exportacion por lotes: los lotes de trozos antiguos del almacen, sin
+#alguna columna, se escriben con ella vacia, y el NetCDF solo cuenta las
+#filas que caben en la rejilla de niveles (y avisa de las demas).
+#
+#  python -m pytest tests
+#########################################################################
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mcs.exportacion import exportar
+from mcs.niveles import NIVELES_MCS, SIN_NIVEL
+
+
+def _lote(perfiles, niveles=5, sin_nivel=0):
+    '''Lote de perfiles seguidos; las últimas sin_nivel filas de cada perfil, fuera de la rejilla'''
+    filas = []
+    for p in perfiles:
+        for k in range(niveles):
+            fuera = k >= niveles - sin_nivel
+            filas.append({'Perfil': p, 'Pres': NIVELES_MCS[k] * (1.3 if fuera else 1.0), 'T': 200.0 + k,
+                          'Lat': 10.0, 'Lon': 20.0, 'LocalTime': 3.0, 'Ls': 120.0, 'MY': 29,
+                          'Nivel': SIN_NIVEL if fuera else k, 'N2': 1e-4})
+    df = pd.DataFrame(filas).astype({'Pres': np.float32, 'T': np.float32, 'MY': np.int8, 'Nivel': np.int8,
+                                     'N2': np.float32})
+    df.insert(0, 'Dia', '2009-07-25')
+    return df
+
+def _lotes():
+    # El segundo lote viene de un trozo anterior a los diagnósticos: no tiene N2
+    return [_lote([0, 1]), _lote([2]).drop(columns='N2')]
+
+
+def test_parquet_con_columnas_que_faltan(tmp_path):
+    pytest.importorskip("pyarrow")
+    ruta = tmp_path / "exportacion.parquet"
+    assert exportar(_lotes(), ruta) == 15
+    df = pd.read_parquet(ruta)
+    assert len(df) == 15 and df['N2'].dtype == np.float32
+    assert df['N2'].iloc[:10].notna().all() and df['N2'].iloc[10:].isna().all()
+
+def test_csv_con_columnas_que_faltan(tmp_path):
+    ruta = tmp_path / "exportacion.csv.gz"
+    assert exportar(_lotes(), ruta) == 15
+    df = pd.read_csv(ruta)
+    assert list(df.columns) == list(_lotes()[0].columns)
+    assert df['N2'].iloc[10:].isna().all()
+
+def test_netcdf_cuenta_solo_las_filas_de_la_rejilla(tmp_path):
+    netCDF4 = pytest.importorskip("netCDF4")
+    ruta = tmp_path / "exportacion.nc"
+    lotes = [_lote([0, 1], sin_nivel=2), _lote([2]).drop(columns='N2')]
+    with pytest.warns(UserWarning, match="4 records are not on the MCS pressure levels"):
+        assert exportar(lotes, ruta) == 11
+    with netCDF4.Dataset(ruta) as ds:
+        assert ds.rows_off_grid == 4
+        assert int(np.isfinite(ds['T'][:].filled(np.nan)).sum()) == 11
+        assert np.isnan(ds['N2'][2].filled(np.nan)).all()
@@ -0,0 +1,106 @@
+#########################################################################
+#El parser sobre el buffer mapeado da las mismas filas que el lector
+#linea a linea original (split por comas, pd.to_numeric, -9999 -> NaN y
+#dropna de las columnas necesarias), tambien con lineas mal formadas, y
+#la carga en paralelo da lo mismo que la serie.
+#
+#  python -m pytest tests
+#########################################################################
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import escribir_ddr, perfil_ddr
+from mcs.almacen import AlmacenColumnar
+from mcs.lectura import (COLUMNAS_DDR, ESQUEMA, FiltroCarga, cargar_archivo, cargar_multiples_archivos,
+                         cargar_multiples_archivos_almacen)
+
+# Líneas que no dan una fila válida, mezcladas entre los perfiles
+LINEAS_MAL_FORMADAS = [
+    '',                                                                     # vacía
+    'OBJECT = TABLE',                                                       # metadatos
+    '0, 1.00000e+03, 200.00, 1.00',                                         # columnas de menos
+    '1, 1.00000e+03, 200.00, 1.00, 1e-3, 1e-4, 0, 0, 0, 0, 0, 0, 1.0, 10.0, 20.0',  # no empieza por 0
+    '0, abc, 200.00, 1.00, 1e-3, 1e-4, 0, 0, 0, 0, 0, 0, 1.0, 10.0, 20.0',  # presión no numérica
+    '0, 9.00000e+02, xyz, 1.00, 1e-3, 1e-4, 0, 0, 0, 0, 0, 0, 1.0, 10.0, 20.0',  # T no numérica
+    '0, 8.00000e+02, 200.00, 1.00, 1e-3, 1e-4, 0, 0, 0, 0, 0, 0, 1.0, 10.0, -9999',  # sin longitud
+]
+
+
+def lector_original(ruta):
+    '''El cargar_archivo de la primera versión de la app, sin Streamlit'''
+    with open(ruta, 'r', encoding='latin1') as f:
+        lineas = f.read().split('\n')
+    datos = []
+    local_time_actual = np.nan
+    for linea in lineas:
+        if not linea.strip() or not linea.strip().startswith(tuple('0123456789')):
+            continue
+        partes = [parte.strip() for parte in linea.split(',')]
+        if len(partes) > 15 and partes[0] == '0' and partes[1].strip().startswith('"') and ('-' in partes[1]):
+            try:
+                local_time_actual = float(partes[11].strip().replace('"', '').replace(',', '.')) * 24
+            except ValueError:
+                local_time_actual = np.nan
+        if len(partes) == 15 and partes[0] == '0':
+            try:
+                float(partes[1].replace(',', '.'))
+                datos.append(partes + ['nan' if pd.isna(local_time_actual) else str(local_time_actual)])
+            except ValueError:
+                pass
+    df = pd.DataFrame(datos, columns=['Descartar', *COLUMNAS_DDR, 'LocalTime'])
+    for col in df.columns[1:]:
+        df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', '.'), errors='coerce')
+    df = df.replace(-9999, np.nan)
+    df['Lon'] = df['Lon'] % 360
+    return df.dropna(subset=['Pres', 'T', 'Alt', 'Lat', 'Lon'], how='any').drop(columns='Descartar')
+
+
+@pytest.fixture
+def ddr(tmp_path):
+    perfiles = [perfil_ddr("00:10:00.5", relleno=(0, 3)),
+                perfil_ddr("00:20:00.5", lat=-60.0, lon=-170.0, ltst=0.9, relleno=(9,)),
+                LINEAS_MAL_FORMADAS,
+                perfil_ddr("00:30:00.5", lat=75.0, lon=179.5, ltst=0.1, niveles=20)]
+    return escribir_ddr(tmp_path / "F000_DDR.TAB", *perfiles)
+
+
+def test_parser_igual_que_el_lector_original(ddr):
+    df, informe = cargar_archivo(ddr, FiltroCarga(duplicados=False))
+    referencia = lector_original(ddr).reset_index(drop=True)
+    assert informe.error is None and len(df) == len(referencia) == 37
+    for col in [*COLUMNAS_DDR, 'LocalTime']:
+        np.testing.assert_allclose(df[col], referencia[col].astype(np.float32), rtol=1e-6, err_msg=col)
+    # Los rellenos de las columnas que no son obligatorias quedan como NaN, como antes
+    assert df['H2Ovap'].isna().all()
+    assert {col: df[col].dtype for col in ESQUEMA} == {col: np.dtype(t) for col, t in ESQUEMA.items()}
+
+def test_filas_de_relleno_y_mal_formadas_en_el_informe(ddr):
+    _, informe = cargar_archivo(ddr, FiltroCarga(duplicados=False))
+    # 42 filas de datos: 3 con T de relleno, 1 con T no numérica y 1 sin longitud
+    assert informe.filas_descartadas == 5
+    assert informe.filas_finales == 37
+
+
+@pytest.mark.parametrize("almacen", [False, True], ids=["memoria", "almacen"])
+def test_carga_en_paralelo_igual_que_en_serie(tmp_path, almacen):
+    # Tres archivos que se solapan: el tercero repite un perfil de cada uno de los otros
+    carpeta = tmp_path / "dia"
+    escribir_ddr(carpeta / "F000_DDR.TAB", perfil_ddr("00:10:00.5"), perfil_ddr("00:20:00.5", lat=-30.0))
+    escribir_ddr(carpeta / "F001_DDR.TAB", perfil_ddr("00:30:00.5", lat=45.0, relleno=(2,)), LINEAS_MAL_FORMADAS)
+    escribir_ddr(carpeta / "F002_DDR.TAB", perfil_ddr("00:20:00.5", lat=-30.0), perfil_ddr("00:30:00.5", lat=45.0),
+                 perfil_ddr("00:40:00.5", lat=60.0))
+    resultados = []
+    for procesos in (1, 2):
+        if almacen:
+            destino = AlmacenColumnar(tmp_path / f"almacen_{procesos}")
+            informe = cargar_multiples_archivos_almacen(carpeta, destino, dia="2009-07-25", procesos=procesos)
+            df = destino.cargar()
+        else:
+            df, informe = cargar_multiples_archivos(carpeta, procesos=procesos)
+        resultados.append((df, informe))
+    (serie, informe_serie), (paralelo, informe_paralelo) = resultados
+    pd.testing.assert_frame_equal(paralelo, serie)
+    assert informe_paralelo.como_dict()['perfiles_duplicados'] == informe_serie.perfiles_duplicados == 2
+    assert informe_paralelo.filas == informe_serie.filas == len(serie) == 39
@@ -0,0 +1,35 @@
+#########################################################################
+#La rejilla de presiones de MCS: una presion esta en un nivel aunque el
+#DDR la escriba con otra precision, y fuera de ella queda SIN_NIVEL.
+#
+#  python -m pytest tests
+#########################################################################
+
+import numpy as np
+
+from mcs.niveles import NIVELES_MCS, N_NIVELES, SIN_NIVEL, aviso_sin_nivel, indices_nivel, presiones
+
+NIVELES = np.arange(N_NIVELES)
+PRESIONES_EXACTAS = 10**(3 - NIVELES / 15)
+
+
+def test_niveles_con_la_precision_de_los_ddr():
+    np.testing.assert_array_equal(indices_nivel(NIVELES_MCS), NIVELES)
+    np.testing.assert_array_equal(presiones(indices_nivel(NIVELES_MCS)), NIVELES_MCS)
+
+def test_niveles_con_otra_precision():
+    for formato in ("{:.4e}", "{:.7g}", "{:.9e}"):
+        pres = np.array([float(formato.format(p)) for p in PRESIONES_EXACTAS])
+        np.testing.assert_array_equal(indices_nivel(pres), NIVELES, err_msg=formato)
+    np.testing.assert_array_equal(indices_nivel(PRESIONES_EXACTAS), NIVELES)
+
+def test_fuera_de_la_rejilla():
+    # Entre dos niveles, más allá de los extremos, rellenos y NaN
+    entre = np.sqrt(NIVELES_MCS[:-1] * NIVELES_MCS[1:].astype(np.float64))
+    pres = np.concatenate([entre, [2000.0, 1e-5, -9999.0, np.nan], NIVELES_MCS[[0, -1]] * 1.001])
+    assert (indices_nivel(pres) == SIN_NIVEL).all()
+
+def test_aviso_si_la_mayoria_esta_fuera():
+    assert aviso_sin_nivel(0, 0) is None
+    assert aviso_sin_nivel(50, 100) is None
+    assert "51 of 100" in aviso_sin_nivel(51, 100)
@@ -0,0 +1,74 @@
+#########################################################################
+#Los nucleos Numba (marstime.nucleos, mcs.nucleos) deben dar lo mismo que
+#la version NumPy, tambien con NaN, valores de relleno (-9999) e infinitos.
+#Sin numba instalado no hay nucleos y se saltan.
+#
+#  python -m pytest tests
+#########################################################################
+
+import numpy as np
+import pytest
+
+pytest.importorskip("numba")
+
+import marstime.nucleos
+import mcs.nucleos
+from marstime import Mars_Ls, equation_of_center
+from mcs.termodinamica import calcular_temp_potencial, calcular_temp_potencial_err, frac_T, frac_T_dev
+
+TOLERANCIA = 1e-10  # Diferencia relativa máxima (la de benchmarks/bench.py --verify)
+RELLENO = -9999.0
+
+rng = np.random.default_rng(2009)
+
+def _con_especiales(x):
+    '''x con NaN, relleno, ceros e infinitos añadidos'''
+    return np.concatenate([x, [np.nan, RELLENO, 0.0, np.inf, -np.inf]])
+
+# Días desde J2000 (unos 30 años marcianos alrededor de MCS) y perfiles de T, T_err y Pres de MCS
+J2000 = _con_especiales(rng.uniform(-2000.0, 12000.0, 5000))
+T = _con_especiales(rng.uniform(100.0, 300.0, 5000))
+T_ERR = _con_especiales(rng.uniform(0.0, 10.0, 5000))
+PRES = _con_especiales(10 ** rng.uniform(-2.0, 3.0, 5000))
+
+
+def _sin_numba(monkeypatch, funcion, *argumentos):
+    with monkeypatch.context() as m:
+        m.setattr(marstime.nucleos, "use_numba", False)
+        m.setattr(mcs.nucleos, "use_numba", False)
+        return funcion(*argumentos)
+
+def _comparar(compilado, referencia):
+    assert compilado.shape == referencia.shape
+    # NaN e infinitos en los mismos sitios y, el resto, iguales salvo redondeo
+    np.testing.assert_array_equal(np.isnan(compilado), np.isnan(referencia))
+    np.testing.assert_array_equal(np.isposinf(compilado), np.isposinf(referencia))
+    np.testing.assert_array_equal(np.isneginf(compilado), np.isneginf(referencia))
+    np.testing.assert_allclose(compilado, referencia, rtol=TOLERANCIA, atol=0.0, equal_nan=True)
+
+
+@pytest.mark.parametrize("funcion, argumentos", [
+    (equation_of_center, (J2000,)),
+    (Mars_Ls, (J2000,)),
+    (frac_T, (T,)),
+    (frac_T_dev, (T,)),
+    (calcular_temp_potencial, (T, PRES)),
+    (calcular_temp_potencial_err, (T, T_ERR, PRES)),
+], ids=lambda x: getattr(x, "__name__", ""))
+def test_nucleo_igual_que_numpy(monkeypatch, funcion, argumentos):
+    with np.errstate(all='ignore'):
+        referencia = _sin_numba(monkeypatch, funcion, *argumentos)
+        compilado = funcion(*argumentos)
+    _comparar(compilado, referencia)
+
+def test_relleno_en_todas_las_entradas(monkeypatch):
+    T_relleno, P_relleno = np.full(3, RELLENO), np.array([RELLENO, 100.0, RELLENO])
+    with np.errstate(all='ignore'):
+        referencia = _sin_numba(monkeypatch, calcular_temp_potencial_err, T_relleno, T_relleno, P_relleno)
+        compilado = calcular_temp_potencial_err(T_relleno, T_relleno, P_relleno)
+    _comparar(compilado, referencia)
+
+def test_escalares_y_float32_sin_nucleos():
+    # Los escalares y los arrays float32 van siempre por NumPy: el tipo del resultado no cambia
+    assert isinstance(Mars_Ls(1000.0), float)
+    assert frac_T(np.float32([150.0, 200.0])).dtype == np.float32
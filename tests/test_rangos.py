@@ -0,0 +1,65 @@
+#########################################################################
+#Los rangos de la seleccion llevados al cargador: saltar perfiles por su
+#cabecera al parsear o grupos de filas por sus estadisticas al leer el
+#almacen da las mismas filas que cargarlo todo y filtrar despues.
+#
+#  python -m pytest tests
+#########################################################################
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import escribir_ddr, perfil_ddr
+from mcs.almacen import FILAS_POR_GRUPO, AlmacenColumnar, filtrar_rangos
+from mcs.lectura import FiltroCarga, cargar_archivo
+from mcs.niveles import N_NIVELES
+
+RANGOS = [
+    {'Lat': (-20.0, 40.0)},
+    {'Lat': (-20.0, 40.0), 'Lon': (30.0, 200.0), 'LocalTime': (6.0, 18.0)},
+    {'Lon': (300.0, 360.0)},
+    {'Pres': (1.0, 100.0), 'LocalTime': (0.0, 12.0)},
+]
+
+
+@pytest.fixture(scope="module")
+def ddr(tmp_path_factory):
+    # Perfiles completos (105 niveles) repartidos por todo el planeta: más filas que FILAS_POR_GRUPO
+    rng = np.random.default_rng(40)
+    perfiles = [perfil_ddr(f"{i // 60:02d}:{i % 60:02d}:00.5", lat=rng.uniform(-85, 85), lon=rng.uniform(-180, 180),
+                           ltst=rng.uniform(0, 1), niveles=N_NIVELES, relleno=(i % 7,)) for i in range(40)]
+    assert 40 * N_NIVELES > 2 * FILAS_POR_GRUPO
+    return escribir_ddr(tmp_path_factory.mktemp("rangos") / "F000_DDR.TAB", *perfiles)
+
+@pytest.fixture(scope="module")
+def completo(ddr):
+    return cargar_archivo(ddr)[0]
+
+
+@pytest.mark.parametrize("rangos", RANGOS)
+def test_carga_por_region_igual_que_filtrar(ddr, completo, rangos):
+    region, informe = cargar_archivo(ddr, FiltroCarga(rangos=rangos))
+    esperado = filtrar_rangos(completo, rangos).reset_index(drop=True)
+    assert 0 < len(region) < len(completo)
+    pd.testing.assert_frame_equal(region, esperado)
+    assert informe.filas_finales == len(esperado)
+
+def test_almacen_ida_y_vuelta(tmp_path, completo):
+    almacen = AlmacenColumnar(tmp_path / "almacen")
+    almacen.anadir("2009-07-25/F000_DDR", completo, dia="2009-07-25")
+    # La presión no se guarda (sale de Nivel) y aun así se recupera igual
+    assert almacen.trozos["2009-07-25/F000_DDR"]["derivadas"] == {'Pres': 'Nivel'}
+    pd.testing.assert_frame_equal(AlmacenColumnar(tmp_path / "almacen").cargar(), completo)
+    # Una selección vacía conserva las columnas y sus tipos
+    pd.testing.assert_frame_equal(almacen.cargar({'Lat': (89.0, 90.0)}), completo.iloc[:0], check_index_type=False)
+
+@pytest.mark.parametrize("rangos", RANGOS)
+def test_almacen_por_region_igual_que_filtrar(tmp_path, completo, rangos):
+    almacen = AlmacenColumnar(tmp_path / "almacen")
+    almacen.anadir("2009-07-25/F000_DDR", completo, dia="2009-07-25")
+    columnas = ['Perfil', 'Pres', 'T', 'Lat', 'Lon']
+    pd.testing.assert_frame_equal(almacen.cargar(rangos),
+                                  filtrar_rangos(completo, rangos).reset_index(drop=True))
+    pd.testing.assert_frame_equal(almacen.cargar(rangos, columnas=columnas),
+                                  filtrar_rangos(completo, rangos)[columnas].reset_index(drop=True))
@@ -0,0 +1,49 @@
+#########################################################################
+#Servicio de consultas: /profiles devuelve siempre las columnas, tambien
+#sin filas, y nunca mas filas que el limit (por defecto LIMITE_POR_DEFECTO).
+#
+#  python -m pytest tests
+#########################################################################
+
+import asyncio
+import json
+
+import pytest
+
+from conftest import escribir_ddr, perfil_ddr
+from mcs import servidor
+from mcs.lectura import cargar_multiples_archivos_almacen
+from mcs.servidor import ServidorConsultas
+
+
+@pytest.fixture
+def consultar(tmp_path):
+    escribir_ddr(tmp_path / "dia" / "F000_DDR.TAB", perfil_ddr("00:10:00.5"), perfil_ddr("00:20:00.5", lat=-30.0))
+    servidor_ = ServidorConsultas(tmp_path / "almacen")
+    cargar_multiples_archivos_almacen(tmp_path / "dia", servidor_.almacen, dia="2009-07-25")
+
+    def consultar(consulta):
+        estado, _, cuerpo, cabeceras = asyncio.run(servidor_.responder('GET', f"/profiles?{consulta}"))
+        assert estado == 200, cuerpo
+        return json.loads(cuerpo), cabeceras
+    return consultar
+
+
+@pytest.mark.parametrize("consulta", ["lat=80,90", "start=2010-01-01", "lat=80,90&limit=0", "limit=0"])
+def test_columnas_sin_filas(consultar, consulta):
+    completa, _ = consultar("limit=1")
+    respuesta, cabeceras = consultar(consulta)
+    assert respuesta['data'] == [] and cabeceras['X-Rows'] == 0
+    assert respuesta['columns'] == completa['columns']
+    assert respuesta['columns'][:2] == ['Dia', 'Perfil'] and 'Theta' in respuesta['columns']
+
+def test_columnas_pedidas_sin_filas(consultar):
+    respuesta, _ = consultar("lat=80,90&columns=Dia,T,Theta")
+    assert respuesta == {'columns': ['Dia', 'T', 'Theta'], 'data': []}
+
+def test_limite_por_defecto(consultar, monkeypatch):
+    monkeypatch.setattr(servidor, "LIMITE_POR_DEFECTO", 15)
+    respuesta, cabeceras = consultar("columns=Perfil,T")
+    assert len(respuesta['data']) == cabeceras['X-Rows'] == 15 and cabeceras['X-Row-Limit'] == 15
+    respuesta, cabeceras = consultar("columns=Perfil,T&limit=100")
+    assert len(respuesta['data']) == 20 and cabeceras['X-Row-Limit'] == 100
@@ -0,0 +1,59 @@
+#########################################################################
+#Sincronizacion contra un espejo local del PDS: los perfiles que ya estan
+#en el almacen no se vuelven a guardar cuando un archivo nuevo los repite.
+#
+#  python -m pytest tests
+#########################################################################
+
+import pytest
+
+from conftest import escribir_ddr, perfil_ddr
+from mcs import pds
+from mcs.almacen import AlmacenColumnar
+from mcs.lectura import cargar_multiples_archivos_almacen
+from mcs.sincronizacion import sincronizar_volumen
+
+VOLUMEN = "MROM_2035"
+DIA = "2009-07-25"
+
+
+@pytest.fixture
+def espejo(tmp_path, monkeypatch):
+    '''Carpeta del día en un espejo local del PDS, que pasa a ser pds.BASE_URL'''
+    monkeypatch.setattr(pds, "BASE_URL", f"{tmp_path / 'pds'}/")
+    return tmp_path / "pds" / VOLUMEN / "DATA" / "2009" / "200907" / "20090725"
+
+def _sincronizar(almacen, tmp_path):
+    return sincronizar_volumen(almacen, VOLUMEN, carpeta_datos=tmp_path / "datos", ruta_cubo=False,
+                               ruta_hovmoller=False)
+
+
+def test_archivo_nuevo_con_perfiles_ya_sincronizados(espejo, tmp_path):
+    almacen = AlmacenColumnar(tmp_path / "almacen")
+    escribir_ddr(espejo / "F000_DDR.TAB", perfil_ddr("00:10:00.5"), perfil_ddr("00:20:00.5", lat=-30.0))
+    assert _sincronizar(almacen, tmp_path)['filas'] == 20
+
+    # Publicado después: repite el segundo perfil y trae uno nuevo
+    escribir_ddr(espejo / "F001_DDR.TAB", perfil_ddr("00:20:00.5", lat=-30.0), perfil_ddr("00:30:00.5", lat=45.0))
+    resumen = _sincronizar(almacen, tmp_path)
+    assert resumen['archivos_nuevos'] == 1
+    assert resumen['filas'] == 10
+
+    df = almacen.cargar(dias=[DIA])
+    assert len(df) == 30
+    assert df['Perfil'].nunique() == 3
+    assert sorted(df.groupby('Perfil')['Lat'].first().round()) == [-30.0, 10.0, 45.0]
+
+def test_archivo_nuevo_con_perfiles_cargados_por_la_app(espejo, tmp_path):
+    # El día ya está en el almacen (carga de la app); la sincronización lee sus trozos y no los reparsea
+    almacen = AlmacenColumnar(tmp_path / "almacen")
+    escribir_ddr(espejo / "F000_DDR.TAB", perfil_ddr("00:10:00.5"), perfil_ddr("00:20:00.5", lat=-30.0))
+    cargar_multiples_archivos_almacen(espejo, almacen, dia=DIA)
+
+    escribir_ddr(espejo / "F001_DDR.TAB", perfil_ddr("00:10:00.5"), perfil_ddr("00:30:00.5", lat=45.0))
+    resumen = _sincronizar(almacen, tmp_path)
+    assert resumen['archivos_nuevos'] == 2
+    assert resumen['filas'] == 30  # 20 del trozo que ya estaba y 10 del perfil nuevo
+
+    df = almacen.cargar(dias=[DIA])
+    assert len(df) == 30 and df['Perfil'].nunique() == 3